@@ -0,0 +1,31 @@
+"""adding path prefix index to note
+
+Revision ID: 3c9e1b7d2a41
+Revises: 8621d0b82bfb
+Create Date: 2025-04-05 10:12:41.503219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e1b7d2a41'
+down_revision = '8621d0b82bfb'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # text_pattern_ops lets `path LIKE 'prefix.%'` use the index regardless of collation
+    op.create_index(
+        'ix_note_organization_id_path_prefix',
+        'note',
+        ['organization_id', 'path'],
+        unique=False,
+        postgresql_ops={'path': 'text_pattern_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_note_organization_id_path_prefix', table_name='note')
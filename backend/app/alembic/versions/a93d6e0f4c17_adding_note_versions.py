@@ -0,0 +1,42 @@
+"""adding note versions
+
+Revision ID: a93d6e0f4c17
+Revises: f2c8a5e1b9d4
+Create Date: 2025-04-14 16:40:12.873105
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93d6e0f4c17'
+down_revision = 'f2c8a5e1b9d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('note_version',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('note_id', sa.String(), nullable=False),
+    sa.Column('organization_id', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('chain_depth', sa.Integer(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('content_size', sa.Integer(), nullable=False),
+    sa.Column('state_size', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.LargeBinary(), nullable=False),
+    sa.Column('created_by', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['user.id'], ),
+    sa.ForeignKeyConstraint(['note_id'], ['note.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['organization_id'], ['organization.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_note_version_note_id_version', 'note_version', ['note_id', 'version'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_note_version_note_id_version', table_name='note_version')
+    op.drop_table('note_version')
@@ -0,0 +1,56 @@
+"""replacing note position with fractional sort key
+
+Revision ID: b5d2e8f4c613
+Revises: 3c9e1b7d2a41
+Create Date: 2025-04-06 18:40:02.117845
+
+"""
+from itertools import groupby
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.api.utils.fractional_index import keys_between
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5d2e8f4c613'
+down_revision = '3c9e1b7d2a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('note', sa.Column('sort_key', sa.String(collation='C'), nullable=True))
+
+    # Convert each sibling group's integer positions into evenly spread fractional keys
+    connection = op.get_bind()
+    rows = connection.execute(sa.text(
+        "SELECT id, organization_id, parent_id FROM note "
+        "ORDER BY organization_id, parent_id NULLS FIRST, position, id"
+    )).fetchall()
+
+    updates = []
+    for _, siblings in groupby(rows, key=lambda row: (row.organization_id, row.parent_id)):
+        siblings = list(siblings)
+        for sibling, sort_key in zip(siblings, keys_between(None, None, len(siblings))):
+            updates.append({"note_id": sibling.id, "sort_key": sort_key})
+
+    if updates:
+        connection.execute(sa.text("UPDATE note SET sort_key = :sort_key WHERE id = :note_id"), updates)
+
+    op.alter_column('note', 'sort_key', nullable=False)
+    op.create_index('ix_note_organization_id_parent_id_sort_key', 'note', ['organization_id', 'parent_id', 'sort_key'], unique=False)
+    op.drop_column('note', 'position')
+
+
+def downgrade() -> None:
+    op.add_column('note', sa.Column('position', sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE note SET position = ranked.rank * 1000 FROM ("
+        "SELECT id, row_number() OVER (PARTITION BY organization_id, parent_id ORDER BY sort_key, id) AS rank FROM note"
+        ") AS ranked WHERE note.id = ranked.id"
+    )
+    op.alter_column('note', 'position', nullable=False)
+    op.drop_index('ix_note_organization_id_parent_id_sort_key', table_name='note')
+    op.drop_column('note', 'sort_key')
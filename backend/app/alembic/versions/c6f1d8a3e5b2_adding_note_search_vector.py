@@ -0,0 +1,45 @@
+"""adding note search vector
+
+Revision ID: c6f1d8a3e5b2
+Revises: a93d6e0f4c17
+Create Date: 2025-04-15 09:26:18.640152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1d8a3e5b2'
+down_revision = 'a93d6e0f4c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # btree_gin lets the GIN index lead with organization_id, so searches stay within one organization
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    # Adding a stored generated column rewrites the table once to fill it in
+    op.add_column('note', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(content, '')), 'B')",
+            persisted=True
+        ),
+        nullable=True
+    ))
+    op.create_index(
+        'ix_note_organization_id_search_vector',
+        'note',
+        ['organization_id', 'search_vector'],
+        unique=False,
+        postgresql_using='gin'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_note_organization_id_search_vector', table_name='note')
+    op.drop_column('note', 'search_vector')
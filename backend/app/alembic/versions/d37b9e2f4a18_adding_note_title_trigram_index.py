@@ -0,0 +1,33 @@
+"""adding note title trigram index
+
+Revision ID: d37b9e2f4a18
+Revises: c6f1d8a3e5b2
+Create Date: 2025-04-15 14:52:07.318446
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd37b9e2f4a18'
+down_revision = 'c6f1d8a3e5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # organization_id in a GIN index relies on btree_gin, created with the search vector index
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index(
+        'ix_note_organization_id_title_trgm',
+        'note',
+        ['organization_id', 'title'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'title': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_note_organization_id_title_trgm', table_name='note')
@@ -0,0 +1,25 @@
+"""adding keyset pagination index for agent tasks
+
+Revision ID: d81f4a6c0b27
+Revises: b5d2e8f4c613
+Create Date: 2025-04-08 09:27:55.640193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f4a6c0b27'
+down_revision = 'b5d2e8f4c613'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Root notes page on (organization_id, parent_id, sort_key), which is already indexed
+    op.create_index('ix_agent_task_organization_id_created_at_id', 'agent_task', ['organization_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_agent_task_organization_id_created_at_id', table_name='agent_task')
@@ -0,0 +1,69 @@
+"""storing note binary content as bytea
+
+Revision ID: e4a7c2f9d1b3
+Revises: d81f4a6c0b27
+Create Date: 2025-04-10 14:12:31.508312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import zstandard
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c2f9d1b3'
+down_revision = 'd81f4a6c0b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('note', sa.Column('binary_content_encoding', sa.String(), nullable=True))
+
+    # Rows that never decoded cleanly were already served as empty state; drop them instead of failing the cast
+    op.execute(
+        "UPDATE note SET binary_content = NULL "
+        "WHERE binary_content IS NOT NULL AND binary_content !~ '^[A-Za-z0-9+/]*={0,2}$'"
+    )
+    # Existing rows become raw bytes; they are compressed on their next save
+    op.alter_column(
+        'note',
+        'binary_content',
+        type_=sa.LargeBinary(),
+        existing_type=sa.Text(),
+        existing_nullable=True,
+        postgresql_using="decode(binary_content, 'base64')"
+    )
+
+
+def downgrade() -> None:
+    connection = op.get_bind()
+    note = sa.table(
+        'note',
+        sa.column('id', sa.String),
+        sa.column('binary_content', sa.LargeBinary),
+        sa.column('binary_content_encoding', sa.String),
+    )
+
+    # Postgres cannot decompress zstd, so restore compressed rows to raw bytes first
+    decompressor = zstandard.ZstdDecompressor()
+    compressed = connection.execute(
+        sa.select(note.c.id, note.c.binary_content).where(note.c.binary_content_encoding == 'zstd')
+    ).all()
+    for note_id, data in compressed:
+        connection.execute(
+            note.update()
+            .where(note.c.id == note_id)
+            .values(binary_content=decompressor.decompress(data), binary_content_encoding=None)
+        )
+
+    # encode() wraps base64 every 76 characters; the old column held it on one line
+    op.alter_column(
+        'note',
+        'binary_content',
+        type_=sa.Text(),
+        existing_type=sa.LargeBinary(),
+        existing_nullable=True,
+        postgresql_using="replace(encode(binary_content, 'base64'), E'\\n', '')"
+    )
+    op.drop_column('note', 'binary_content_encoding')
@@ -0,0 +1,50 @@
+"""adding note chunk embeddings
+
+Revision ID: e9a4c7b2d630
+Revises: d37b9e2f4a18
+Create Date: 2025-04-16 11:08:33.912574
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a4c7b2d630'
+down_revision = 'd37b9e2f4a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS vector')
+    op.create_table('note_chunk',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('note_id', sa.String(), nullable=False),
+    sa.Column('organization_id', sa.String(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('content_hash', sa.String(), nullable=False),
+    sa.ForeignKeyConstraint(['note_id'], ['note.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['organization_id'], ['organization.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Must match SEMANTIC_EMBEDDING_DIMENSIONS
+    op.execute('ALTER TABLE note_chunk ADD COLUMN embedding vector(256) NOT NULL')
+    op.create_index('ix_note_chunk_note_id_chunk_index', 'note_chunk', ['note_id', 'chunk_index'], unique=True)
+    op.create_index(op.f('ix_note_chunk_organization_id'), 'note_chunk', ['organization_id'], unique=False)
+    op.create_index(
+        'ix_note_chunk_embedding_hnsw',
+        'note_chunk',
+        ['embedding'],
+        unique=False,
+        postgresql_using='hnsw',
+        postgresql_ops={'embedding': 'vector_cosine_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_note_chunk_embedding_hnsw', table_name='note_chunk')
+    op.drop_index(op.f('ix_note_chunk_organization_id'), table_name='note_chunk')
+    op.drop_index('ix_note_chunk_note_id_chunk_index', table_name='note_chunk')
+    op.drop_table('note_chunk')
@@ -0,0 +1,38 @@
+"""adding note yjs update log
+
+Revision ID: f2c8a5e1b9d4
+Revises: e4a7c2f9d1b3
+Create Date: 2025-04-11 10:03:47.219864
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8a5e1b9d4'
+down_revision = 'e4a7c2f9d1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('note_yjs_update',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('note_id', sa.String(), nullable=False),
+    sa.Column('update', sa.LargeBinary(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['note_id'], ['note.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_note_yjs_update_note_id_id', 'note_yjs_update', ['note_id', 'id'], unique=False)
+    op.add_column('note', sa.Column('update_log_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('note', sa.Column('update_log_bytes', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    # Pending updates are lost unless compacted before downgrading
+    op.drop_column('note', 'update_log_bytes')
+    op.drop_column('note', 'update_log_count')
+    op.drop_index('ix_note_yjs_update_note_id_id', table_name='note_yjs_update')
+    op.drop_table('note_yjs_update')
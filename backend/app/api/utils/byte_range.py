@@ -0,0 +1,30 @@
+import re
+from typing import Optional, Tuple
+
+_SINGLE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_byte_range(range_header: Optional[str]) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """
+    Parse a single-range Range header into (first, last) byte positions, either of which may be None
+    ("bytes=500-" or the suffix form "bytes=-500"). Returns None when there is no header, or for forms we
+    do not serve as ranges (other units, multiple ranges); RFC 9110 lets the server answer those with the
+    whole representation. Raises ValueError for a syntactically valid range that can never be satisfied.
+    """
+    if not range_header:
+        return None
+    match = _SINGLE_RANGE.match(range_header.strip().replace(" ", ""))
+    if not match or match.group(0) == "bytes=-":
+        return None
+    first = int(match.group(1)) if match.group(1) else None
+    last = int(match.group(2)) if match.group(2) else None
+    if first is not None and last is not None and last < first:
+        return None  # Invalid, so the header is ignored
+    if first is None and last == 0:
+        raise ValueError("Empty suffix range")
+    return first, last
+
+
+def format_byte_range(byte_range: Tuple[Optional[int], Optional[int]]) -> str:
+    first, last = byte_range
+    return f"bytes={'' if first is None else first}-{'' if last is None else last}"
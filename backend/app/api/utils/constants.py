@@ -23,4 +23,14 @@ LLMS_AVAILABLE = {
             "MODEL": "gemini-2.0-flash",
         }
     }
-}
\ No newline at end of file
+}
+
+# Embeddings for the semantic index; "hashing" is local and needs no entry here
+EMBEDDERS_AVAILABLE = {
+    "azure_openai": {
+        "text-embedding-3-small": {
+            "AZURE_OPENAI_API_VERSION": "2024-02-01",
+            "AZURE_OPENAI_DEPLOYMENT_NAME": "text-embedding-3-small",
+        },
+    },
+}
@@ -0,0 +1,25 @@
+"""
+Delta compression of successive snapshots.
+
+A delta is the new snapshot zstd-compressed with the previous snapshot as a raw-content
+dictionary, so content shared with the previous snapshot costs a few bytes per match.
+Without a base the snapshot is compressed on its own (a keyframe).
+"""
+from typing import Optional
+import zstandard
+
+DELTA_COMPRESSION_LEVEL = 6
+
+
+def compress_delta(data: bytes, base: Optional[bytes] = None) -> bytes:
+    if base:
+        dictionary = zstandard.ZstdCompressionDict(base, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        return zstandard.ZstdCompressor(level=DELTA_COMPRESSION_LEVEL, dict_data=dictionary).compress(data)
+    return zstandard.ZstdCompressor(level=DELTA_COMPRESSION_LEVEL).compress(data)
+
+
+def decompress_delta(payload: bytes, base: Optional[bytes] = None) -> bytes:
+    if base:
+        dictionary = zstandard.ZstdCompressionDict(base, dict_type=zstandard.DICT_TYPE_RAWCONTENT)
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(payload)
+    return zstandard.ZstdDecompressor().decompress(payload)
@@ -1,8 +1,9 @@
 from fastapi import Depends, HTTPException, status, Security
 from jose import jwt, JWTError
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
-from app.db.base import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.base import get_async_db
 from app.models.user import User
 from app.schemas.auth import TokenPayload
 from app.api.utils.security import oauth2_scheme, api_key_header
@@ -33,7 +34,7 @@ async def verify_worker_api_key(
     return True
 
 async def get_current_user(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     token: str = Depends(oauth2_scheme)
 ) -> User:
     try:
@@ -47,7 +48,7 @@ async def get_current_user(
             detail="Could not validate credentials",
         )
         
-    user = db.query(User).filter(User.id == token_data.sub).first()
+    user = (await db.execute(select(User).where(User.id == token_data.sub))).scalar_one_or_none()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -63,7 +64,7 @@ async def get_current_user(
     return user 
 
 async def get_user_from_refresh_token(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     refresh_token: str = Depends(oauth2_scheme)
 ) -> User:
     try:
@@ -77,7 +78,7 @@ async def get_user_from_refresh_token(
             detail="Invalid refresh token",
         )
         
-    user = db.query(User).filter(User.id == token_data.sub).first()
+    user = (await db.execute(select(User).where(User.id == token_data.sub))).scalar_one_or_none()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -0,0 +1,177 @@
+"""
+Fractional indexing for ordering siblings with string keys.
+
+A key is an "integer part" followed by an optional fraction, both in base 62.
+The head character of the integer part encodes its length ('a'-'z' for 2-27 chars,
+'A'-'Z' for the mirrored negative range), so appending or prepending only
+increments/decrements the integer and keys stay short. Inserting between two
+keys takes the midpoint of their fractions. Keys compare correctly with plain
+byte-wise string comparison (Python `<`, or a "C" collation in Postgres), so a
+new sibling can always be placed between any two others by writing a single row.
+"""
+from typing import List, Optional
+
+BASE_62_DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+SMALLEST_INTEGER = "A" + BASE_62_DIGITS[0] * 26
+INTEGER_ZERO = "a" + BASE_62_DIGITS[0]
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """Return a fraction strictly between fractions `a` and `b` (None means +infinity)"""
+    zero = BASE_62_DIGITS[0]
+    if b is not None and a >= b:
+        raise ValueError(f"{a!r} must be less than {b!r}")
+    if a.endswith(zero) or (b is not None and b.endswith(zero)):
+        raise ValueError("Fractions cannot end with the zero digit")
+
+    if b is not None:
+        # Skip the shared prefix, treating a missing digit in `a` as zero
+        n = 0
+        while (a[n] if n < len(a) else zero) == b[n]:
+            n += 1
+        if n > 0:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    digit_a = BASE_62_DIGITS.index(a[0]) if a else 0
+    digit_b = BASE_62_DIGITS.index(b[0]) if b is not None else len(BASE_62_DIGITS)
+    if digit_b - digit_a > 1:
+        return BASE_62_DIGITS[round(0.5 * (digit_a + digit_b))]
+
+    # Adjacent digits: keep b's first digit if that is already enough, otherwise go one level deeper
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return BASE_62_DIGITS[digit_a] + _midpoint(a[1:], None)
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid order key head: {head!r}")
+
+
+def _integer_part(key: str) -> str:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise ValueError(f"Invalid order key: {key!r}")
+    return key[:length]
+
+
+def _validate_key(key: str) -> None:
+    if key == SMALLEST_INTEGER:
+        raise ValueError(f"Invalid order key: {key!r}")
+    integer = _integer_part(key)
+    if key[len(integer):].endswith(BASE_62_DIGITS[0]):
+        raise ValueError(f"Invalid order key: {key!r}")
+
+
+def _increment_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        d = BASE_62_DIGITS.index(digits[i]) + 1
+        if d < len(BASE_62_DIGITS):
+            digits[i] = BASE_62_DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = BASE_62_DIGITS[0]
+
+    # Carried out of the integer: move to the next length
+    if head == "Z":
+        return INTEGER_ZERO
+    if head == "z":
+        return None
+    next_head = chr(ord(head) + 1)
+    if next_head > "a":
+        digits.append(BASE_62_DIGITS[0])
+    else:
+        digits.pop()
+    return next_head + "".join(digits)
+
+
+def _decrement_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        d = BASE_62_DIGITS.index(digits[i]) - 1
+        if d >= 0:
+            digits[i] = BASE_62_DIGITS[d]
+            return head + "".join(digits)
+        digits[i] = BASE_62_DIGITS[-1]
+
+    # Borrowed out of the integer: move to the previous length
+    if head == "a":
+        return "Z" + BASE_62_DIGITS[-1]
+    if head == "A":
+        return None
+    previous_head = chr(ord(head) - 1)
+    if previous_head < "Z":
+        digits.append(BASE_62_DIGITS[-1])
+    else:
+        digits.pop()
+    return previous_head + "".join(digits)
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """
+    Generate a key that sorts strictly between `a` and `b`.
+    Either bound may be None, meaning the start or end of the list.
+    """
+    if a is not None:
+        _validate_key(a)
+    if b is not None:
+        _validate_key(b)
+    if a is not None and b is not None and a >= b:
+        raise ValueError(f"{a!r} must be less than {b!r}")
+
+    if a is None:
+        if b is None:
+            return INTEGER_ZERO
+        integer_b = _integer_part(b)
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", b[len(integer_b):])
+        if integer_b < b:
+            return integer_b
+        result = _decrement_integer(integer_b)
+        if result is None:
+            raise ValueError("Cannot decrement any further")
+        return result
+
+    integer_a = _integer_part(a)
+    fraction_a = a[len(integer_a):]
+
+    if b is None:
+        result = _increment_integer(integer_a)
+        return result if result is not None else integer_a + _midpoint(fraction_a, None)
+
+    integer_b = _integer_part(b)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, b[len(integer_b):])
+    result = _increment_integer(integer_a)
+    if result is None:
+        raise ValueError("Cannot increment any further")
+    if result < b:
+        return result
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_between(a: Optional[str], b: Optional[str], n: int) -> List[str]:
+    """Generate `n` ascending keys between `a` and `b`, spread so that later inserts stay short"""
+    if n <= 0:
+        return []
+    if n == 1:
+        return [key_between(a, b)]
+
+    if b is None:
+        keys = [key_between(a, None)]
+        for _ in range(n - 1):
+            keys.append(key_between(keys[-1], None))
+        return keys
+
+    if a is None:
+        keys = [key_between(None, b)]
+        for _ in range(n - 1):
+            keys.append(key_between(None, keys[-1]))
+        return list(reversed(keys))
+
+    middle = n // 2
+    c = key_between(a, b)
+    return [*keys_between(a, c, middle), c, *keys_between(c, b, n - middle - 1)]
@@ -0,0 +1,129 @@
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Protocol, Tuple
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+MAX_FIELD_BYTES = 64 * 1024  # Plain form fields are small; only the file part is streamed
+
+
+@dataclass
+class FormFilePart:
+    field_name: str
+    filename: Optional[str]
+    content_type: Optional[str]
+
+
+class UploadSink(Protocol):
+    async def write(self, data: bytes) -> None: ...
+    async def complete(self) -> int: ...
+    async def abort(self) -> None: ...
+
+
+async def stream_form_file(
+    chunks: AsyncIterator[bytes],
+    content_type: Optional[str],
+    file_field: str,
+    open_upload: Callable[[Dict[str, str], FormFilePart], Awaitable[UploadSink]]
+) -> Tuple[Dict[str, str], FormFilePart, UploadSink]:
+    """
+    Parse a multipart/form-data body as it arrives and stream the `file_field` part into a sink.
+
+    Only the file part is forwarded and nothing is spooled, so memory stays at about one request chunk
+    plus whatever the sink buffers. `open_upload` is called when the file part starts, with the fields
+    received so far; clients must therefore send the fields they need before the file. The completed
+    sink is returned with all fields. Raises ValueError for malformed bodies or a missing file part.
+    """
+    media_type, options = parse_options_header(content_type or "")
+    boundary = options.get(b"boundary")
+    if media_type != b"multipart/form-data" or not boundary:
+        raise ValueError("Expected a multipart/form-data body with a boundary")
+
+    # The parser is callback driven; collect events per chunk and handle them (which may await) afterwards
+    events: List[Tuple[str, object]] = []
+    headers: Dict[bytes, bytes] = {}
+    header_field = bytearray()
+    header_value = bytearray()
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        header_field.extend(data[start:end])
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        header_value.extend(data[start:end])
+
+    def on_header_end() -> None:
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished() -> None:
+        events.append(("part_start", dict(headers)))
+        headers.clear()
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        events.append(("data", data[start:end]))
+
+    def on_part_end() -> None:
+        events.append(("part_end", None))
+
+    parser = MultipartParser(boundary, callbacks={
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    fields: Dict[str, str] = {}
+    file_part: Optional[FormFilePart] = None
+    upload: Optional[UploadSink] = None
+    current: Optional[Tuple[str, bool]] = None  # (field name, is the streamed file)
+    field_value = bytearray()
+
+    try:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            parser.write(chunk)
+            for kind, payload in events:
+                if kind == "part_start":
+                    _, disposition = parse_options_header(payload.get(b"content-disposition", b""))
+                    name = disposition.get(b"name", b"").decode("utf-8")
+                    filename = disposition.get(b"filename")
+                    is_file = name == file_field and filename is not None and upload is None
+                    if is_file:
+                        part_type = payload.get(b"content-type")
+                        file_part = FormFilePart(
+                            field_name=name,
+                            filename=filename.decode("utf-8"),
+                            content_type=part_type.decode("latin-1") if part_type else None
+                        )
+                        upload = await open_upload(dict(fields), file_part)
+                    current = (name, is_file)
+                    field_value.clear()
+                elif kind == "data" and current is not None:
+                    if current[1]:
+                        await upload.write(payload)
+                    else:
+                        field_value.extend(payload)
+                        if len(field_value) > MAX_FIELD_BYTES:
+                            raise ValueError(f"Form field {current[0]} is too large")
+                elif kind == "part_end" and current is not None:
+                    if not current[1]:
+                        fields[current[0]] = field_value.decode("utf-8")
+                    current = None
+            events.clear()
+        parser.finalize()
+
+        if upload is None:
+            raise ValueError(f"Missing file field {file_field}")
+        await upload.complete()
+        return fields, file_part, upload
+    except BaseException:
+        # Client disconnects and parse errors must not leave a half written object behind
+        if upload is not None:
+            await upload.abort()
+        raise
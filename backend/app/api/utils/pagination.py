@@ -0,0 +1,55 @@
+import base64
+import json
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def encode_cursor(*values: Any) -> str:
+    """Encode the keyset values of the last returned row into an opaque cursor"""
+    payload = json.dumps(list(values), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Decode a cursor produced by `encode_cursor`, raising ValueError if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+
+    return values
+
+
+class CountCache:
+    """
+    Per-process cache of listing totals keyed by (scope, organization_id).
+    Totals are estimates: they are recomputed after `ttl_seconds`, or earlier when invalidated by a write in this process.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._lock = Lock()
+
+    def get(self, scope: str, organization_id: str) -> Optional[int]:
+        """Return the cached total, or None if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get((scope, organization_id))
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def set(self, scope: str, organization_id: str, count: int) -> None:
+        with self._lock:
+            self._entries[(scope, organization_id)] = (time.monotonic() + self.ttl_seconds, count)
+
+    def invalidate(self, scope: str, organization_id: str) -> None:
+        with self._lock:
+            self._entries.pop((scope, organization_id), None)
+
+
+total_count_cache = CountCache(ttl_seconds=30)
@@ -0,0 +1,182 @@
+"""
+Encoding of Yjs collaboration state at rest.
+
+State is stored as raw bytes, optionally zstd-compressed; the encoding is kept next to
+the bytes (None for raw) so both forms can coexist and the setting can change at any time.
+Incremental updates are appended to a log after the snapshot and merged in by compaction.
+"""
+import struct
+from typing import List, Optional, Tuple
+import zstandard
+from pycrdt import Doc, Map, Text, XmlElement, XmlFragment, XmlText, merge_updates as _merge_encoded_updates
+from app.core.config import settings
+
+ZSTD = "zstd"
+FRAME_HEADER = struct.Struct(">I")
+
+# Lexical's Yjs binding keeps the editor tree under this root: element nodes are embedded XmlText
+# with their properties as attributes, text nodes are a Map of properties followed by their text
+LEXICAL_ROOT = "root"
+LEXICAL_FORMAT_MARKERS = ((16, "`"), (1, "**"), (2, "*"), (4, "~~"))  # Bit flags of TextNode.__format
+
+_compressor = zstandard.ZstdCompressor(level=settings.YJS_STATE_COMPRESSION_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def encode_state(state: bytes) -> Tuple[bytes, Optional[str]]:
+    """Return the bytes to store and their encoding; compression is kept only when it saves space"""
+    if settings.YJS_STATE_COMPRESSION == ZSTD and len(state) >= settings.YJS_STATE_COMPRESSION_MIN_BYTES:
+        compressed = _compressor.compress(state)
+        if len(compressed) < len(state):
+            return compressed, ZSTD
+    return state, None
+
+
+def decode_state(data: Optional[bytes], encoding: Optional[str]) -> bytes:
+    """Inverse of `encode_state`; a missing state decodes to empty bytes"""
+    if not data:
+        return b""
+    if encoding == ZSTD:
+        return _decompressor.decompress(data)
+    if encoding is not None:
+        raise ValueError(f"Unknown collaboration state encoding: {encoding!r}")
+    return bytes(data)
+
+
+def merge_updates(updates: List[bytes]) -> bytes:
+    """Apply updates in order to an empty document and return its full state as a single update"""
+    doc = Doc()
+    for update in updates:
+        doc.apply_update(update)
+    return doc.get_update()
+
+
+def coalesce_updates(updates: List[bytes]) -> bytes:
+    """
+    Combine updates into one without applying them, so updates still waiting on a dependency that is not among
+    them are kept; `merge_updates` would drop those. Idempotent and independent of order, like applying them.
+    """
+    if len(updates) == 1:
+        return updates[0]
+    return _merge_encoded_updates(*updates)
+
+
+def _copy_embed(content, target: XmlText) -> None:
+    """Append a copy of one item of a Lexical element's content (text, text node properties or child node) to `target`"""
+    if isinstance(content, str):
+        target.insert(len(target), content)
+    elif isinstance(content, Map):
+        target.insert_embed(len(target), Map(dict(content)))
+    elif isinstance(content, XmlText):
+        child = XmlText()
+        target.insert_embed(len(target), child)
+        _copy_node(content, child)
+    elif isinstance(content, XmlElement):
+        # Decorator nodes only carry attributes
+        target.insert_embed(len(target), XmlElement(content.tag, dict(content.attributes)))
+
+
+def _copy_node(source: XmlText, target: XmlText) -> None:
+    for key, value in source.attributes:
+        target.attributes[key] = value
+    for content, _ in source.diff():
+        _copy_embed(content, target)
+
+
+def restore_update(current: List[bytes], restored: List[bytes]) -> bytes:
+    """
+    Build the Yjs update that, applied on top of the `current` state, turns its Lexical document into the `restored` one.
+
+    Writing an older state in place of the current one does not work with Yjs: any editor or server still holding
+    the newer state would sync it right back. Instead, the current top-level nodes are deleted and copies of the
+    restored ones inserted as new items, so the restore is itself an edit that merges with everything else.
+    """
+    doc = Doc()
+    for update in current:
+        doc.apply_update(update)
+    source = Doc()
+    for update in restored:
+        source.apply_update(update)
+
+    state = doc.get_state()
+    # Lexical's root is an XmlText whose children are all embedded nodes; as a fragment, each is one child
+    root = doc.get(LEXICAL_ROOT, type=XmlFragment)
+    with doc.transaction():
+        del root.children[0:len(root.children)]
+        for content, _ in source.get(LEXICAL_ROOT, type=Text).diff():
+            if isinstance(content, XmlText):
+                _copy_node(content, root.children.append(XmlText()))
+            elif isinstance(content, XmlElement):
+                root.children.append(XmlElement(content.tag, dict(content.attributes)))
+    return doc.get_update(state)
+
+
+def frame_updates(updates: List[bytes]) -> bytes:
+    """Concatenate updates, each prefixed with its length as a 4-byte big-endian integer"""
+    return b"".join(FRAME_HEADER.pack(len(update)) + update for update in updates)
+
+
+def _inline_markdown(element: XmlText) -> str:
+    parts = []
+    text_format = 0
+    for content, _ in element.diff():
+        if isinstance(content, str):
+            for flag, marker in LEXICAL_FORMAT_MARKERS:
+                if text_format & flag and content.strip():
+                    content = f"{marker}{content}{marker}"
+            parts.append(content)
+        elif isinstance(content, Map):
+            node_type = content.get("__type")
+            text_format = int(content.get("__format") or 0) if node_type == "text" else 0
+            if node_type == "linebreak":
+                parts.append("\n")
+            elif node_type == "tab":
+                parts.append("\t")
+        elif isinstance(content, XmlText):
+            inline = _inline_markdown(content)
+            url = content.attributes.get("__url")
+            parts.append(f"[{inline}]({url})" if url else inline)
+        # Decorator nodes (images, embeds) have no text
+    return "".join(parts)
+
+
+def _block_markdown(element: XmlText, list_depth: int = 0) -> List[str]:
+    node_type = element.attributes.get("__type")
+    if node_type == "heading":
+        level = str(element.attributes.get("__tag") or "h1").lstrip("h")
+        return [f"{'#' * int(level or 1)} {_inline_markdown(element)}"]
+    if node_type == "quote":
+        return [f"> {_inline_markdown(element)}"]
+    if node_type == "code":
+        return [f"```{element.attributes.get('__language') or ''}\n{_inline_markdown(element)}\n```"]
+    if node_type == "list":
+        numbered = element.attributes.get("__listType") == "number"
+        lines = []
+        number = 1
+        for content, _ in element.diff():
+            if not isinstance(content, XmlText):
+                continue
+            nested = [c for c, _ in content.diff() if isinstance(c, XmlText) and c.attributes.get("__type") == "list"]
+            if nested:
+                for child in nested:
+                    lines.extend(_block_markdown(child, list_depth + 1))
+                continue
+            marker = f"{number}." if numbered else "-"
+            lines.append(f"{'    ' * list_depth}{marker} {_inline_markdown(content)}")
+            number += 1
+        return ["\n".join(lines)] if list_depth == 0 else lines
+    return [_inline_markdown(element)]
+
+
+def state_to_markdown(updates: List[bytes]) -> str:
+    """Render the Lexical document held in Yjs updates as markdown (headings, lists, quotes, code, links, emphasis)"""
+    doc = Doc()
+    for update in updates:
+        doc.apply_update(update)
+    root = doc.get(LEXICAL_ROOT, type=Text)
+
+    blocks = []
+    for content, _ in root.diff():
+        if isinstance(content, XmlText):
+            blocks.extend(_block_markdown(content))
+    return "\n\n".join(blocks).strip()
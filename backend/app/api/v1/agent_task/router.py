@@ -1,11 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
 from app.api.utils.deps import get_current_user, verify_worker_api_key
-from sqlalchemy.orm import Session
-from app.db.base import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.base import get_async_db
 from app.schemas.agent_task import AgentTaskCreate, AgentTaskResponse, AgentTaskStatusUpdate, AgentTaskList, AgentTaskListResponse
 from app.api.v1.agent_task.service import AgentTaskService
 from app.models.user import User
 from fastapi import Query
+from typing import Optional
 import logging
 
 router = APIRouter(prefix="/agent_tasks")
@@ -14,7 +15,7 @@ logger = logging.getLogger(__name__)
 @router.post("/", response_model=AgentTaskResponse)
 async def create_agent_task(
     agent_task_data: AgentTaskCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
@@ -33,7 +34,7 @@ async def create_agent_task(
 async def get_agent_task(
     organization_id: str,
     task_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_worker_api_key)
 ):
     try:
@@ -52,7 +53,7 @@ async def get_agent_task(
 @router.get("/{task_id}", response_model=AgentTaskResponse)
 async def get_agent_task(
     task_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
@@ -72,7 +73,7 @@ async def get_agent_task(
 async def update_task_status(
     task_id: str,
     status_update: AgentTaskStatusUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_worker_api_key)
 ):
     """
@@ -94,19 +95,25 @@ async def update_task_status(
 
 @router.get("/", response_model=AgentTaskList)
 async def list_agent_tasks(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
     skip: int = Query(0, ge=0, description="Number of items to skip"),
-    limit: int = Query(20, ge=1, le=50, description="Number of items to return")
+    limit: int = Query(20, ge=1, le=50, description="Number of items to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from a previous page; takes precedence over skip"),
+    include_total: bool = Query(True, description="Include the (cached) total number of tasks")
 ):
     try:
         task_list = await AgentTaskService.list_agent_tasks(
             db=db,
             organization_id=current_user.organization_id,
             skip=skip,
-            limit=limit
+            limit=limit,
+            cursor=cursor,
+            include_total=include_total
         )
         return task_list
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing agent tasks: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
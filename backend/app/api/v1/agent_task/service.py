@@ -1,21 +1,25 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from app.models.agent_task import AgentTask
 from app.models.note import Note
 from app.schemas.agent_task import AgentTaskCreate, AgentTaskResponse, AgentTaskStatus, AgentTaskList, AgentTaskListResponse
 from app.core.celery_app import celery_app
 import logging
-from sqlalchemy import func
-from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy import func, select, tuple_
+from datetime import datetime
+from app.api.utils.pagination import encode_cursor, decode_cursor, total_count_cache
+from sqlalchemy.orm import load_only, noload, selectinload
 
 logger = logging.getLogger(__name__)
 
+AGENT_TASKS_COUNT_SCOPE = "agent_tasks"
+
 
 class AgentTaskService:
     
     @staticmethod
     async def create_agent_task(
-        db: Session,
+        db: AsyncSession,
         agent_task_data: AgentTaskCreate,
         user_id: str,
         organization_id: str
@@ -30,14 +34,17 @@ class AgentTaskService:
             organization_id=organization_id,
             created_by=user_id
         )
-        db.add(task)
-        db.commit()
-        db.refresh(task)
-
         if agent_task_data.reference_notes_ids:
-            reference_notes = db.query(Note).filter(Note.id.in_(agent_task_data.reference_notes_ids)).all()
-            task.reference_notes.extend(reference_notes)
-            db.commit()
+            task.reference_notes = (await db.execute(
+                select(Note).where(Note.id.in_(agent_task_data.reference_notes_ids))
+            )).scalars().all()
+        else:
+            task.reference_notes = []
+        task.modified_notes = []
+        db.add(task)
+        await db.commit()
+        await db.refresh(task, attribute_names=["created_at", "updated_at"])
+        total_count_cache.invalidate(AGENT_TASKS_COUNT_SCOPE, organization_id)
 
         # Trigger Celery task
         celery_app.send_task('process_agent_task', args=[task.id, organization_id, user_id])
@@ -46,17 +53,18 @@ class AgentTaskService:
     @staticmethod
     async def get_agent_task(
         task_id: str,
-        db: Session,
+        db: AsyncSession,
         organization_id: str
     ) -> Optional[AgentTaskResponse]:
-        task = db.query(AgentTask)\
-        .options(
-            selectinload(AgentTask.reference_notes),
-            selectinload(AgentTask.modified_notes),
-            selectinload(AgentTask.destination_note)
-        )\
-        .filter(AgentTask.id == task_id, AgentTask.organization_id == organization_id)\
-        .first()
+        task = (await db.execute(
+            select(AgentTask)
+            .options(
+                selectinload(AgentTask.reference_notes),
+                selectinload(AgentTask.modified_notes),
+                selectinload(AgentTask.destination_note)
+            )
+            .where(AgentTask.id == task_id, AgentTask.organization_id == organization_id)
+        )).scalar_one_or_none()
         if not task:
             return None
         return AgentTaskResponse.model_validate(task)
@@ -65,37 +73,66 @@ class AgentTaskService:
     async def update_task_status(
         task_id: str,
         status: AgentTaskStatus,
-        db: Session
+        db: AsyncSession
     ) -> Optional[AgentTaskResponse]:
         """
         Update the status of an agent task.
         This method is used by the worker API endpoint.
         """
-        task = db.query(AgentTask)\
-        .options(
-            selectinload(AgentTask.reference_notes),
-            selectinload(AgentTask.modified_notes),
-            selectinload(AgentTask.destination_note)
-        )\
-        .filter(AgentTask.id == task_id).first()
+        task = (await db.execute(
+            select(AgentTask)
+            .options(
+                selectinload(AgentTask.reference_notes),
+                selectinload(AgentTask.modified_notes),
+                selectinload(AgentTask.destination_note)
+            )
+            .where(AgentTask.id == task_id)
+        )).scalar_one_or_none()
         if not task:
             return None
         
         task.status = status
-        db.commit()
-        db.refresh(task)
+        await db.commit()
+        await db.refresh(task, attribute_names=["updated_at"])
         
         return AgentTaskResponse.model_validate(task)
     
     @staticmethod
     async def list_agent_tasks(
-        db: Session,
+        db: AsyncSession,
         organization_id: str,
         skip: int = 0,
-        limit: int = 20
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        include_total: bool = True
     ) -> AgentTaskList:
-        # We need to fetch task with offset and limit from the database
-        tasks = db.query(AgentTask).where(AgentTask.organization_id == organization_id).options(load_only(AgentTask.id, AgentTask.agent_type, AgentTask.title, AgentTask.status, AgentTask.created_at)).order_by(AgentTask.created_at.desc()).offset(skip).limit(limit).all()
-        total = db.query(func.count(AgentTask.id)).where(AgentTask.organization_id == organization_id).scalar()
-        return AgentTaskList(items=[AgentTaskListResponse.model_validate(task) for task in tasks], total=total)
-        
+        """
+        List tasks newest first, ordered by (created_at, id).
+        With a cursor the page is found by keyset instead of OFFSET; the total is optional and cached per organization.
+        """
+        # Load exactly the listed columns and skip the note relationships the list view doesn't show
+        query = select(AgentTask).where(AgentTask.organization_id == organization_id).options(
+            load_only(AgentTask.id, AgentTask.agent_type, AgentTask.title, AgentTask.status, AgentTask.organization_id, AgentTask.created_by, AgentTask.created_at, AgentTask.updated_at),
+            noload(AgentTask.reference_notes),
+            noload(AgentTask.modified_notes)
+        )
+        if cursor:
+            before_created_at, before_id = decode_cursor(cursor, 2)
+            query = query.where(tuple_(AgentTask.created_at, AgentTask.id) < tuple_(datetime.fromisoformat(before_created_at), before_id))
+        elif skip:
+            query = query.offset(skip)
+
+        # Fetch one extra row to know whether there is a next page
+        tasks = (await db.execute(query.order_by(AgentTask.created_at.desc(), AgentTask.id.desc()).limit(limit + 1))).scalars().all()
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = encode_cursor(tasks[-1].created_at.isoformat(), tasks[-1].id)
+
+        total = None
+        if include_total:
+            total = total_count_cache.get(AGENT_TASKS_COUNT_SCOPE, organization_id)
+            if total is None:
+                total = (await db.execute(select(func.count(AgentTask.id)).where(AgentTask.organization_id == organization_id))).scalar()
+                total_count_cache.set(AGENT_TASKS_COUNT_SCOPE, organization_id, total)
+        return AgentTaskList(items=[AgentTaskListResponse.model_validate(task) for task in tasks], total=total, next_cursor=next_cursor)
@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from app.schemas.file import PresignedURLResponse, DirectUploadResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from app.schemas.file import PresignedURLResponse, PresignedURLBatchRequest, PresignedURLBatchResponse, DirectUploadResponse, FileListResponse
 from app.api.utils.deps import get_current_user, verify_worker_api_key
 from app.api.v1.file.service import FileService
+from app.core.config import settings
+from typing import Optional
 import logging
-import uuid
-import uuid
 
 router = APIRouter(prefix="/files")
 logger = logging.getLogger(__name__)
@@ -20,38 +20,97 @@ async def get_presigned_upload_url(
         result = await FileService.get_presigned_upload_url(
             file_key=file_key,
             content_type=content_type,
-            bucket_name="radhe-bucket"
+            bucket_name=settings.STORAGE_BUCKET_NAME
         )
         return result
     except Exception as e:
         logger.error(f"Error generating presigned URL: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/presigned-urls", response_model=PresignedURLBatchResponse)
+async def get_presigned_urls(
+    request: PresignedURLBatchRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Generate pre-signed upload and download URLs for several files in one request, e.g. a multi-file paste"""
+    try:
+        return await FileService.get_presigned_urls(
+            files=request.files,
+            bucket_name=settings.STORAGE_BUCKET_NAME
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating presigned URLs: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # we are creating this endpoint for our external upload and testing, hence not authenticating
 @router.post("/upload", response_model=DirectUploadResponse)
 async def upload_file(
-    file: UploadFile = File(...),
-    bucket_name: str = Form("radhe-bucket"),
-    organization_id: str = Form(...),
+    request: Request,
+    content_addressed: bool = False,
     _: bool = Depends(verify_worker_api_key)
 ):
-    """Upload a file directly to storage through the API"""
+    """
+    Upload a file directly to storage through the API.
+    Form fields: organization_id, optional bucket_name, then file; the body is streamed, never buffered whole.
+    With content_addressed, the file is stored once per organization under its SHA-256 and its URL is immutable.
+    """
     try:
-        # Read file content
-        file_content = await file.read()
-        
-        # Generate a unique file key
-        file_key = f"{organization_id}/{uuid.uuid4()}"
-        
-        # Upload the file
-        result = await FileService.upload_file_direct(
-            file_data=file_content,
-            file_key=file_key,
-            content_type=file.content_type,
-            bucket_name=bucket_name
+        return await FileService.upload_form_stream(
+            chunks=request.stream(),
+            content_type=request.headers.get("content-type"),
+            content_addressed=content_addressed
         )
-        
-        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error uploading file: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/list", response_model=FileListResponse)
+async def list_files(
+    prefix: str = "",
+    delimiter: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """List the organization's files under a prefix, one page at a time; pass delimiter="/" to browse by directory"""
+    try:
+        return await FileService.list_files(
+            organization_id=current_user.organization_id,
+            prefix=prefix,
+            delimiter=delimiter,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing files: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/worker/{organization_id}/list", response_model=FileListResponse)
+async def list_files_worker(
+    organization_id: str,
+    prefix: str = "",
+    delimiter: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Worker variant for enumerating an organization's files, e.g. for garbage collection and quota checks"""
+    try:
+        return await FileService.list_files(
+            organization_id=organization_id,
+            prefix=prefix,
+            delimiter=delimiter,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing files: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,15 @@
 # app/api/v1/file/service.py
 from sqlalchemy.orm import Session
-from app.core.storage import StorageService
-from app.schemas.file import PresignedURLResponse, FileMetadata, DirectUploadResponse
-from app.schemas.file import PresignedURLResponse, FileMetadata, DirectUploadResponse
+from app.api.utils.pagination import encode_cursor, decode_cursor
+from app.core.storage import StorageService, StreamingUpload, ContentAddressedUpload, storage_client
+from app.api.utils.multipart_stream import FormFilePart, stream_form_file
+from typing import AsyncIterator, Dict, List, Optional, Union
+import asyncio
+import uuid
+from app.schemas.file import (
+    PresignedURLResponse, FileMetadata, DirectUploadResponse,
+    PresignedURLBatchItem, PresignedURLBatchEntry, PresignedURLBatchResponse, FileListResponse
+)
 import logging
 from app.core.config import settings
 
@@ -15,7 +22,7 @@ class FileService:
         content_type: str,
         bucket_name: str
     ) -> PresignedURLResponse:
-        """Generate a pre-signed URL for uploading a file"""
+        """Generate a pre-signed URL for uploading a file; signing is local, with no call to storage"""
         # Generate the presigned URL
         storage_service = StorageService(bucket_name=bucket_name)
         result = storage_service.generate_presigned_upload_url(file_key, content_type)
@@ -27,36 +34,91 @@ class FileService:
         )
 
     @staticmethod
-    async def upload_file_direct(
-        file_data: bytes,
-        file_key: str,
-        content_type: str,
+    async def get_presigned_urls(
+        files: List[PresignedURLBatchItem],
         bucket_name: str
+    ) -> PresignedURLBatchResponse:
+        """Presign upload and download URLs for several files at once, all with the shared client"""
+        storage_service = StorageService(bucket_name=bucket_name)
+        urls = storage_service.generate_presigned_urls([file.model_dump() for file in files])
+        return PresignedURLBatchResponse(urls=[PresignedURLBatchEntry(**url) for url in urls])
+
+    @staticmethod
+    async def list_files(
+        organization_id: str,
+        prefix: str = "",
+        delimiter: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        bucket_name: str = settings.STORAGE_BUCKET_NAME
+    ) -> FileListResponse:
+        """
+        List one page of an organization's files, under `prefix` relative to the organization.
+        The cursor wraps the storage continuation token together with the listing it belongs to.
+        """
+        if prefix.startswith("/"):
+            raise ValueError("Prefix cannot start with a slash")
+        full_prefix = f"{organization_id}/{prefix}"
+
+        continuation_token = None
+        if cursor:
+            continuation_token, cursor_prefix, cursor_delimiter = decode_cursor(cursor, 3)
+            if cursor_prefix != full_prefix or cursor_delimiter != delimiter:
+                raise ValueError("Cursor does not belong to this listing")
+
+        storage_service = StorageService(bucket_name=bucket_name)
+        files, directories, next_token = await asyncio.to_thread(
+            storage_service.list_page, full_prefix, delimiter, limit, continuation_token
+        )
+
+        return FileListResponse(
+            files=[
+                FileMetadata(
+                    file_key=file["key"],
+                    file_name=file["key"].rsplit("/", 1)[-1],
+                    size=file["size"],
+                    last_modified=file["last_modified"],
+                    public_url=file["public_url"]
+                )
+                for file in files
+            ],
+            directories=directories,
+            next_cursor=encode_cursor(next_token, full_prefix, delimiter) if next_token else None
+        )
+
+    @staticmethod
+    async def upload_form_stream(
+        chunks: AsyncIterator[bytes],
+        content_type: Optional[str],
+        content_addressed: bool = False
     ) -> DirectUploadResponse:
-        """Upload a file directly to storage service"""
-        try:
-            # Initialize storage service
-            storage_service = StorageService(bucket_name=bucket_name)
-            
-            # Upload the file
-            storage_service.upload_file(
-                file_key=file_key,
-                file_data=file_data,
-                content_type=content_type
-            )
-            
-            # Get the public URL for the uploaded file
-            public_url = storage_service.get_public_url(file_key)
-
-            # If env is development, we will transform the base url from http://minio:9000 to http://localhost:9000
-            if settings.ENVIRONMENT == "development":
-                public_url = public_url.replace(settings.MINIO_HOST, "localhost")
-            
-            return DirectUploadResponse(
-                public_url=public_url,
-                file_key=file_key,
-                size=len(file_data)
-            )
-        except Exception as e:
-            logger.error(f"Error uploading file directly: {e}")
-            raise
+        """
+        Stream a multipart form upload (fields organization_id, optional bucket_name, then file) into storage
+        without holding the file in memory. The fields must come before the file part.
+        Content-addressed uploads are keyed by the file's SHA-256 within the organization and not written again
+        when already stored.
+        """
+        async def open_upload(fields: Dict[str, str], part: FormFilePart) -> Union[StreamingUpload, ContentAddressedUpload]:
+            organization_id = fields.get("organization_id")
+            if not organization_id:
+                raise ValueError("organization_id must be sent before the file")
+            bucket_name = fields.get("bucket_name") or settings.STORAGE_BUCKET_NAME
+            await asyncio.to_thread(storage_client.ensure_bucket, bucket_name)
+            if content_addressed:
+                return ContentAddressedUpload(bucket_name, organization_id, part.content_type)
+            return StreamingUpload(bucket_name, f"{organization_id}/{uuid.uuid4()}", part.content_type)
+
+        _, _, upload = await stream_form_file(chunks, content_type, "file", open_upload)
+
+        public_url = StorageService(bucket_name=upload.bucket_name).get_public_url(upload.file_key)
+        # If env is development, we will transform the base url from http://minio:9000 to http://localhost:9000
+        if settings.ENVIRONMENT == "development":
+            public_url = public_url.replace(settings.MINIO_HOST, "localhost")
+
+        return DirectUploadResponse(
+            public_url=public_url,
+            file_key=upload.file_key,
+            size=upload.size,
+            sha256=getattr(upload, "sha256", None),
+            deduplicated=getattr(upload, "deduplicated", False)
+        )
@@ -1,52 +1,94 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from app.core.storage import MinioClient
+from botocore.exceptions import ClientError
+from app.core.config import settings
+from app.core.storage import MinioClient, StreamingUpload
+from app.api.utils.byte_range import parse_byte_range, format_byte_range
+from app.api.utils.multipart_stream import FormFilePart, stream_form_file
+from typing import AsyncIterator, Dict, Optional
+import asyncio
 import uuid
 from datetime import datetime
-import io
 
 router = APIRouter()
 minio_client = MinioClient()
 
 @router.post("/upload/")
-async def upload_file(file: UploadFile = File(...), bucket: str = "default"):
-    try:
-        # Read file content
-        file_content = await file.read()
-        
+async def upload_file(request: Request, bucket: str = "default"):
+    """Stream the form's file part into the bucket; the body is never held in memory whole"""
+    async def open_upload(fields: Dict[str, str], part: FormFilePart) -> StreamingUpload:
         # Generate unique filename
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else ''
+        filename = part.filename or ""
+        file_extension = filename.split('.')[-1] if '.' in filename else ''
         unique_filename = f"{datetime.now().strftime('%Y%m%d')}_{uuid.uuid4()}.{file_extension}"
-        
-        # Upload to MinIO
-        minio_client.upload_file(
-            bucket_name=bucket,
-            object_name=unique_filename,
-            file_data=file_content,
-            content_type=file.content_type
+        await asyncio.to_thread(minio_client.create_bucket_if_not_exists, bucket)
+        return StreamingUpload(bucket, unique_filename, part.content_type)
+
+    try:
+        _, part, upload = await stream_form_file(
+            request.stream(), request.headers.get("content-type"), "file", open_upload
         )
-        
         return {
-            "filename": unique_filename,
+            "filename": upload.file_key,
             "bucket": bucket,
-            "content_type": file.content_type,
-            "size": len(file_content)
+            "content_type": part.content_type,
+            "size": upload.size
         }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _stream_body(body) -> AsyncIterator[bytes]:
+    """Relay an object body in fixed-size chunks, closing it (and releasing its connection) however the response ends"""
+    try:
+        while True:
+            chunk = await asyncio.to_thread(body.read, settings.STORAGE_DOWNLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        body.close()
+
+
 @router.get("/download/{bucket}/{filename}")
-async def download_file(bucket: str, filename: str):
+async def download_file(bucket: str, filename: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """Stream an object; a single-range Range header gets a 206 with just those bytes (video seeking)"""
     try:
-        file_data = minio_client.get_file(bucket, filename)
-        
-        return StreamingResponse(
-            io.BytesIO(file_data),
-            media_type="application/octet-stream",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
+        byte_range = parse_byte_range(range_header)
+        response = await asyncio.to_thread(
+            minio_client.open_file, bucket, filename, format_byte_range(byte_range) if byte_range else None
         )
     except Exception as e:
-        raise HTTPException(status_code=404, detail=str(e))
+        unsatisfiable = isinstance(e, ValueError) or (
+            isinstance(e, ClientError) and e.response["Error"]["Code"] == "InvalidRange"
+        )
+        if not unsatisfiable:
+            raise HTTPException(status_code=404, detail=str(e))
+        try:
+            size = await asyncio.to_thread(minio_client.get_file_size, bucket, filename)
+        except Exception as head_error:
+            raise HTTPException(status_code=404, detail=str(head_error))
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Content-Length": str(response["ContentLength"]),
+        "Accept-Ranges": "bytes",
+    }
+    if response.get("ETag"):
+        headers["ETag"] = response["ETag"]
+    if response.get("CacheControl"):
+        headers["Cache-Control"] = response["CacheControl"]
+    if response.get("ContentRange"):
+        headers["Content-Range"] = response["ContentRange"]
+
+    return StreamingResponse(
+        _stream_body(response["Body"]),
+        status_code=206 if response.get("ContentRange") else 200,
+        media_type=response.get("ContentType") or "application/octet-stream",
+        headers=headers
+    )
 
 @router.delete("/{bucket}/{filename}")
 async def delete_file(bucket: str, filename: str):
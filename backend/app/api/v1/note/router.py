@@ -1,20 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Tuple
-from app.db.base import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Tuple
+from app.db.base import get_async_db
 from app.schemas.note import (
     NoteCreate,
     NoteSuggest, 
+    NoteSuggestBatch,
     NoteUpdate, 
     NoteResponse, 
     NoteMoveRequest,
     NoteListResponse,
     NoteDetailResponse,
-    NoteWSResponse,
-    NoteWSUpdate,
+    NoteTreeResponse,
+    NoteVersionResponse,
+    NoteVersionDetailResponse,
+    NoteSearchResult,
+    NoteTypeaheadResult,
+    NoteSemanticIndexRequest,
+    NoteSemanticSearchRequest,
+    NoteChunkMatch,
+    RelatedNoteResponse,
+    NoteReferenceRequest,
 )
 from app.api.utils.deps import get_current_user, verify_worker_api_key
 from app.api.v1.note.service import NoteService
+from app.api.v1.note.version_service import NoteVersionService
+from app.api.v1.note.semantic_service import SemanticIndexService
+from app.api.v1.note.write_buffer import ws_write_buffer
+from app.core.cache import note_cache
+from app.api.utils.etag import etag_matches, not_modified, set_etag
+from app.api.utils.yjs_state import frame_updates
 import logging
 import base64
 
@@ -25,7 +40,7 @@ logger = logging.getLogger(__name__)
 @router.post("/", response_model=NoteResponse)
 async def create_note(
     note_data: NoteCreate | NoteSuggest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     try:
@@ -34,21 +49,35 @@ async def create_note(
         logger.error(f"Error creating note: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while creating the note")
 
-@router.get("/root", response_model=Tuple[List[NoteResponse], int])
+@router.get("/root", response_model=Tuple[List[NoteResponse], Optional[int], Optional[str]])
 async def list_root_notes(
+    response: Response,
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None, description="Cursor from a previous page; takes precedence over skip"),
+    include_total: bool = Query(default=True),
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
-    """Get paginated root level notes with their immediate children"""
+    """Get paginated root level notes as (notes, total, next_cursor)"""
     try:
-        return await NoteService.list_root_notes(
+        notes, total, next_cursor = await NoteService.list_root_notes(
             db, 
             current_user.organization_id,
             skip,
-            limit
+            limit,
+            cursor,
+            include_total
         )
+        etag = NoteService.get_root_notes_etag(notes, total, next_cursor)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
+        return notes, total, next_cursor
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing root notes: {str(e)}")
         raise HTTPException(
@@ -59,7 +88,7 @@ async def list_root_notes(
 @router.post("/ai/create", response_model=NoteResponse)
 async def suggest_note(
     note_data: NoteSuggest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_worker_api_key)
 ):
     try:
@@ -68,24 +97,139 @@ async def suggest_note(
         logger.error(f"Error suggesting note: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while suggesting the note")
 
+@router.post("/ai/create/batch", response_model=List[NoteResponse])
+async def suggest_notes(
+    batch: NoteSuggestBatch,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Create several suggestion notes under one parent in a single transaction"""
+    try:
+        return await NoteService.create_suggestion_notes(db, batch)
+    except Exception as e:
+        logger.error(f"Error suggesting notes: {str(e)}")
+        raise HTTPException(status_code=500, detail="An error occurred while suggesting the notes")
+
+@router.post("/worker/{organization_id}/reconcile-children-count")
+async def reconcile_children_counts(
+    organization_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Recompute children_count for all notes of an organization"""
+    try:
+        updated = await NoteService.reconcile_children_counts(db, organization_id)
+        return {"status": "success", "updated": updated}
+    except Exception as e:
+        logger.error(f"Error reconciling children count: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while reconciling children count"
+        )
+
+@router.post("/worker/{organization_id}/reference-notes", response_model=List[NoteDetailResponse])
+async def get_reference_notes(
+    organization_id: str,
+    request: NoteReferenceRequest,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Get notes selected as agent references together with all their descendants, in document order"""
+    try:
+        return await NoteService.get_reference_notes(db, organization_id, request.note_ids, request.limit)
+    except Exception as e:
+        logger.error(f"Error getting reference notes: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while getting reference notes"
+        )
+
+@router.get("/cache/stats")
+async def get_note_cache_stats(
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Hit rates of the note detail and children caches"""
+    try:
+        return await note_cache.stats()
+    except Exception as e:
+        logger.error(f"Error getting note cache stats: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while getting note cache stats"
+        )
+
+@router.get("/search", response_model=Tuple[List[NoteSearchResult], Optional[str]])
+async def search_notes(
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms; supports quotes, OR and -exclusions"),
+    limit: int = Query(default=20, ge=1, le=50),
+    cursor: Optional[str] = Query(default=None, description="Cursor from a previous page"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Search note titles and content, best matches first, as (results, next_cursor)"""
+    try:
+        return await NoteService.search_notes(
+            db,
+            current_user.organization_id,
+            q,
+            limit,
+            cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching notes: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while searching notes"
+        )
+
+@router.get("/typeahead", response_model=List[NoteTypeaheadResult])
+async def typeahead_notes(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(default=10, ge=1, le=20),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Best title matches for sidebar quick-jump, meant to be called on every debounced keystroke"""
+    try:
+        return await NoteService.typeahead_notes(db, current_user.organization_id, q, limit)
+    except Exception as e:
+        logger.error(f"Error matching note titles: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while matching note titles"
+        )
+
 @router.get("/{note_id}", response_model=NoteDetailResponse)
 async def get_note(
     note_id: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     try:
-        return await NoteService.get_note(db, note_id, current_user.organization_id)
+        note = await NoteService.get_note(db, note_id, current_user.organization_id)
     except Exception as e:
         logger.error(f"Error getting note: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while getting the note")
+    
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    
+    etag = NoteService.get_note_etag(note)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    return note
 
 
 @router.put("/{note_id}", response_model=NoteResponse)
 async def update_note(
     note_id: str,
     note_data: NoteUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     try:
@@ -97,7 +241,7 @@ async def update_note(
 @router.delete("/{note_id}")
 async def delete_note(
     note_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     try:
@@ -109,16 +253,24 @@ async def delete_note(
 @router.get("/{note_id}/children", response_model=List[NoteListResponse])
 async def get_children(
     note_id: str,
-    db: Session = Depends(get_db),
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """Get immediate children of a specific note"""
     try:
-        return await NoteService.get_children(
+        children = await NoteService.get_children(
             db, 
             note_id, 
             current_user.organization_id
         )
+        etag = NoteService.get_children_etag(note_id, children)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        set_etag(response, etag)
+        
+        return children
     except Exception as e:
         logger.error(f"Error getting note children: {str(e)}")
         raise HTTPException(
@@ -126,11 +278,36 @@ async def get_children(
             detail="An error occurred while getting note children"
         )
 
+@router.get("/{note_id}/subtree", response_model=NoteTreeResponse)
+async def get_subtree(
+    note_id: str,
+    max_depth: Optional[int] = Query(default=None, ge=0, description="Levels below the note to include"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Get a note and its descendants as a nested tree in a single query"""
+    try:
+        tree = await NoteService.get_subtree(
+            db,
+            note_id,
+            current_user.organization_id,
+            max_depth
+        )
+    except Exception as e:
+        logger.error(f"Error getting note subtree: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while getting the note subtree"
+        )
+    if not tree:
+        raise HTTPException(status_code=404, detail="Note not found")
+    return tree
+
 @router.patch("/{note_id}/move", response_model=NoteResponse)
 async def move_note(
     note_id: str,
     move_data: NoteMoveRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """Move a note to a new parent or to root level"""
@@ -164,7 +341,7 @@ async def move_note(
 async def patch_note(
     note_id: str,
     note_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user = Depends(get_current_user)
 ):
     """Partially update a note with specific fields"""
@@ -176,6 +353,12 @@ async def patch_note(
             current_user.id, 
             current_user.organization_id
         )
+    except ValueError as e:
+        logger.error(f"Invalid patch operation: {str(e)}")
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error patching note: {str(e)}")
         raise HTTPException(
@@ -183,41 +366,273 @@ async def patch_note(
             detail="An error occurred while patching the note"
         )
 
-@router.get("/ws/{note_id}", response_model=NoteWSResponse)
+@router.get("/{note_id}/related", response_model=List[RelatedNoteResponse])
+async def get_related_notes(
+    note_id: str,
+    limit: int = Query(default=5, ge=1, le=20),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Notes whose content is semantically closest to this note"""
+    try:
+        return await SemanticIndexService.related_notes(db, note_id, current_user.organization_id, limit)
+    except Exception as e:
+        logger.error(f"Error getting related notes: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while getting related notes"
+        )
+
+@router.get("/{note_id}/versions", response_model=Tuple[List[NoteVersionResponse], Optional[str]])
+async def list_note_versions(
+    note_id: str,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None, description="Cursor from a previous page"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Get a note's version history, newest first, as (versions, next_cursor)"""
+    try:
+        return await NoteVersionService.list_versions(
+            db,
+            note_id,
+            current_user.organization_id,
+            limit,
+            cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing note versions: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while listing note versions"
+        )
+
+@router.get("/{note_id}/versions/{version}", response_model=NoteVersionDetailResponse)
+async def get_note_version(
+    note_id: str,
+    version: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Get one version of a note, including its content"""
+    try:
+        note_version = await NoteVersionService.get_version(db, note_id, version, current_user.organization_id)
+    except Exception as e:
+        logger.error(f"Error getting note version: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while getting the note version"
+        )
+
+    if not note_version:
+        raise HTTPException(status_code=404, detail="Note version not found")
+
+    return note_version
+
+@router.post("/{note_id}/versions/{version}/restore", response_model=NoteResponse)
+async def restore_note_version(
+    note_id: str,
+    version: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user = Depends(get_current_user)
+):
+    """Restore a note to a version; the state it replaces is kept as a new version"""
+    try:
+        note = await NoteVersionService.restore_version(
+            db,
+            note_id,
+            version,
+            current_user.organization_id,
+            current_user.id
+        )
+    except Exception as e:
+        logger.error(f"Error restoring note version: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while restoring the note version"
+        )
+
+    if not note:
+        raise HTTPException(status_code=404, detail="Note version not found")
+
+    return note
+
+@router.get("/ws/{note_id}")
 async def get_note_ws_content(
     note_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Get note content for WebSocket collaboration"""
+    """
+    Get note's Yjs state for WebSocket collaboration as application/octet-stream:
+    the snapshot followed by logged updates, each prefixed with its 4-byte big-endian length.
+    X-Yjs-Log-Watermark is the last logged update included; pass it back when saving the full state.
+    """
     try:
-        note = await NoteService.get_note_ws_content(db, note_id)
-        if not note:
-            raise HTTPException(status_code=404, detail="Note not found")
-        return note
+        content = await NoteService.get_note_ws_content(db, note_id)
     except Exception as e:
         logger.error(f"Error getting note WS content: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail="An error occurred while getting note WS content"
         )
+    
+    if content is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    
+    # Saves acknowledged by this process but not flushed yet; they land in the log after the watermark
+    updates, watermark = content
+    buffered = ws_write_buffer.pending(note_id)
+    if buffered:
+        updates = [*updates, buffered]
+    
+    if not updates:
+        return Response(status_code=204)
+    
+    return Response(
+        content=frame_updates(updates),
+        media_type="application/octet-stream",
+        headers={"X-Yjs-Update-Count": str(len(updates)), "X-Yjs-Log-Watermark": str(watermark)}
+    )
 
 @router.post("/ws/{note_id}/update")
 async def update_note_ws_content(
     note_id: str,
-    update_data: NoteWSUpdate,
-    db: Session = Depends(get_db),
+    request: Request,
+    watermark: Optional[int] = Query(default=None, ge=0, description="X-Yjs-Log-Watermark of the load the state was built on"),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Update note content from WebSocket collaboration"""
+    """
+    Save note's full Yjs state from WebSocket collaboration; the body is the raw state (application/octet-stream).
+    The state is merged into the stored one, and logged updates up to `watermark` are dropped as covered by it.
+    """
+    state = await request.body()
+    if not state:
+        raise HTTPException(status_code=400, detail="Empty collaboration state")
+    
     try:
-        await NoteService.update_note_ws_content(
-            db,
-            note_id,
-            update_data.update
-        )
+        if ws_write_buffer.enabled:
+            await ws_write_buffer.put_update(note_id, state, watermark)
+            return {"status": "success", "buffered": True}
+        await NoteService.update_note_ws_content(db, note_id, state, watermark)
         return {"status": "success"}
     except Exception as e:
         logger.error(f"Error updating note WS content: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail="An error occurred while updating note WS content"
-        )
\ No newline at end of file
+        )
+
+@router.post("/ws/{note_id}/append")
+async def append_note_ws_update(
+    note_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Append an incremental Yjs update from WebSocket collaboration; the body is the raw update (application/octet-stream)"""
+    update = await request.body()
+    if not update:
+        raise HTTPException(status_code=400, detail="Empty collaboration update")
+    
+    try:
+        if ws_write_buffer.enabled:
+            await ws_write_buffer.put_update(note_id, update)
+            return {"status": "success", "buffered": True}
+        compaction_scheduled = await NoteService.append_note_ws_update(db, note_id, update)
+    except Exception as e:
+        logger.error(f"Error appending note WS update: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while appending note WS update"
+        )
+    
+    if compaction_scheduled is None:
+        raise HTTPException(status_code=404, detail="Note not found")
+    
+    return {"status": "success", "compaction_scheduled": compaction_scheduled}
+
+@router.post("/worker/ws/{note_id}/compact")
+async def compact_note_ws_updates(
+    note_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Merge a note's logged Yjs updates into its snapshot"""
+    try:
+        merged = await NoteService.compact_note_ws_updates(db, note_id)
+        return {"status": "success", "merged": merged}
+    except Exception as e:
+        logger.error(f"Error compacting note WS updates: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while compacting note WS updates"
+        )
+
+@router.post("/worker/derive-content")
+async def derive_note_contents(
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Derive markdown content from collaboration state for the notes that are due"""
+    try:
+        updated, next_batch_in = await NoteService.derive_note_contents(db)
+        return {"status": "success", "updated": updated, "next_batch_in": next_batch_in}
+    except Exception as e:
+        logger.error(f"Error deriving note content: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while deriving note content"
+        )
+
+@router.post("/worker/semantic-index")
+async def index_notes(
+    request: NoteSemanticIndexRequest,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Re-embed the chunks of notes whose title or content changed"""
+    try:
+        embedded = await SemanticIndexService.index_notes(db, request.note_ids)
+        return {"status": "success", "embedded": embedded}
+    except Exception as e:
+        logger.error(f"Error indexing notes: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while indexing notes"
+        )
+
+@router.post("/worker/{organization_id}/semantic-index/rebuild")
+async def rebuild_semantic_index(
+    organization_id: str,
+    after_id: Optional[str] = Query(default=None, description="next_after_id from the previous batch"),
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Index one batch of an organization's notes; call again with next_after_id until it is null"""
+    try:
+        embedded, next_after_id = await SemanticIndexService.index_organization(db, organization_id, after_id)
+        return {"status": "success", "embedded": embedded, "next_after_id": next_after_id}
+    except Exception as e:
+        logger.error(f"Error rebuilding semantic index: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while rebuilding the semantic index"
+        )
+
+@router.post("/worker/{organization_id}/semantic-search", response_model=List[List[NoteChunkMatch]])
+async def semantic_search(
+    organization_id: str,
+    request: NoteSemanticSearchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    _: bool = Depends(verify_worker_api_key)
+):
+    """Top-k note chunks for each query, in query order, for agent retrieval"""
+    try:
+        return await SemanticIndexService.search(db, organization_id, request.queries, request.k)
+    except Exception as e:
+        logger.error(f"Error searching semantic index: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="An error occurred while searching the semantic index"
+        )
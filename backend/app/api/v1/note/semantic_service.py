@@ -0,0 +1,269 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.models.note import Note, NoteChunk, Vector
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.schemas.note import NoteChunkMatch, RelatedNoteResponse
+from app.services.embeddings import BaseEmbedder, initialize_embedder, chunk_note
+from collections import defaultdict
+import asyncio
+import hashlib
+import logging
+import sqlalchemy
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = 256
+RELATED_NOTES_MAX_PROBES = 16  # Chunks of the source note used as queries for related notes
+
+_embedder: Optional[BaseEmbedder] = None
+
+
+def get_embedder() -> BaseEmbedder:
+    global _embedder
+    if _embedder is None:
+        _embedder = initialize_embedder(settings.SEMANTIC_EMBEDDER_PROVIDER, settings.SEMANTIC_EMBEDDER_MODEL)
+    return _embedder
+
+
+def vector_literal(vector: List[float]) -> str:
+    """pgvector's text form of a vector"""
+    return "[" + ",".join(f"{value:.6g}" for value in vector) + "]"
+
+
+def _as_vector(value) -> sqlalchemy.ColumnElement:
+    return sqlalchemy.cast(value, Vector(settings.SEMANTIC_EMBEDDING_DIMENSIONS))
+
+
+class SemanticIndexService:
+    @staticmethod
+    async def schedule(note_ids: Iterable[str]) -> None:
+        """Queue notes whose title or content changed for re-embedding; publishing runs off the event loop"""
+        note_ids = [note_id for note_id in note_ids if note_id]
+        if not settings.SEMANTIC_INDEX_ENABLED or not note_ids:
+            return
+        try:
+            await asyncio.to_thread(celery_app.send_task, 'index_note_chunks', args=[note_ids])
+        except Exception as e:
+            # The index catches up on the note's next write or the next backfill
+            logger.error(f"Error scheduling semantic indexing of notes {note_ids}: {str(e)}")
+
+    @staticmethod
+    async def index_notes(
+        db: AsyncSession,
+        note_ids: List[str]
+    ) -> int:
+        """
+        Re-chunk the given notes and store chunk embeddings, embedding only chunks whose text is new.
+        Returns the number of chunks embedded.
+        """
+        notes = (await db.execute(
+            sqlalchemy.select(Note.id, Note.organization_id, Note.title, Note.content)
+            .where(Note.id.in_(note_ids))
+        )).all()
+        if not notes:
+            return 0
+
+        max_words = settings.SEMANTIC_CHUNK_WORDS
+        chunks = await asyncio.to_thread(
+            lambda: {note.id: chunk_note(note.title, note.content, max_words) for note in notes}
+        )
+        # The embedder is part of the hash, so switching it re-embeds everything on the next rebuild
+        embedder_name = f"{settings.SEMANTIC_EMBEDDER_PROVIDER}:{settings.SEMANTIC_EMBEDDER_MODEL}"
+        hashes = {
+            note_id: [hashlib.sha256(f"{embedder_name}\n{text}".encode("utf-8")).hexdigest() for text in texts]
+            for note_id, texts in chunks.items()
+        }
+
+        existing = defaultdict(list)
+        reusable: Dict[str, str] = {}
+        for row in (await db.execute(
+            sqlalchemy.select(
+                NoteChunk.note_id, NoteChunk.content_hash,
+                sqlalchemy.cast(NoteChunk.embedding, sqlalchemy.Text).label("embedding")
+            )
+            .where(NoteChunk.note_id.in_([note.id for note in notes]))
+            .order_by(NoteChunk.note_id, NoteChunk.chunk_index)
+        )).all():
+            existing[row.note_id].append(row.content_hash)
+            reusable[row.content_hash] = row.embedding
+
+        changed = [note for note in notes if hashes[note.id] != existing[note.id]]
+        if not changed:
+            return 0
+
+        pending = {}
+        for note in changed:
+            for text, content_hash in zip(chunks[note.id], hashes[note.id]):
+                if content_hash not in reusable:
+                    pending[content_hash] = text
+
+        embedder = get_embedder()
+        pending_hashes = list(pending)
+        for start in range(0, len(pending_hashes), EMBED_BATCH_SIZE):
+            batch = pending_hashes[start:start + EMBED_BATCH_SIZE]
+            # Embedding is CPU bound locally and blocking remotely; keep it off the event loop
+            vectors = await asyncio.to_thread(embedder.embed, [pending[content_hash] for content_hash in batch])
+            for content_hash, vector in zip(batch, vectors):
+                # Text without a single word has no direction to compare against
+                if any(vector):
+                    reusable[content_hash] = vector_literal(vector)
+
+        rows = [
+            {
+                "chunk_note_id": note.id,
+                "chunk_organization_id": note.organization_id,
+                "chunk_position": position,
+                "chunk_content": text,
+                "chunk_content_hash": content_hash,
+                "chunk_embedding": reusable[content_hash],
+            }
+            for note in changed
+            for position, (text, content_hash) in enumerate(zip(chunks[note.id], hashes[note.id]))
+            if content_hash in reusable
+        ]
+
+        await db.execute(
+            sqlalchemy.delete(NoteChunk).where(NoteChunk.note_id.in_([note.id for note in changed]))
+        )
+        if rows:
+            await db.execute(
+                sqlalchemy.insert(NoteChunk).values(
+                    note_id=sqlalchemy.bindparam("chunk_note_id"),
+                    organization_id=sqlalchemy.bindparam("chunk_organization_id"),
+                    chunk_index=sqlalchemy.bindparam("chunk_position"),
+                    content=sqlalchemy.bindparam("chunk_content"),
+                    content_hash=sqlalchemy.bindparam("chunk_content_hash"),
+                    embedding=_as_vector(sqlalchemy.bindparam("chunk_embedding", type_=sqlalchemy.String))
+                ),
+                rows
+            )
+        await db.commit()
+
+        logger.info(f"Indexed {len(changed)} notes: {len(rows)} chunks, {len(pending)} embedded")
+        return len(pending)
+
+    @staticmethod
+    async def index_organization(
+        db: AsyncSession,
+        organization_id: str,
+        after_id: Optional[str] = None,
+        limit: int = 200
+    ) -> Tuple[int, Optional[str]]:
+        """Index one batch of an organization's notes in id order, for backfills. Returns (chunks embedded, next after_id)"""
+        query = sqlalchemy.select(Note.id).where(Note.organization_id == organization_id)
+        if after_id:
+            query = query.where(Note.id > after_id)
+        note_ids = (await db.execute(query.order_by(Note.id.asc()).limit(limit))).scalars().all()
+
+        if not note_ids:
+            return 0, None
+
+        embedded = await SemanticIndexService.index_notes(db, note_ids)
+        return embedded, note_ids[-1] if len(note_ids) == limit else None
+
+    @staticmethod
+    async def _nearest(
+        db: AsyncSession,
+        organization_id: str,
+        embeddings: List[str],
+        k: int
+    ) -> List[List[sqlalchemy.Row]]:
+        """Top-k chunks of the organization for each embedding, all probes answered by one query"""
+        # The HNSW scan filters by organization afterwards; keep scanning until k rows of it are found
+        await db.execute(sqlalchemy.text(f"SET LOCAL hnsw.ef_search = {int(max(settings.SEMANTIC_INDEX_EF_SEARCH, k))}"))
+        await db.execute(sqlalchemy.text("SET LOCAL hnsw.iterative_scan = relaxed_order"))
+
+        probes = sqlalchemy.values(
+            sqlalchemy.column("position", sqlalchemy.Integer),
+            sqlalchemy.column("embedding", sqlalchemy.String),
+            name="probes"
+        ).data(list(enumerate(embeddings)))
+        distance = NoteChunk.embedding.op("<=>", return_type=sqlalchemy.Float)(_as_vector(probes.c.embedding))
+        nearest = (
+            sqlalchemy.select(NoteChunk.note_id, NoteChunk.chunk_index, NoteChunk.content, distance.label("distance"))
+            .where(NoteChunk.organization_id == organization_id)
+            .order_by(distance)
+            .limit(k)
+            .lateral("nearest")
+        )
+
+        rows = (await db.execute(
+            sqlalchemy.select(
+                probes.c.position, nearest.c.note_id, nearest.c.chunk_index, nearest.c.content,
+                nearest.c.distance, Note.title, Note.path, Note.depth
+            )
+            .select_from(probes)
+            .join(nearest, sqlalchemy.true())
+            .join(Note, Note.id == nearest.c.note_id)
+            .order_by(probes.c.position, nearest.c.distance)
+        )).all()
+
+        results = [[] for _ in embeddings]
+        for row in rows:
+            results[row.position].append(row)
+        return results
+
+    @staticmethod
+    async def search(
+        db: AsyncSession,
+        organization_id: str,
+        queries: List[str],
+        k: int = 5
+    ) -> List[List[NoteChunkMatch]]:
+        """Top-k chunks by cosine similarity for each query, in query order"""
+        vectors = await asyncio.to_thread(get_embedder().embed, queries)
+        probes = [(position, vector_literal(vector)) for position, vector in enumerate(vectors) if any(vector)]
+
+        results: List[List[NoteChunkMatch]] = [[] for _ in queries]
+        if not probes:
+            return results
+
+        nearest = await SemanticIndexService._nearest(db, organization_id, [embedding for _, embedding in probes], k)
+        for (position, _), rows in zip(probes, nearest):
+            results[position] = [
+                NoteChunkMatch(
+                    note_id=row.note_id,
+                    title=row.title,
+                    path=row.path,
+                    chunk_index=row.chunk_index,
+                    content=row.content,
+                    score=1 - row.distance
+                )
+                for row in rows
+            ]
+        return results
+
+    @staticmethod
+    async def related_notes(
+        db: AsyncSession,
+        note_id: str,
+        organization_id: str,
+        limit: int = 5
+    ) -> List[RelatedNoteResponse]:
+        """Notes with chunks closest to any chunk of the given note, best match first"""
+        embeddings = (await db.execute(
+            sqlalchemy.select(sqlalchemy.cast(NoteChunk.embedding, sqlalchemy.Text))
+            .where(
+                NoteChunk.note_id == note_id,
+                NoteChunk.organization_id == organization_id
+            )
+            .order_by(NoteChunk.chunk_index.asc())
+            .limit(RELATED_NOTES_MAX_PROBES)
+        )).scalars().all()
+
+        if not embeddings:
+            return []
+
+        # Chunks of the note itself come back first; ask for enough to fill the page without them
+        best: Dict[str, sqlalchemy.Row] = {}
+        for rows in await SemanticIndexService._nearest(db, organization_id, embeddings, limit + RELATED_NOTES_MAX_PROBES):
+            for row in rows:
+                if row.note_id != note_id and (row.note_id not in best or row.distance < best[row.note_id].distance):
+                    best[row.note_id] = row
+
+        ranked = sorted(best.values(), key=lambda row: row.distance)[:limit]
+        return [
+            RelatedNoteResponse(id=row.note_id, title=row.title, path=row.path, depth=row.depth, score=1 - row.distance)
+            for row in ranked
+        ]
@@ -1,24 +1,56 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional, Tuple
-from app.models.note import Note
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from typing import Dict, List, Optional, Tuple
+from app.models.note import Note, NoteYjsUpdate, NOTE_SEARCH_CONFIG
 from app.models.agent_task import AgentTask, agent_task_modified_notes, agent_task_reference_notes
-from app.schemas.note import NoteCreate, NoteUpdate, NoteResponse, NoteMoveRequest, NoteListResponse, NoteDetailResponse, NoteWSResponse, NoteSuggest
+from app.api.utils.fractional_index import key_between, keys_between
+from app.api.utils.pagination import encode_cursor, decode_cursor, total_count_cache
+from app.api.utils.etag import make_etag
+from app.api.utils.yjs_state import encode_state, decode_state, coalesce_updates, state_to_markdown
+from app.core.content_queue import content_derivation_queue
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.cache import note_cache
+from app.api.v1.note.version_service import NoteVersionService
+from app.api.v1.note.semantic_service import SemanticIndexService
+from pydantic import TypeAdapter
+from app.schemas.note import NoteCreate, NoteUpdate, NoteResponse, NoteMoveRequest, NoteListResponse, NoteDetailResponse, NoteSuggest, NoteSuggestBatch, NoteTreeResponse, NoteSearchResult, NoteBreadcrumb, NoteTypeaheadResult
+import asyncio
 import uuid
 from sqlalchemy import func
-import base64
+from collections import defaultdict
+from datetime import datetime, timezone
 import logging
 import sqlalchemy
 
 logger = logging.getLogger(__name__)
 
+ROOT_NOTES_COUNT_SCOPE = "root_notes"
+CHILDREN_ADAPTER = TypeAdapter(List[NoteListResponse])
+ROOT_NOTES_ADAPTER = TypeAdapter(List[NoteResponse])
+SEARCH_TITLE_HEADLINE = "HighlightAll=true, StartSel=<mark>, StopSel=</mark>"
+SEARCH_SNIPPET_HEADLINE = 'MaxFragments=2, MaxWords=20, MinWords=8, StartSel=<mark>, StopSel=</mark>, FragmentDelimiter=" … "'
+
+
+TYPEAHEAD_FUZZY_MIN_LENGTH = 3  # Below this a query has no trigram of its own, so only title prefixes are matched
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _escape_html(text):
+    """HTML-escape a text column in SQL, so highlights can be rendered as markup"""
+    for character, entity in (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;")):
+        text = func.replace(text, character, entity)
+    return text
+
 class NoteService:
-    POSITION_GAP = 1000  # Gap between positions
-    MIN_GAP = 100  # Minimum gap before rebalancing
-    MAX_POSITION = 2147483647  # Max value for INTEGER in PostgreSQL
+    SORT_KEY_MAX_LENGTH = 128  # Respread sibling keys once repeated same-spot inserts grow a key past this
     
     @staticmethod
     async def create_note(
-        db: Session,
+        db: AsyncSession,
         note_data: NoteCreate | NoteSuggest,
         user_id: str,
         organization_id: str
@@ -26,17 +58,17 @@ class NoteService:
         note_id = str(uuid.uuid4())
         path = note_id
         depth = 0
+        parent = None
         
         if note_data.parent_id:
-            parent = db.query(Note).filter(Note.id == note_data.parent_id).first()
+            # Increment parent's children count in the database and read its path in the same statement
+            parent = await NoteService._adjust_children_count(db, note_data.parent_id, organization_id, 1)
             if parent:
                 path = f"{parent.path}.{note_id}"
                 depth = parent.depth + 1
-                # Increment parent's children count
-                parent.children_count += 1
         
-        # Calculate position for the new note (always append to end)
-        position = await NoteService.calculate_position(
+        # Calculate sort key for the new note (always append to end)
+        sort_key = await NoteService.calculate_sort_key(
             db,
             parent_id=note_data.parent_id,
             organization_id=organization_id
@@ -53,16 +85,18 @@ class NoteService:
             path=path,
             depth=depth,
             children_count=0,
-            position=position  # Set the calculated position
+            sort_key=sort_key  # Set the calculated sort key
         )
         
         db.add(db_note)
         
         if isinstance(note_data, NoteSuggest) and note_data.agent_task_id:
-            agent_task = db.query(AgentTask).filter(
-                AgentTask.id == note_data.agent_task_id,
-                AgentTask.organization_id == organization_id
-            ).first()
+            agent_task = (await db.execute(
+                sqlalchemy.select(AgentTask).where(
+                    AgentTask.id == note_data.agent_task_id,
+                    AgentTask.organization_id == organization_id
+                )
+            )).scalar_one_or_none()
             if agent_task:
                 if agent_task.modified_notes and isinstance(agent_task.modified_notes, list) and db_note not in agent_task.modified_notes:
                     agent_task.modified_notes.append(db_note)
@@ -71,45 +105,141 @@ class NoteService:
             else:
                 logger.warning(f"Agent task {note_data.agent_task_id} not found or doesn't belong to organization {organization_id}")
 
-        db.commit()
-        db.refresh(db_note)
+        await db.commit()
+        await db.refresh(db_note)
+        
+        if not db_note.parent_id:
+            total_count_cache.invalidate(ROOT_NOTES_COUNT_SCOPE, organization_id)
+        elif parent:
+            # The parent's children list and count changed, and so did its entry in the grandparent's list
+            await note_cache.invalidate(
+                organization_id,
+                note_ids=[db_note.parent_id],
+                children_of=[db_note.parent_id, parent.parent_id]
+            )
+        await SemanticIndexService.schedule([db_note.id])
         
         return NoteResponse.model_validate(db_note)
 
+    @staticmethod
+    async def create_suggestion_notes(
+        db: AsyncSession,
+        batch: NoteSuggestBatch
+    ) -> List[NoteResponse]:
+        """
+        Append several suggestion notes under one parent in a single transaction.
+        Sort keys come from one sibling lookup, and notes and task links are each written with one bulk INSERT.
+        """
+        organization_id = batch.organization_id
+        note_ids = [str(uuid.uuid4()) for _ in batch.notes]
+        parent_path = None
+        depth = 0
+        parent = None
+        
+        if batch.parent_id:
+            parent = await NoteService._adjust_children_count(db, batch.parent_id, organization_id, len(note_ids))
+            if parent:
+                parent_path = parent.path
+                depth = parent.depth + 1
+        
+        # One lookup for the first key, the rest follow it at the end of the list
+        first_sort_key = await NoteService.calculate_sort_key(
+            db,
+            parent_id=batch.parent_id,
+            organization_id=organization_id
+        )
+        sort_keys = [first_sort_key, *keys_between(first_sort_key, None, len(note_ids) - 1)]
+        
+        notes = (await db.execute(
+            sqlalchemy.insert(Note).returning(Note),
+            [
+                {
+                    "id": note_id,
+                    "title": item.title,
+                    "content": item.content,
+                    "suggestion_content": item.suggestion_content,
+                    "parent_id": batch.parent_id,
+                    "organization_id": organization_id,
+                    "created_by": batch.user_id,
+                    "path": f"{parent_path}.{note_id}" if parent_path else note_id,
+                    "depth": depth,
+                    "children_count": 0,
+                    "sort_key": sort_key,
+                }
+                for note_id, item, sort_key in zip(note_ids, batch.notes, sort_keys)
+            ]
+        )).scalars().all()
+        
+        if batch.agent_task_id:
+            agent_task_id = (await db.execute(
+                sqlalchemy.select(AgentTask.id).where(
+                    AgentTask.id == batch.agent_task_id,
+                    AgentTask.organization_id == organization_id
+                )
+            )).scalar()
+            if agent_task_id:
+                await db.execute(
+                    sqlalchemy.insert(agent_task_modified_notes),
+                    [{"agent_task_id": agent_task_id, "note_id": note_id} for note_id in note_ids]
+                )
+            else:
+                logger.warning(f"Agent task {batch.agent_task_id} not found or doesn't belong to organization {organization_id}")
+        
+        await db.commit()
+        
+        if not batch.parent_id:
+            total_count_cache.invalidate(ROOT_NOTES_COUNT_SCOPE, organization_id)
+        elif parent:
+            await note_cache.invalidate(
+                organization_id,
+                note_ids=[batch.parent_id],
+                children_of=[batch.parent_id, parent.parent_id]
+            )
+        
+        await SemanticIndexService.schedule(note_ids)
+        
+        notes = sorted(notes, key=lambda note: note.sort_key)
+        return [NoteResponse.model_validate(note) for note in notes]
+
     @staticmethod
     async def get_note(
-        db: Session,
+        db: AsyncSession,
         note_id: str,
         organization_id: str
     ) -> Optional[NoteDetailResponse]:
-        note = (
-            db.query(Note)
-            .filter(
+        cached, generation = await note_cache.get(organization_id, note_cache.NOTE, note_id)
+        if cached is not None:
+            return NoteDetailResponse.model_validate_json(cached)
+        
+        note = (await db.execute(
+            sqlalchemy.select(Note).where(
                 Note.id == note_id,
                 Note.organization_id == organization_id
             )
-            .first()
-        )
+        )).scalar_one_or_none()
         
         if not note:
             return None
         
         note_response = NoteDetailResponse.model_validate(note)
+        await note_cache.set(organization_id, note_cache.NOTE, note_id, note_response.model_dump_json(), generation)
         
         return note_response
 
     @staticmethod
     async def update_note(
-        db: Session,
+        db: AsyncSession,
         note_id: str,
         note_data: NoteUpdate,
         user_id: str,
         organization_id: str
     ) -> Optional[NoteResponse]:
-        note = db.query(Note).filter(
-            Note.id == note_id,
-            Note.organization_id == organization_id
-        ).first()
+        note = (await db.execute(
+            sqlalchemy.select(Note).where(
+                Note.id == note_id,
+                Note.organization_id == organization_id
+            )
+        )).scalar_one_or_none()
         
         if not note:
             return None
@@ -122,158 +252,481 @@ class NoteService:
         if isinstance(note_data, NoteSuggest) and note_data.suggestion_content is not None:
             note.suggestion_content = note_data.suggestion_content
         
-        db.commit()
-        db.refresh(note)
+        await db.commit()
+        await db.refresh(note)
+        
+        await note_cache.invalidate(organization_id, note_ids=[note_id], children_of=[note.parent_id])
+        await NoteService._record_versions(db, [note_id], user_id)
+        if note_data.title is not None or note_data.content is not None:
+            await SemanticIndexService.schedule([note_id])
         
         return NoteResponse.model_validate(note)
 
     @staticmethod
     async def delete_note(
-        db: Session,
+        db: AsyncSession,
         note_id: str,
         organization_id: str
     ) -> bool:
-        # First get the note to be deleted to get its parent_id
-        note = db.query(Note).filter(
-            Note.id == note_id,
-            Note.organization_id == organization_id
-        ).first()
+        # First get the note to be deleted to get its path and parent_id
+        note = (await db.execute(
+            sqlalchemy.select(Note.id, Note.path, Note.parent_id).where(
+                Note.id == note_id,
+                Note.organization_id == organization_id
+            )
+        )).first()
         
         if not note:
             return False
         
-        # Store parent_id before deletion
-        parent_id = note.parent_id
-        
-        # Find all notes that have a path starting with this note's ID
-        notes_to_delete = db.query(Note).filter(
+        # The note itself plus every note whose path is anchored under it
+        subtree_filter = sqlalchemy.and_(
             Note.organization_id == organization_id,
-            Note.path.like(f"%{note_id}%")
-        ).all()
+            sqlalchemy.or_(
+                Note.id == note_id,
+                Note.path.like(f"{note.path}.%")
+            )
+        )
+        subtree_ids = sqlalchemy.select(Note.id).where(subtree_filter)
         
-        if not notes_to_delete:
-            return False
-
-        note_ids_to_delete = [n.id for n in notes_to_delete]
-        db.execute(
+        await db.execute(
             sqlalchemy.delete(agent_task_modified_notes).where(
-                agent_task_modified_notes.c.note_id.in_(note_ids_to_delete)
+                agent_task_modified_notes.c.note_id.in_(subtree_ids)
             )
         )
     
         # Remove references from agent_task_reference_notes
-        db.execute(
+        await db.execute(
             sqlalchemy.delete(agent_task_reference_notes).where(
-                agent_task_reference_notes.c.note_id.in_(note_ids_to_delete)
+                agent_task_reference_notes.c.note_id.in_(subtree_ids)
             )
-        )   
+        )
         
-        # Delete all the notes
-        for note in notes_to_delete:
-            db.delete(note)
+        # Tasks pointing at a deleted note as destination keep existing without it
+        await db.execute(
+            sqlalchemy.update(AgentTask)
+            .where(AgentTask.destination_note_id.in_(subtree_ids))
+            .values(destination_note_id=None)
+            .execution_options(synchronize_session=False)
+        )
         
-        # If there was a parent, update its children_count
-        if parent_id:
-            parent = db.query(Note).filter(Note.id == parent_id).first()
-            if parent:
-                # Count remaining children
-                remaining_children = db.query(func.count(Note.id)).filter(
-                    Note.parent_id == parent_id,
-                    Note.organization_id == organization_id,
-                    Note.id != note_id  # Exclude the note being deleted
-                ).scalar()
-                
-                parent.children_count = remaining_children
+        # Delete the whole subtree in one statement; FK checks run at statement end
+        deleted = await db.execute(
+            sqlalchemy.delete(Note)
+            .where(subtree_filter)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # If there was a parent, decrement its children_count
+        parent = None
+        if note.parent_id:
+            parent = await NoteService._adjust_children_count(db, note.parent_id, organization_id, -1)
+        
+        await db.commit()
+        
+        if not note.parent_id:
+            total_count_cache.invalidate(ROOT_NOTES_COUNT_SCOPE, organization_id)
+        
+        if deleted.rowcount > 1:
+            # Descendants are gone too; dropping the organization's entries is cheaper than tracking each one
+            await note_cache.invalidate_organization(organization_id)
+        else:
+            await note_cache.invalidate(
+                organization_id,
+                note_ids=[note_id, note.parent_id],
+                children_of=[note_id, note.parent_id, parent.parent_id if parent else None]
+            )
         
-        db.commit()
         return True
 
     @staticmethod
     async def list_root_notes(
-        db: Session,
+        db: AsyncSession,
         organization_id: str,
         skip: int = 0,
-        limit: int = 20
-    ) -> Tuple[List[NoteResponse], int]:
-        total = db.query(func.count(Note.id)).filter(
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        include_total: bool = True
+    ) -> Tuple[List[NoteResponse], Optional[int], Optional[str]]:
+        """
+        List root notes ordered by (sort_key, id).
+        With a cursor the page is found by keyset instead of OFFSET, so deep pages cost the same as the first one.
+        The total is optional and served from a short-lived per-organization cache.
+        """
+        # Fetch one extra row to know whether there is a next page
+        root_notes = (await db.execute(
+            NoteService._root_notes_query(sqlalchemy.select(Note), organization_id, skip, limit, cursor)
+        )).scalars().all()
+        
+        next_cursor = None
+        if len(root_notes) > limit:
+            root_notes = root_notes[:limit]
+            next_cursor = encode_cursor(root_notes[-1].sort_key, root_notes[-1].id)
+        
+        total = await NoteService._count_root_notes(db, organization_id) if include_total else None
+        
+        response_notes = [NoteResponse.model_validate(note) for note in root_notes]
+        
+        return response_notes, total, next_cursor
+
+    @staticmethod
+    def _root_notes_query(
+        query: sqlalchemy.Select,
+        organization_id: str,
+        skip: int,
+        limit: int,
+        cursor: Optional[str]
+    ) -> sqlalchemy.Select:
+        """Restrict `query` to one page of root notes, plus one row to detect a next page"""
+        query = query.where(
             Note.organization_id == organization_id,
             Note.parent_id.is_(None)
-        ).scalar()
-        
-        root_notes = (
-            db.query(Note)
-            .filter(
-                Note.organization_id == organization_id,
-                Note.parent_id.is_(None)
-            )
-            .order_by(Note.position.asc())
-            .offset(skip)
-            .limit(limit)
-            .all()
         )
         
-        response_notes = [NoteResponse.model_validate(note) for note in root_notes]
+        if cursor:
+            after_sort_key, after_id = decode_cursor(cursor, 2)
+            query = query.where(
+                sqlalchemy.tuple_(Note.sort_key, Note.id) > sqlalchemy.tuple_(after_sort_key, after_id)
+            )
+        elif skip:
+            query = query.offset(skip)
         
-        return response_notes, total
+        return query.order_by(Note.sort_key.asc(), Note.id.asc()).limit(limit + 1)
+
+    @staticmethod
+    async def _count_root_notes(
+        db: AsyncSession,
+        organization_id: str
+    ) -> int:
+        """Number of root notes, served from a short-lived per-organization cache"""
+        total = total_count_cache.get(ROOT_NOTES_COUNT_SCOPE, organization_id)
+        if total is None:
+            total = (await db.execute(
+                sqlalchemy.select(func.count(Note.id)).where(
+                    Note.organization_id == organization_id,
+                    Note.parent_id.is_(None)
+                )
+            )).scalar()
+            total_count_cache.set(ROOT_NOTES_COUNT_SCOPE, organization_id, total)
+        return total
+
+    @staticmethod
+    def get_note_etag(note: NoteDetailResponse) -> str:
+        """ETag of a note's detail response, computed from the response itself so cache hits need no query"""
+        return make_etag("note", note.model_dump_json())
+
+    @staticmethod
+    def get_children_etag(note_id: str, children: List[NoteListResponse]) -> str:
+        """ETag of a note's children list, computed from the list itself"""
+        return make_etag("children", note_id, CHILDREN_ADAPTER.dump_json(children).decode())
+
+    @staticmethod
+    def get_root_notes_etag(
+        notes: List[NoteResponse],
+        total: Optional[int],
+        next_cursor: Optional[str]
+    ) -> str:
+        """ETag of one page of root notes, computed from the page itself so it costs no query of its own"""
+        return make_etag("root", ROOT_NOTES_ADAPTER.dump_json(notes).decode(), total, next_cursor)
 
     @staticmethod
     async def get_children(
-        db: Session,
+        db: AsyncSession,
         note_id: str,
         organization_id: str,
     ) -> List[NoteListResponse]:
         """Get immediate children of a specific note without content"""
-        children = (
-            db.query(Note.id, Note.title, Note.organization_id, 
+        cached, generation = await note_cache.get(organization_id, note_cache.CHILDREN, note_id)
+        if cached is not None:
+            return CHILDREN_ADAPTER.validate_json(cached)
+        
+        children = (await db.execute(
+            sqlalchemy.select(Note.id, Note.title, Note.organization_id, 
                     Note.created_by, Note.created_at, Note.updated_at,
                     Note.path, Note.depth, Note.children_count, 
-                    Note.position, Note.parent_id)
-            .filter(
+                    Note.sort_key, Note.parent_id)
+            .where(
                 Note.parent_id == note_id,
                 Note.organization_id == organization_id
             )
-            .order_by(Note.position.asc())
-            .all()
+            .order_by(Note.sort_key.asc(), Note.id.asc())
+        )).all()
+        
+        response_children = [NoteListResponse.model_validate(child) for child in children]
+        await note_cache.set(
+            organization_id,
+            note_cache.CHILDREN,
+            note_id,
+            CHILDREN_ADAPTER.dump_json(response_children).decode(),
+            generation
+        )
+        
+        return response_children
+
+    @staticmethod
+    async def get_subtree(
+        db: AsyncSession,
+        note_id: str,
+        organization_id: str,
+        max_depth: Optional[int] = None
+    ) -> Optional[NoteTreeResponse]:
+        """Get a note and its descendants (without content) as a nested tree"""
+        root = (await db.execute(
+            sqlalchemy.select(Note.path, Note.depth).where(
+                Note.id == note_id,
+                Note.organization_id == organization_id
+            )
+        )).first()
+        
+        if not root:
+            return None
+        
+        # Single prefix scan over the materialized path, served by ix_note_organization_id_path_prefix
+        query = (
+            sqlalchemy.select(Note.id, Note.title, Note.organization_id,
+                    Note.created_by, Note.created_at, Note.updated_at,
+                    Note.path, Note.depth, Note.children_count,
+                    Note.sort_key, Note.parent_id)
+            .where(
+                Note.organization_id == organization_id,
+                sqlalchemy.or_(
+                    Note.id == note_id,
+                    Note.path.like(f"{root.path}.%")
+                )
+            )
+        )
+        if max_depth is not None:
+            query = query.where(Note.depth <= root.depth + max_depth)
+        
+        rows = (await db.execute(
+            query.order_by(Note.depth.asc(), Note.sort_key.asc(), Note.id.asc())
+        )).all()
+        
+        # Parents always come before their children when ordered by depth
+        nodes = {}
+        tree = None
+        for row in rows:
+            node = NoteTreeResponse.model_validate(row)
+            nodes[node.id] = node
+            if node.id == note_id:
+                tree = node
+            elif node.parent_id in nodes:
+                nodes[node.parent_id].children.append(node)
+        
+        return tree
+
+    @staticmethod
+    async def get_reference_notes(
+        db: AsyncSession,
+        organization_id: str,
+        note_ids: List[str],
+        limit: int = 500
+    ) -> List[NoteDetailResponse]:
+        """
+        Get the given notes and all their descendants, with content, in document order (each selected note
+        followed by its subtree, siblings by sort_key). Descendants are read in one path-prefix query;
+        past `limit` notes the deepest levels are left out.
+        """
+        roots = (await db.execute(
+            sqlalchemy.select(Note.id, Note.path).where(
+                Note.id.in_(note_ids),
+                Note.organization_id == organization_id
+            )
+        )).all()
+        
+        # A selected note inside another selected subtree is loaded with it
+        paths = {root.id: root.path for root in roots}
+        root_ids = [
+            note_id for note_id in dict.fromkeys(note_ids)
+            if note_id in paths and not any(
+                paths[note_id].startswith(f"{paths[other]}.") for other in paths if other != note_id
+            )
+        ]
+        if not root_ids:
+            return []
+        
+        # One prefix scan per subtree, OR'ed into a single statement on ix_note_organization_id_path_prefix
+        rows = (await db.execute(
+            sqlalchemy.select(
+                Note.id, Note.title, Note.organization_id, Note.created_by, Note.created_at, Note.updated_at,
+                Note.path, Note.depth, Note.children_count, Note.sort_key, Note.parent_id,
+                Note.content, Note.suggestion_content
+            )
+            .where(
+                Note.organization_id == organization_id,
+                sqlalchemy.or_(
+                    Note.id.in_(root_ids),
+                    *(Note.path.like(f"{paths[root_id]}.%") for root_id in root_ids)
+                )
+            )
+            .order_by(Note.depth.asc(), Note.sort_key.asc(), Note.id.asc())
+            .limit(limit)
+        )).all()
+        
+        children = defaultdict(list)
+        by_id = {}
+        for row in rows:
+            by_id[row.id] = row
+            children[row.parent_id].append(row.id)
+        
+        ordered = []
+        stack = [root_id for root_id in reversed(root_ids) if root_id in by_id]
+        while stack:
+            note_id = stack.pop()
+            ordered.append(NoteDetailResponse.model_validate(by_id[note_id]))
+            stack.extend(reversed(children[note_id]))
+        
+        return ordered
+
+    @staticmethod
+    async def search_notes(
+        db: AsyncSession,
+        organization_id: str,
+        query: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[NoteSearchResult], Optional[str]]:
+        """
+        Full-text search over title and content, best matches first, as (results, next_cursor).
+        Matching and ranking run on ix_note_organization_id_search_vector; highlights, which need the
+        text itself, are only computed for the rows of the returned page.
+        """
+        ts_query = func.websearch_to_tsquery(NOTE_SEARCH_CONFIG, query)
+        rank = func.ts_rank(Note.search_vector, ts_query)
+        
+        matches = sqlalchemy.select(Note.id, rank.label("rank")).where(
+            Note.organization_id == organization_id,
+            Note.search_vector.op("@@")(ts_query)
         )
+        if cursor:
+            after_rank, after_id = decode_cursor(cursor, 2)
+            matches = matches.where(sqlalchemy.or_(
+                rank < float(after_rank),
+                sqlalchemy.and_(rank == float(after_rank), Note.id > after_id)
+            ))
+        # Fetch one extra row to know whether there is a next page
+        matches = matches.order_by(rank.desc(), Note.id.asc()).limit(limit + 1).subquery()
+        
+        rows = (await db.execute(
+            sqlalchemy.select(
+                Note.id, Note.title, Note.parent_id, Note.path, Note.depth, Note.updated_at, matches.c.rank,
+                func.ts_headline(NOTE_SEARCH_CONFIG, _escape_html(Note.title), ts_query, SEARCH_TITLE_HEADLINE).label("title_highlight"),
+                func.ts_headline(
+                    NOTE_SEARCH_CONFIG, _escape_html(func.coalesce(Note.content, "")), ts_query, SEARCH_SNIPPET_HEADLINE
+                ).label("snippet")
+            )
+            .join(matches, matches.c.id == Note.id)
+            .order_by(matches.c.rank.desc(), Note.id.asc())
+        )).all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].rank, rows[-1].id)
         
-        return [NoteListResponse.model_validate(child) for child in children]
+        # Resolve every ancestor on the page in one lookup
+        ancestor_ids = {ancestor_id for row in rows for ancestor_id in row.path.split(".")[:-1]}
+        ancestor_titles = dict((await db.execute(
+            sqlalchemy.select(Note.id, Note.title).where(
+                Note.id.in_(ancestor_ids),
+                Note.organization_id == organization_id
+            )
+        )).all()) if ancestor_ids else {}
+        
+        results = [
+            NoteSearchResult(
+                id=row.id,
+                title=row.title,
+                parent_id=row.parent_id,
+                path=row.path,
+                depth=row.depth,
+                updated_at=row.updated_at,
+                rank=row.rank,
+                title_highlight=row.title_highlight,
+                snippet=row.snippet,
+                breadcrumbs=[
+                    NoteBreadcrumb(id=ancestor_id, title=ancestor_titles[ancestor_id])
+                    for ancestor_id in row.path.split(".")[:-1]
+                    if ancestor_id in ancestor_titles
+                ]
+            )
+            for row in rows
+        ]
+        
+        return results, next_cursor
+
+    @staticmethod
+    async def typeahead_notes(
+        db: AsyncSession,
+        organization_id: str,
+        query: str,
+        limit: int = 10
+    ) -> List[NoteTypeaheadResult]:
+        """
+        Top title matches for quick-jump: prefix matches first, then substring and fuzzy matches
+        by word similarity. Every predicate is served by ix_note_organization_id_title_trgm.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        pattern = _escape_like(query)
+        prefix_match = Note.title.ilike(f"{pattern}%")
+        
+        matches = prefix_match
+        if len(query) >= TYPEAHEAD_FUZZY_MIN_LENGTH:
+            matches = sqlalchemy.or_(
+                prefix_match,
+                Note.title.ilike(f"%{pattern}%"),
+                sqlalchemy.literal(query).op("<%")(Note.title)
+            )
+        
+        rows = (await db.execute(
+            sqlalchemy.select(Note.id, Note.title, Note.parent_id, Note.path, Note.depth)
+            .where(
+                Note.organization_id == organization_id,
+                matches
+            )
+            .order_by(
+                prefix_match.desc(),
+                func.word_similarity(query, Note.title).desc(),
+                func.length(Note.title).asc(),
+                Note.id.asc()
+            )
+            .limit(limit)
+        )).all()
+        
+        return [NoteTypeaheadResult.model_validate(row) for row in rows]
 
     @staticmethod
     async def move_note(
-        db: Session,
+        db: AsyncSession,
         note_id: str,
         move_data: NoteMoveRequest,
         organization_id: str
     ) -> Optional[NoteResponse]:
         """Move a note to a new parent or reposition"""
-        note = db.query(Note).filter(
-            Note.id == note_id,
-            Note.organization_id == organization_id
-        ).first()
+        note = (await db.execute(
+            sqlalchemy.select(Note).where(
+                Note.id == note_id,
+                Note.organization_id == organization_id
+            )
+        )).scalar_one_or_none()
         
         if not note:
             return None
             
-        # Prevent moving a note to its own descendant
-        if move_data.new_parent_id:
-            potential_parent = db.query(Note).filter(Note.id == move_data.new_parent_id).first()
-            if potential_parent and potential_parent.path.startswith(f"{note.path}."):
-                raise ValueError("Cannot move a note to its own descendant")
+        await NoteService._check_new_parent(db, note, move_data.new_parent_id, organization_id)
         
-        # Update old parent's children count
-        if note.parent_id:
-            old_parent = db.query(Note).filter(Note.id == note.parent_id).first()
-            if old_parent:
-                old_parent.children_count -= 1
-        
-        # Update new parent's children count
-        if move_data.new_parent_id:
-            new_parent = db.query(Note).filter(Note.id == move_data.new_parent_id).first()
-            if new_parent:
-                new_parent.children_count += 1
-        
-        # Calculate new position
-        new_position = await NoteService.calculate_position(
+        # Move the child from the old parent's count to the new one's
+        affected_parents = [note.parent_id]
+        if note.parent_id != move_data.new_parent_id:
+            for parent_id, delta in ((note.parent_id, -1), (move_data.new_parent_id, 1)):
+                if parent_id:
+                    parent = await NoteService._adjust_children_count(db, parent_id, organization_id, delta)
+                    affected_parents += [parent_id, parent.parent_id if parent else None]
+        
+        # Calculate new sort key
+        new_sort_key = await NoteService.calculate_sort_key(
             db,
             parent_id=move_data.new_parent_id,
             before_id=move_data.before_id,
@@ -282,268 +735,673 @@ class NoteService:
         )
         
         # Update note
-        note.position = new_position
+        note.sort_key = new_sort_key
         old_parent_id = note.parent_id
         note.parent_id = move_data.new_parent_id
         
         # Only recalculate paths if parent changed
+        moved_descendants = 0
         if old_parent_id != move_data.new_parent_id:
-            await NoteService._update_note_path(db, note, move_data.new_parent_id)
+            moved_descendants = await NoteService._update_note_path(db, note, move_data.new_parent_id)
+        
+        await db.commit()
+        await db.refresh(note)
         
-        db.commit()
-        db.refresh(note)
+        if not old_parent_id or not move_data.new_parent_id:
+            total_count_cache.invalidate(ROOT_NOTES_COUNT_SCOPE, organization_id)
+        
+        if moved_descendants:
+            await note_cache.invalidate_organization(organization_id)
+        else:
+            await note_cache.invalidate(
+                organization_id,
+                note_ids=[note_id, *affected_parents],
+                children_of=affected_parents
+            )
         
         return NoteResponse.model_validate(note)
 
     @staticmethod
-    async def calculate_position(
-        db: Session,
+    async def _check_new_parent(
+        db: AsyncSession,
+        note: Note,
+        new_parent_id: Optional[str],
+        organization_id: str
+    ) -> None:
+        """Prevent moving a note to its own descendant"""
+        if not new_parent_id:
+            return
+        potential_parent_path = (await db.execute(
+            sqlalchemy.select(Note.path).where(
+                Note.id == new_parent_id,
+                Note.organization_id == organization_id
+            )
+        )).scalar()
+        if potential_parent_path and (
+            potential_parent_path == note.path or potential_parent_path.startswith(f"{note.path}.")
+        ):
+            raise ValueError("Cannot move a note to its own descendant")
+
+    @staticmethod
+    async def calculate_sort_key(
+        db: AsyncSession,
         parent_id: Optional[str],
         before_id: Optional[str] = None,
         after_id: Optional[str] = None,
         organization_id: str = None
-    ) -> int:
-        """Calculate new position for a note"""
+    ) -> str:
+        """
+        Calculate a fractional sort key for a note among its siblings.
+        The key sorts strictly between its neighbours, so only the placed note is written.
+        """
+        siblings = sqlalchemy.select(Note.sort_key).where(
+            Note.parent_id == parent_id,
+            Note.organization_id == organization_id
+        )
+        
         if before_id is None and after_id is None:
             # If no reference points, put at the end
-            last_note = (
-                db.query(Note)
-                .filter(
-                    Note.parent_id == parent_id,
-                    Note.organization_id == organization_id
-                )
-                .order_by(Note.position.desc())
-                .first()
-            )
-            return (last_note.position + NoteService.POSITION_GAP) if last_note else NoteService.POSITION_GAP
-            
-        if after_id is None:
-            # Put before the specified note
-            before_note = db.query(Note).filter(Note.id == before_id).first()
-            if not before_note:
-                raise ValueError("Reference note not found")
-            
-            # Find the note immediately before our reference note
-            prev_note = (
-                db.query(Note)
-                .filter(
-                    Note.parent_id == parent_id,
-                    Note.organization_id == organization_id,
-                    Note.position < before_note.position
-                )
-                .order_by(Note.position.desc())
-                .first()
-            )
-            
-            if not prev_note:
-                return before_note.position // 2
-            
-            new_position = (prev_note.position + before_note.position) // 2
-            
-            if abs(before_note.position - prev_note.position) < NoteService.MIN_GAP:
-                await NoteService._rebalance_positions(db, parent_id, organization_id)
-                return await NoteService.calculate_position(db, parent_id, before_id, after_id, organization_id)
-            
-            return new_position
-            
-        if before_id is None:
-            # Put after the specified note
-            after_note = db.query(Note).filter(Note.id == after_id).first()
-            if not after_note:
-                raise ValueError("Reference note not found")
-            
-            # Find the note immediately after our reference note
-            next_note = (
-                db.query(Note)
-                .filter(
-                    Note.parent_id == parent_id,
-                    Note.organization_id == organization_id,
-                    Note.position > after_note.position
-                )
-                .order_by(Note.position.asc())
-                .first()
-            )
-            
-            if not next_note:
-                return after_note.position + NoteService.POSITION_GAP
-            
-            new_position = (after_note.position + next_note.position) // 2
-            
-            if abs(next_note.position - after_note.position) < NoteService.MIN_GAP:
-                await NoteService._rebalance_positions(db, parent_id, organization_id)
-                return await NoteService.calculate_position(db, parent_id, before_id, after_id, organization_id)
-            
-            return new_position
+            lower = (await db.execute(
+                siblings.order_by(Note.sort_key.desc()).limit(1)
+            )).scalar()
+            upper = None
+        elif after_id is None:
+            # Put before the specified note, after the sibling immediately preceding it
+            upper = await NoteService._get_sort_key(db, before_id, organization_id)
+            lower = (await db.execute(
+                siblings.where(Note.sort_key < upper)
+                .order_by(Note.sort_key.desc())
+                .limit(1)
+            )).scalar()
+        elif before_id is None:
+            # Put after the specified note, before the sibling immediately following it
+            lower = await NoteService._get_sort_key(db, after_id, organization_id)
+            upper = (await db.execute(
+                siblings.where(Note.sort_key > lower)
+                .order_by(Note.sort_key.asc())
+                .limit(1)
+            )).scalar()
+        else:
+            # Position between two specific notes
+            if before_id == after_id:
+                raise ValueError("before_id and after_id must reference different notes")
+            lower, upper = sorted([
+                await NoteService._get_sort_key(db, after_id, organization_id),
+                await NoteService._get_sort_key(db, before_id, organization_id)
+            ])
+        
+        if lower is not None and lower == upper:
+            # Concurrent writers produced a duplicate key; spread the siblings apart and retry
+            await NoteService._respread_sort_keys(db, parent_id, organization_id)
+            return await NoteService.calculate_sort_key(db, parent_id, before_id, after_id, organization_id)
         
-        # Position between two specific notes
-        before_note = db.query(Note).filter(Note.id == before_id).first()
-        after_note = db.query(Note).filter(Note.id == after_id).first()
+        sort_key = key_between(lower, upper)
         
-        if not before_note or not after_note:
-            raise ValueError("Reference notes not found")
+        # Repeated inserts into the same gap lengthen keys; respread only once they get long
+        if len(sort_key) > NoteService.SORT_KEY_MAX_LENGTH:
+            await NoteService._respread_sort_keys(db, parent_id, organization_id)
+            return await NoteService.calculate_sort_key(db, parent_id, before_id, after_id, organization_id)
         
-        new_position = (before_note.position + after_note.position) // 2
+        return sort_key
+
+    @staticmethod
+    async def _get_sort_key(
+        db: AsyncSession,
+        note_id: str,
+        organization_id: str
+    ) -> str:
+        """Get the sort key of a reference note"""
+        sort_key = (await db.execute(
+            sqlalchemy.select(Note.sort_key).where(
+                Note.id == note_id,
+                Note.organization_id == organization_id
+            )
+        )).scalar()
         
-        if abs(before_note.position - after_note.position) < NoteService.MIN_GAP:
-            await NoteService._rebalance_positions(db, parent_id, organization_id)
-            return await NoteService.calculate_position(db, parent_id, before_id, after_id, organization_id)
+        if sort_key is None:
+            raise ValueError("Reference note not found")
         
-        return new_position
+        return sort_key
 
     @staticmethod
-    async def _rebalance_positions(
-        db: Session,
+    async def _respread_sort_keys(
+        db: AsyncSession,
         parent_id: Optional[str],
         organization_id: str
-    ) -> None:
-        """Rebalance positions of all siblings"""
-        # Get all siblings in current order
-        siblings = (
-            db.query(Note)
-            .filter(
+    ) -> int:
+        """Reassign short, evenly spread sort keys to all siblings, keeping their order"""
+        sibling_ids = (await db.execute(
+            sqlalchemy.select(Note.id)
+            .where(
                 Note.parent_id == parent_id,
                 Note.organization_id == organization_id
             )
-            .order_by(Note.position)
-            .all()
+            .order_by(Note.sort_key.asc(), Note.id.asc())
+        )).scalars().all()
+        
+        sort_keys = keys_between(None, None, len(sibling_ids))
+        if sibling_ids:
+            await db.execute(
+                sqlalchemy.update(Note),
+                [{"id": note_id, "sort_key": sort_key} for note_id, sort_key in zip(sibling_ids, sort_keys)]
+            )
+        
+        logger.info(f"Respread sort keys of {len(sibling_ids)} notes under parent {parent_id}")
+        return len(sibling_ids)
+
+    @staticmethod
+    async def _adjust_children_count(
+        db: AsyncSession,
+        note_id: str,
+        organization_id: str,
+        delta: int
+    ) -> Optional[sqlalchemy.Row]:
+        """
+        Atomically add `delta` to a note's children_count in the database.
+        Returns the note's path, depth and parent_id, or None if it does not exist.
+        """
+        return (await db.execute(
+            sqlalchemy.update(Note)
+            .where(
+                Note.id == note_id,
+                Note.organization_id == organization_id
+            )
+            .values(children_count=Note.children_count + delta)
+            .returning(Note.path, Note.depth, Note.parent_id)
+            .execution_options(synchronize_session=False)
+        )).first()
+
+    @staticmethod
+    async def reconcile_children_counts(
+        db: AsyncSession,
+        organization_id: str
+    ) -> int:
+        """Recompute children_count for every note in an organization with one grouped query; returns rows fixed"""
+        child = aliased(Note)
+        counts = (
+            sqlalchemy.select(Note.id.label("note_id"), func.count(child.id).label("children_count"))
+            .outerjoin(child, child.parent_id == Note.id)
+            .where(Note.organization_id == organization_id)
+            .group_by(Note.id)
+            .subquery()
+        )
+        result = await db.execute(
+            sqlalchemy.update(Note)
+            .where(
+                Note.id == counts.c.note_id,
+                Note.children_count.is_distinct_from(counts.c.children_count)
+            )
+            .values(children_count=counts.c.children_count)
+            .execution_options(synchronize_session=False)
         )
+        await db.commit()
         
-        # Reassign positions with large gaps
-        for i, note in enumerate(siblings):
-            note.position = (i + 1) * NoteService.POSITION_GAP
+        if result.rowcount:
+            await note_cache.invalidate_organization(organization_id)
         
-        db.commit()
+        logger.info(f"Reconciled children_count of {result.rowcount} notes in organization {organization_id}")
+        return result.rowcount
 
     @staticmethod
     async def _update_note_path(
-        db: Session,
+        db: AsyncSession,
         note: Note,
         new_parent_id: Optional[str]
-    ) -> None:
-        """Update the path and depth of a note and all its descendants"""
+    ) -> int:
+        """
+        Update the path and depth of a note and all its descendants.
+        Descendants are rewritten server-side in a single UPDATE; returns the number of descendant rows updated.
+        """
+        new_path = note.id
+        new_depth = 0
         if new_parent_id:
-            parent = db.query(Note).filter(Note.id == new_parent_id).first()
+            parent = (await db.execute(
+                sqlalchemy.select(Note.path, Note.depth).where(
+                    Note.id == new_parent_id,
+                    Note.organization_id == note.organization_id
+                )
+            )).first()
             if parent:
                 new_path = f"{parent.path}.{note.id}"
                 new_depth = parent.depth + 1
-            else:
-                new_path = note.id
-                new_depth = 0
-        else:
-            new_path = note.id
-            new_depth = 0
         
-        # Calculate path difference to update descendants
-        old_path_prefix = f"{note.path}."
-        new_path_prefix = f"{new_path}."
+        old_path = note.path
         depth_difference = new_depth - note.depth
         
-        # Update descendants' paths and depths
-        descendants = (
-            db.query(Note)
-            .filter(Note.path.like(f"{old_path_prefix}%"))
-            .all()
+        # Swap the old path prefix for the new one and shift depth, e.g. a.b.c.d -> x.c.d
+        result = await db.execute(
+            sqlalchemy.update(Note)
+            .where(
+                Note.organization_id == note.organization_id,
+                Note.path.like(f"{old_path}.%")
+            )
+            .values(
+                path=sqlalchemy.func.concat(new_path, func.substr(Note.path, len(old_path) + 1)),
+                depth=Note.depth + depth_difference
+            )
+            .execution_options(synchronize_session=False)
         )
         
-        for descendant in descendants:
-            descendant.path = new_path_prefix + descendant.path[len(old_path_prefix):]
-            descendant.depth = descendant.depth + depth_difference
-        
         # Update the note itself
         note.path = new_path
         note.depth = new_depth
+        
+        return result.rowcount
 
     @staticmethod
     async def patch_note(
-        db: Session,
+        db: AsyncSession,
         note_id: str,
         note_data: dict,
         user_id: str,
         organization_id: str
     ) -> Optional[NoteResponse]:
         """
-        Partially update a note with only the fields that are provided
+        Partially update a note with only the fields that are provided.
+        A new parent_id appends the note to its new siblings; positioning within siblings goes through move_note,
+        so position and sort_key are rejected with a ValueError.
         """
-        note = db.query(Note).filter(
-            Note.id == note_id,
-            Note.organization_id == organization_id
-        ).first()
+        note = (await db.execute(
+            sqlalchemy.select(Note).where(
+                Note.id == note_id,
+                Note.organization_id == organization_id
+            )
+        )).scalar_one_or_none()
         
         if not note:
             return None
         
+        positional_fields = {'position', 'sort_key'} & set(note_data)
+        if positional_fields:
+            raise ValueError(f"{', '.join(sorted(positional_fields))} cannot be patched; use the move endpoint")
+        
         # Define allowed fields for patching
         allowed_fields = {
-            'title', 'content', 'position', 'parent_id'
+            'title', 'content', 'parent_id'
         }
         
+        affected_parents = [note.parent_id]
+        moved_descendants = 0
+        root_count_changed = False
+        
         # Update only provided fields that are allowed
         for field, value in note_data.items():
             if field in allowed_fields:
-                if field == 'parent_id' and value != note.parent_id:
-                    # Handle parent change
-                    await NoteService._update_note_path(db, note, value)
-                elif field == 'position':
-                    # Validate and set position
-                    note.position = min(
-                        max(value, 0), 
-                        NoteService.MAX_POSITION
-                    )
+                if field == 'parent_id':
+                    if value != note.parent_id:
+                        # Handle parent change
+                        await NoteService._check_new_parent(db, note, value, organization_id)
+                        for parent_id, delta in ((note.parent_id, -1), (value, 1)):
+                            if parent_id:
+                                parent = await NoteService._adjust_children_count(db, parent_id, organization_id, delta)
+                                affected_parents += [parent_id, parent.parent_id if parent else None]
+                        # The old key means nothing among the new siblings and may collide with one; append instead
+                        note.sort_key = await NoteService.calculate_sort_key(
+                            db, parent_id=value, organization_id=organization_id
+                        )
+                        moved_descendants = await NoteService._update_note_path(db, note, value)
+                        root_count_changed = not note.parent_id or not value
+                        note.parent_id = value
                 else:
                     setattr(note, field, value)
         
-        db.commit()
-        db.refresh(note)
+        await db.commit()
+        await db.refresh(note)
+        
+        if root_count_changed:
+            total_count_cache.invalidate(ROOT_NOTES_COUNT_SCOPE, organization_id)
+        
+        if moved_descendants:
+            await note_cache.invalidate_organization(organization_id)
+        else:
+            await note_cache.invalidate(
+                organization_id,
+                note_ids=[note_id, *affected_parents],
+                children_of=affected_parents
+            )
+        if 'title' in note_data or 'content' in note_data:
+            await NoteService._record_versions(db, [note_id], user_id)
+            await SemanticIndexService.schedule([note_id])
         
         return NoteResponse.model_validate(note)
 
     @staticmethod
     async def get_note_ws_content(
-        db: Session,
+        db: AsyncSession,
         note_id: str,
-    ) -> Optional[NoteWSResponse]:
-        """Get note's WebSocket collaboration content"""
-        note = db.query(Note).filter(Note.id == note_id).first()
+    ) -> Optional[Tuple[List[bytes], int]]:
+        """
+        Get note's WebSocket collaboration state as Yjs updates to apply in order:
+        the compacted snapshot (if any) followed by the not yet compacted tail of the update log.
+        Also returns the log watermark, the id of the last logged update included (0 if none), which a later
+        full state save passes back so only the rows that state covers are dropped.
+        """
+        note = (await db.execute(
+            sqlalchemy.select(Note.binary_content, Note.binary_content_encoding).where(Note.id == note_id)
+        )).first()
         
         if not note:
             return None
-            
-        if not note.binary_content:
-            return NoteWSResponse(binary_content=None)
-            
-        try:
-            # Return the binary content directly as a list of integers
-            binary_data = base64.b64decode(note.binary_content)
-            return NoteWSResponse(binary_content=list(binary_data))
-        except Exception as e:
-            logger.error(f"Error decoding binary content: {str(e)}")
-            return NoteWSResponse(binary_content=None)
+        
+        tail = (await db.execute(
+            sqlalchemy.select(NoteYjsUpdate.id, NoteYjsUpdate.update)
+            .where(NoteYjsUpdate.note_id == note_id)
+            .order_by(NoteYjsUpdate.id.asc())
+        )).all()
+        
+        snapshot = decode_state(note.binary_content, note.binary_content_encoding)
+        updates = [row.update for row in tail]
+        return ([snapshot, *updates] if snapshot else updates), (tail[-1].id if tail else 0)
 
     @staticmethod
     async def update_note_ws_content(
-        db: Session,
+        db: AsyncSession,
         note_id: str,
-        update_data: List[int],
+        state: bytes,
+        watermark: Optional[int] = None,
     ) -> None:
-        """Update note's WebSocket collaboration content"""
+        """Merge a full collaboration state into the note's snapshot, dropping the logged updates up to `watermark`"""
+        await NoteService.write_ws_batch(db, states={note_id: (state, watermark)})
+
+    @staticmethod
+    async def append_note_ws_update(
+        db: AsyncSession,
+        note_id: str,
+        update: bytes,
+    ) -> Optional[bool]:
+        """
+        Append an incremental Yjs update to the note's log; the write is proportional to the edit, not the document.
+        Returns whether compaction was scheduled, or None if the note does not exist.
+        """
+        scheduled = await NoteService.write_ws_batch(db, appends={note_id: [update]})
+        return scheduled.get(note_id)
+
+    @staticmethod
+    async def write_ws_batch(
+        db: AsyncSession,
+        states: Optional[Dict[str, Tuple[bytes, Optional[int]]]] = None,
+        appends: Optional[Dict[str, List[bytes]]] = None,
+    ) -> Dict[str, bool]:
+        """
+        Persist collaboration writes for many notes in one transaction.
+        `states` map a note to a full state and the log watermark it was built on (see `get_note_ws_content`).
+        The state is merged into the stored snapshot, never substituted for it, and only log rows up to the
+        watermark are dropped, since later rows may come from other writers; without a watermark none are.
+        `appends` are then added to the log in order.
+        Notes that no longer exist are skipped. Returns, per persisted note, whether compaction was scheduled.
+        """
+        states = states or {}
+        appends = {note_id: updates for note_id, updates in (appends or {}).items() if updates}
+        requested_ids = set(states) | set(appends)
+        if not requested_ids:
+            return {}
+        
+        note_table = Note.__table__
         try:
-            # Convert the update array to bytes and store as base64
-            binary_data = bytes(update_data)
-            base64_content = base64.b64encode(binary_data).decode('utf-8')
+            existing_ids = set((await db.execute(
+                sqlalchemy.select(Note.id).where(Note.id.in_(requested_ids))
+            )).scalars().all())
             
-            stmt = (
-                sqlalchemy.update(Note)
-                .where(Note.id == note_id)
-                .values(
-                    binary_content=base64_content,
-                    updated_at=func.now(),
-                    suggestion_content=None
+            # Lock note rows in a stable order so concurrent batches cannot deadlock
+            state_ids = sorted(existing_ids & set(states))
+            append_ids = sorted(existing_ids & set(appends))
+            
+            if state_ids:
+                # Same row lock as compaction, which also rewrites the snapshot
+                snapshots = {
+                    row.id: decode_state(row.binary_content, row.binary_content_encoding)
+                    for row in (await db.execute(
+                        sqlalchemy.select(Note.id, Note.binary_content, Note.binary_content_encoding)
+                        .where(Note.id.in_(state_ids))
+                        .order_by(Note.id)
+                        .with_for_update()
+                    )).all()
+                }
+                
+                # Coalesced rather than applied: a buffered state can carry updates whose dependencies are still
+                # in the log after the watermark, and those must survive in the snapshot until compaction
+                def merge_states() -> Dict[str, Tuple[bytes, Optional[str]]]:
+                    return {
+                        note_id: encode_state(
+                            coalesce_updates([snapshots[note_id], states[note_id][0]]) if snapshots.get(note_id)
+                            else states[note_id][0]
+                        )
+                        for note_id in state_ids
+                    }
+                
+                # Merging is CPU bound; keep it off the event loop
+                encoded = await asyncio.to_thread(merge_states)
+                await db.execute(
+                    note_table.update()
+                    .where(note_table.c.id == sqlalchemy.bindparam("note_id"))
+                    .values(
+                        binary_content=sqlalchemy.bindparam("data"),
+                        binary_content_encoding=sqlalchemy.bindparam("encoding"),
+                        updated_at=func.now(),
+                        suggestion_content=None
+                    ),
+                    [
+                        {"note_id": note_id, "data": encoded[note_id][0], "encoding": encoded[note_id][1]}
+                        for note_id in state_ids
+                    ]
+                )
+                
+                covered = [(note_id, states[note_id][1]) for note_id in state_ids if states[note_id][1] is not None]
+                if covered:
+                    await db.execute(
+                        sqlalchemy.delete(NoteYjsUpdate).where(sqlalchemy.or_(*(
+                            sqlalchemy.and_(NoteYjsUpdate.note_id == note_id, NoteYjsUpdate.id <= watermark)
+                            for note_id, watermark in covered
+                        )))
+                    )
+                    # Recount what is left of each log, for the compaction thresholds
+                    log_rows = NoteYjsUpdate.note_id == note_table.c.id
+                    await db.execute(
+                        note_table.update()
+                        .where(note_table.c.id.in_([note_id for note_id, _ in covered]))
+                        .values(
+                            update_log_count=sqlalchemy.select(func.count()).where(log_rows).scalar_subquery(),
+                            update_log_bytes=sqlalchemy.select(
+                                func.coalesce(func.sum(func.length(NoteYjsUpdate.update)), 0)
+                            ).where(log_rows).scalar_subquery()
+                        )
+                    )
+            
+            if append_ids:
+                # Counting first takes the note's row lock, so appends serialize with compaction and snapshot saves
+                await db.execute(
+                    note_table.update()
+                    .where(note_table.c.id == sqlalchemy.bindparam("note_id"))
+                    .values(
+                        update_log_count=note_table.c.update_log_count + sqlalchemy.bindparam("count"),
+                        update_log_bytes=note_table.c.update_log_bytes + sqlalchemy.bindparam("size"),
+                        updated_at=func.now(),
+                        suggestion_content=None
+                    ),
+                    [
+                        {"note_id": note_id, "count": len(appends[note_id]), "size": sum(map(len, appends[note_id]))}
+                        for note_id in append_ids
+                    ]
+                )
+                await db.execute(
+                    sqlalchemy.insert(NoteYjsUpdate),
+                    [{"note_id": note_id, "update": update} for note_id in append_ids for update in appends[note_id]]
                 )
-            )
             
-            db.execute(stmt)
-            db.commit()
+            notes = (await db.execute(
+                sqlalchemy.select(
+                    Note.id, Note.organization_id, Note.parent_id, Note.update_log_count, Note.update_log_bytes
+                ).where(Note.id.in_(existing_ids))
+            )).all()
+            await db.commit()
         except Exception as e:
-            db.rollback()
-            logger.error(f"Error updating binary content: {str(e)}")
+            await db.rollback()
+            logger.error(f"Error writing binary content: {str(e)}")
             raise
+        
+        scheduled = {}
+        for note in notes:
+            await note_cache.invalidate(note.organization_id, note_ids=[note.id], children_of=[note.parent_id])
+            await NoteService._schedule_content_derivation(note.id)
+            
+            # Schedule each time a threshold multiple is crossed, so a lost task is retried by later appends
+            appended = appends.get(note.id, []) if note.id in append_ids else []
+            count_before = note.update_log_count - len(appended)
+            bytes_before = note.update_log_bytes - sum(map(len, appended))
+            needs_compaction = bool(appended) and (
+                count_before // settings.YJS_LOG_COMPACT_COUNT < note.update_log_count // settings.YJS_LOG_COMPACT_COUNT
+                or bytes_before // settings.YJS_LOG_COMPACT_BYTES < note.update_log_bytes // settings.YJS_LOG_COMPACT_BYTES
+            )
+            if needs_compaction:
+                # Publishing is a blocking broker round trip; keep it off the event loop
+                await asyncio.to_thread(celery_app.send_task, 'compact_note_ws_updates', args=[note.id])
+            scheduled[note.id] = needs_compaction
+        
+        if len(requested_ids) > len(existing_ids):
+            logger.warning(f"Skipped collaboration writes for {len(requested_ids) - len(existing_ids)} missing notes")
+        
+        return scheduled
+
+    @staticmethod
+    async def compact_note_ws_updates(
+        db: AsyncSession,
+        note_id: str,
+    ) -> int:
+        """Merge the note's update log into its snapshot; returns the number of updates merged"""
+        note = (await db.execute(
+            sqlalchemy.select(Note.binary_content, Note.binary_content_encoding)
+            .where(Note.id == note_id)
+            .with_for_update()
+        )).first()
+        
+        if not note:
+            await db.rollback()
+            return 0
+        
+        updates = (await db.execute(
+            sqlalchemy.select(NoteYjsUpdate.id, NoteYjsUpdate.update)
+            .where(NoteYjsUpdate.note_id == note_id)
+            .order_by(NoteYjsUpdate.id.asc())
+        )).all()
+        
+        if not updates:
+            await db.rollback()
+            return 0
+        
+        snapshot = decode_state(note.binary_content, note.binary_content_encoding)
+        # Coalesced, so logged updates still waiting on one buffered in another API worker are not dropped
+        state = coalesce_updates([snapshot, *(row.update for row in updates)] if snapshot else [row.update for row in updates])
+        data, encoding = encode_state(state)
+        merged_bytes = sum(len(row.update) for row in updates)
+        
+        await db.execute(
+            sqlalchemy.delete(NoteYjsUpdate).where(
+                NoteYjsUpdate.note_id == note_id,
+                NoteYjsUpdate.id <= updates[-1].id
+            )
+        )
+        await db.execute(
+            sqlalchemy.update(Note)
+            .where(Note.id == note_id)
+            .values(
+                binary_content=data,
+                binary_content_encoding=encoding,
+                update_log_count=Note.update_log_count - len(updates),
+                update_log_bytes=Note.update_log_bytes - merged_bytes,
+                updated_at=Note.updated_at  # The document did not change, keep validators stable
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        
+        logger.info(f"Compacted {len(updates)} updates ({merged_bytes} bytes) of note {note_id} into a {len(data)} byte snapshot")
+        return len(updates)
+
+    @staticmethod
+    async def _record_versions(db: AsyncSession, note_ids: List[str], user_id: Optional[str] = None) -> None:
+        """Record version snapshots after a committed write; history is best-effort and never fails the write"""
+        try:
+            await NoteVersionService.record_versions(db, note_ids, user_id)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error recording versions of notes {note_ids}: {str(e)}")
+
+    @staticmethod
+    async def _schedule_content_derivation(note_id: str) -> None:
+        """Queue the note for content derivation, starting a batch chain if none is running"""
+        if await content_derivation_queue.mark_dirty(note_id):
+            await asyncio.to_thread(
+                celery_app.send_task, 'derive_note_contents', countdown=settings.CONTENT_DERIVATION_DEBOUNCE_SECONDS
+            )
+
+    @staticmethod
+    async def derive_note_contents(
+        db: AsyncSession,
+        limit: int = settings.CONTENT_DERIVATION_BATCH_SIZE
+    ) -> Tuple[int, Optional[float]]:
+        """
+        Rewrite `content` as markdown derived from the collaboration state of the notes that are due.
+        Returns the number of notes whose content changed, and the delay before the next batch (None if nothing is pending).
+        """
+        note_ids = await content_derivation_queue.pop_due(limit)
+        updated = 0
+        
+        try:
+            if note_ids:
+                notes = (await db.execute(
+                    sqlalchemy.select(
+                        Note.id, Note.organization_id, Note.parent_id, Note.content,
+                        Note.binary_content, Note.binary_content_encoding
+                    ).where(Note.id.in_(note_ids))
+                )).all()
+                tails = defaultdict(list)
+                for row in (await db.execute(
+                    sqlalchemy.select(NoteYjsUpdate.note_id, NoteYjsUpdate.update)
+                    .where(NoteYjsUpdate.note_id.in_(note_ids))
+                    .order_by(NoteYjsUpdate.id.asc())
+                )).all():
+                    tails[row.note_id].append(row.update)
+                
+                def derive(note) -> Optional[str]:
+                    snapshot = decode_state(note.binary_content, note.binary_content_encoding)
+                    updates = [snapshot, *tails[note.id]] if snapshot else tails[note.id]
+                    if not updates:
+                        return None
+                    try:
+                        return state_to_markdown(updates)
+                    except Exception as e:
+                        logger.error(f"Error deriving content of note {note.id}: {str(e)}")
+                        return None
+                
+                # Decoding is CPU bound; keep it off the event loop
+                contents = await asyncio.to_thread(lambda: [derive(note) for note in notes])
+                changed = [
+                    (note, content) for note, content in zip(notes, contents)
+                    if content is not None and content != note.content
+                ]
+                
+                if changed:
+                    now = datetime.now(timezone.utc)
+                    await db.execute(
+                        sqlalchemy.update(Note),
+                        [{"id": note.id, "content": content, "updated_at": now} for note, content in changed]
+                    )
+                    await db.commit()
+                    
+                    for note, _ in changed:
+                        await note_cache.invalidate(note.organization_id, note_ids=[note.id], children_of=[note.parent_id])
+                    await NoteService._record_versions(db, [note.id for note, _ in changed])
+                    await SemanticIndexService.schedule([note.id for note, _ in changed])
+                updated = len(changed)
+                
+                logger.info(f"Derived content of {len(notes)} notes, {updated} changed")
+        except Exception:
+            await db.rollback()
+            # The notes left the queue when popped; put them back so their content is not left stale
+            await content_derivation_queue.requeue(note_ids)
+            raise
+        finally:
+            # Releases the scheduling token when nothing is pending, or keeps it for the next batch
+            next_batch_in = await content_derivation_queue.finish_batch()
+        
+        return updated, next_batch_in
@@ -0,0 +1,340 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional, Tuple
+from app.models.note import Note, NoteYjsUpdate, NoteVersion
+from app.api.utils.delta import compress_delta, decompress_delta
+from app.api.utils.pagination import encode_cursor, decode_cursor
+from app.api.utils.yjs_state import decode_state, merge_updates, restore_update
+from app.api.v1.note.semantic_service import SemanticIndexService
+from app.core.cache import note_cache
+from app.core.config import settings
+from app.schemas.note import NoteResponse, NoteVersionResponse, NoteVersionDetailResponse
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+import asyncio
+import logging
+import requests
+import sqlalchemy
+import struct
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_HEADER = struct.Struct(">III")  # title, content and state lengths
+
+
+def _pack_snapshot(title: Optional[str], content: Optional[str], state: bytes) -> bytes:
+    title_bytes = (title or "").encode("utf-8")
+    content_bytes = (content or "").encode("utf-8")
+    return SNAPSHOT_HEADER.pack(len(title_bytes), len(content_bytes), len(state)) + title_bytes + content_bytes + state
+
+
+def _unpack_snapshot(data: bytes) -> Tuple[str, str, bytes]:
+    title_length, content_length, state_length = SNAPSHOT_HEADER.unpack_from(data)
+    offset = SNAPSHOT_HEADER.size
+    title = data[offset:offset + title_length].decode("utf-8")
+    offset += title_length
+    content = data[offset:offset + content_length].decode("utf-8")
+    offset += content_length
+    return title, content, data[offset:offset + state_length]
+
+
+class NoteVersionService:
+    @staticmethod
+    async def record_versions(
+        db: AsyncSession,
+        note_ids: List[str],
+        user_id: Optional[str] = None,
+        force: bool = False
+    ) -> int:
+        """
+        Snapshot the current title, content and collaboration state of the given notes.
+        Unless forced, a note is skipped while its latest version is younger than NOTE_VERSION_INTERVAL_SECONDS,
+        and whenever nothing changed since that version. Returns the number of versions written.
+        """
+        if not note_ids:
+            return 0
+
+        # Most calls come within the interval of the last version; decide that before reading any state
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.NOTE_VERSION_INTERVAL_SECONDS)
+        latest = await NoteVersionService._latest_versions(db, note_ids)
+        due_ids = [
+            note_id for note_id in note_ids
+            if force or note_id not in latest or latest[note_id].created_at <= cutoff
+        ]
+        if not due_ids:
+            await db.commit()
+            return 0
+
+        # Locking the note rows, in a stable order, serializes concurrent recorders of a note so they cannot pick
+        # the same version number; the latest versions are read again under the lock
+        notes = (await db.execute(
+            sqlalchemy.select(
+                Note.id, Note.organization_id, Note.title, Note.content,
+                Note.binary_content, Note.binary_content_encoding
+            )
+            .where(Note.id.in_(due_ids))
+            .order_by(Note.id)
+            .with_for_update()
+        )).all()
+        latest = await NoteVersionService._latest_versions(db, due_ids)
+        notes = [
+            note for note in notes
+            if force or note.id not in latest or latest[note.id].created_at <= cutoff
+        ]
+        if not notes:
+            await db.commit()
+            return 0
+
+        tails = defaultdict(list)
+        for row in (await db.execute(
+            sqlalchemy.select(NoteYjsUpdate.note_id, NoteYjsUpdate.update)
+            .where(NoteYjsUpdate.note_id.in_([note.id for note in notes]))
+            .order_by(NoteYjsUpdate.id.asc())
+        )).all():
+            tails[row.note_id].append(row.update)
+
+        recorded = 0
+        for note in notes:
+            last = latest.get(note.id)
+            previous = await NoteVersionService._load_snapshot(db, note.id, last.version) if last else None
+            keyframe = last is None or last.chain_depth + 1 >= settings.NOTE_VERSION_KEYFRAME_INTERVAL
+
+            def build() -> Optional[Tuple[bytes, int, int]]:
+                snapshot = decode_state(note.binary_content, note.binary_content_encoding)
+                updates = [snapshot, *tails[note.id]] if snapshot else tails[note.id]
+                state = merge_updates(updates) if len(updates) > 1 else (updates[0] if updates else b"")
+                raw = _pack_snapshot(note.title, note.content, state)
+                if raw == previous:
+                    return None
+                return compress_delta(raw, None if keyframe else previous), len(note.content or ""), len(state)
+
+            # Merging and compressing are CPU bound; keep them off the event loop
+            built = await asyncio.to_thread(build)
+            if built is None:
+                continue
+            payload, content_size, state_size = built
+
+            db.add(NoteVersion(
+                note_id=note.id,
+                organization_id=note.organization_id,
+                version=last.version + 1 if last else 1,
+                chain_depth=0 if keyframe else last.chain_depth + 1,
+                title=note.title,
+                content_size=content_size,
+                state_size=state_size,
+                payload=payload,
+                created_by=user_id
+            ))
+            recorded += 1
+
+        await db.commit()
+        return recorded
+
+    @staticmethod
+    async def _latest_versions(db: AsyncSession, note_ids: List[str]) -> Dict[str, sqlalchemy.Row]:
+        """The latest version row (number, chain depth and creation time) of each note that has one"""
+        return {
+            row.note_id: row for row in (await db.execute(
+                sqlalchemy.select(NoteVersion.note_id, NoteVersion.version, NoteVersion.chain_depth, NoteVersion.created_at)
+                .distinct(NoteVersion.note_id)
+                .where(NoteVersion.note_id.in_(note_ids))
+                .order_by(NoteVersion.note_id, NoteVersion.version.desc())
+            )).all()
+        }
+
+    @staticmethod
+    async def _load_snapshot(
+        db: AsyncSession,
+        note_id: str,
+        version: int
+    ) -> Optional[bytes]:
+        """Rebuild a version's packed snapshot from its keyframe, reading at most NOTE_VERSION_KEYFRAME_INTERVAL rows"""
+        keyframe = (
+            sqlalchemy.select(func.max(NoteVersion.version))
+            .where(
+                NoteVersion.note_id == note_id,
+                NoteVersion.version <= version,
+                NoteVersion.chain_depth == 0
+            )
+            .scalar_subquery()
+        )
+        chain = (await db.execute(
+            sqlalchemy.select(NoteVersion.version, NoteVersion.chain_depth, NoteVersion.payload)
+            .where(
+                NoteVersion.note_id == note_id,
+                NoteVersion.version >= keyframe,
+                NoteVersion.version <= version
+            )
+            .order_by(NoteVersion.version.asc())
+        )).all()
+
+        if not chain or chain[-1].version != version:
+            return None
+
+        def replay() -> bytes:
+            snapshot = None
+            for row in chain:
+                snapshot = decompress_delta(row.payload, snapshot if row.chain_depth else None)
+            return snapshot
+
+        return await asyncio.to_thread(replay)
+
+    @staticmethod
+    async def list_versions(
+        db: AsyncSession,
+        note_id: str,
+        organization_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[NoteVersionResponse], Optional[str]]:
+        """List a note's versions, newest first, with keyset pagination on the version number"""
+        query = sqlalchemy.select(
+            NoteVersion.id, NoteVersion.note_id, NoteVersion.version, NoteVersion.title,
+            NoteVersion.content_size, NoteVersion.state_size, NoteVersion.created_by, NoteVersion.created_at
+        ).where(
+            NoteVersion.note_id == note_id,
+            NoteVersion.organization_id == organization_id
+        )
+
+        if cursor:
+            before_version, = decode_cursor(cursor, 1)
+            query = query.where(NoteVersion.version < int(before_version))
+
+        versions = (await db.execute(
+            query.order_by(NoteVersion.version.desc()).limit(limit + 1)
+        )).all()
+
+        next_cursor = None
+        if len(versions) > limit:
+            versions = versions[:limit]
+            next_cursor = encode_cursor(versions[-1].version)
+
+        return [NoteVersionResponse.model_validate(version) for version in versions], next_cursor
+
+    @staticmethod
+    async def get_version(
+        db: AsyncSession,
+        note_id: str,
+        version: int,
+        organization_id: str
+    ) -> Optional[NoteVersionDetailResponse]:
+        """Get one version of a note, including its content"""
+        metadata = (await db.execute(
+            sqlalchemy.select(
+                NoteVersion.id, NoteVersion.note_id, NoteVersion.version, NoteVersion.title,
+                NoteVersion.content_size, NoteVersion.state_size, NoteVersion.created_by, NoteVersion.created_at
+            ).where(
+                NoteVersion.note_id == note_id,
+                NoteVersion.version == version,
+                NoteVersion.organization_id == organization_id
+            )
+        )).first()
+
+        if not metadata:
+            return None
+
+        snapshot = await NoteVersionService._load_snapshot(db, note_id, version)
+        if snapshot is None:
+            logger.warning(f"Version {version} of note {note_id} cannot be rebuilt, its delta chain is incomplete")
+            return None
+        _, content, _ = _unpack_snapshot(snapshot)
+
+        return NoteVersionDetailResponse(**NoteVersionResponse.model_validate(metadata).model_dump(), content=content)
+
+    @staticmethod
+    async def restore_version(
+        db: AsyncSession,
+        note_id: str,
+        version: int,
+        organization_id: str,
+        user_id: str
+    ) -> Optional[NoteResponse]:
+        """
+        Restore a note's title, content and collaboration state from a version.
+        The current state is recorded as a new version first, so a restore can itself be undone.
+        The collaboration state is restored with a Yjs update on top of the current state rather than by
+        overwriting it, so editors holding the current state converge on the restored document.
+        """
+        exists = (await db.execute(
+            sqlalchemy.select(NoteVersion.id).where(
+                NoteVersion.note_id == note_id,
+                NoteVersion.version == version,
+                NoteVersion.organization_id == organization_id
+            )
+        )).scalar()
+
+        if not exists:
+            return None
+
+        snapshot = await NoteVersionService._load_snapshot(db, note_id, version)
+        if snapshot is None:
+            logger.warning(f"Version {version} of note {note_id} cannot be rebuilt, its delta chain is incomplete")
+            return None
+        await NoteVersionService.record_versions(db, [note_id], user_id, force=True)
+
+        title, content, state = _unpack_snapshot(snapshot)
+        current = (await db.execute(
+            sqlalchemy.select(Note.binary_content, Note.binary_content_encoding).where(Note.id == note_id)
+        )).first()
+        tail = (await db.execute(
+            sqlalchemy.select(NoteYjsUpdate.update)
+            .where(NoteYjsUpdate.note_id == note_id)
+            .order_by(NoteYjsUpdate.id.asc())
+        )).scalars().all()
+
+        def build() -> bytes:
+            current_snapshot = decode_state(current.binary_content, current.binary_content_encoding)
+            updates = [current_snapshot, *tail] if current_snapshot else list(tail)
+            return restore_update(updates, [state] if state else [])
+
+        # Rebuilding both documents is CPU bound; keep it off the event loop
+        update = await asyncio.to_thread(build)
+
+        # The update is logged like any editor's save, in the same transaction as the title and content
+        note = (await db.execute(
+            sqlalchemy.update(Note)
+            .where(
+                Note.id == note_id,
+                Note.organization_id == organization_id
+            )
+            .values(
+                title=title,
+                content=content,
+                update_log_count=Note.update_log_count + 1,
+                update_log_bytes=Note.update_log_bytes + len(update),
+                updated_at=func.now()
+            )
+            .returning(Note)
+            .execution_options(synchronize_session=False)
+        )).scalar_one()
+        db.add(NoteYjsUpdate(note_id=note_id, update=update))
+        await db.commit()
+        note_response = NoteResponse.model_validate(note)
+
+        await NoteVersionService._push_to_collaboration(note_id, update)
+
+        await note_cache.invalidate(organization_id, note_ids=[note_id], children_of=[note.parent_id])
+        await SemanticIndexService.schedule([note_id])
+        logger.info(f"Restored note {note_id} to version {version}")
+
+        return note_response
+
+    @staticmethod
+    async def _push_to_collaboration(note_id: str, update: bytes) -> None:
+        """
+        Hand an update to the collaboration server so open editors apply it now; best effort, since the update is
+        already logged and reaches the server the next time it loads the document
+        """
+        if not settings.COLLABORATION_SERVICE_URL:
+            return
+        try:
+            response = await asyncio.to_thread(
+                requests.post,
+                f"{settings.COLLABORATION_SERVICE_URL}/documents/{note_id}/updates",
+                data=update,
+                headers={"Content-Type": "application/octet-stream", "X-API-Key": settings.WORKER_API_KEY or ""},
+                timeout=5
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Could not push update of note {note_id} to the collaboration server: {str(e)}")
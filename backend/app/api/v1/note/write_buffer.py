@@ -0,0 +1,249 @@
+"""
+Write-behind buffer for collaboration saves.
+
+Saves are acknowledged once they are fsync'd to an append-only spool segment and held in this process's
+buffer, so the buffer requires a spool directory. A background loop flushes the buffer with
+`NoteService.write_ws_batch` every `flush_interval` seconds, or sooner once it holds `max_notes`
+notes or `max_bytes` bytes, so the commit rate follows the flush interval instead of the number
+of editors.
+
+Saves to the same note are coalesced into one update as they arrive, so a flush writes one log row per note
+however many saves it covers, and `max_bytes` bounds the coalesced size. Yjs updates merge idempotently and in
+any order, so coalescing loses nothing, and a flush, which only ever merges into what is stored, can neither
+overwrite state committed in the meantime by another API worker nor be harmed by being replayed. A note with a
+buffered full state is flushed as that state with the highest log watermark it was saved with, trimming the log
+like an unbuffered save would. Segments are deleted once their contents are committed; segments left behind by
+a crashed process are replayed on startup.
+"""
+import asyncio
+import fcntl
+import glob
+import logging
+import os
+import struct
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.api.utils.yjs_state import coalesce_updates
+from app.api.v1.note.service import NoteService
+
+logger = logging.getLogger(__name__)
+
+RECORD_HEADER = struct.Struct(">BHI")  # kind, note id length, payload length
+WATERMARK = struct.Struct(">Q")
+UPDATE_RECORD = 1  # Segments written before appends-only flushing may also hold kind 0 (full states), replayed alike
+STATE_RECORD = 2  # Full state with a log watermark; the payload starts with the watermark
+
+
+class WsWriteBuffer:
+    def __init__(
+        self,
+        enabled: bool,
+        flush_interval: float,
+        max_notes: int,
+        max_bytes: int,
+        spool_dir: Optional[str] = None
+    ):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_notes = max_notes
+        self.max_bytes = max_bytes
+        self.spool_dir = spool_dir
+        self._pending: Dict[str, bytes] = {}  # Coalesced update per note
+        self._watermarks: Dict[str, int] = {}  # Highest log watermark of the full states buffered per note
+        self._size = 0
+        self._flush_lock = asyncio.Lock()
+        self._spool_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._segment: Optional[int] = None  # File descriptor of the segment receiving new records
+        self._segment_path: Optional[str] = None
+        self._closed_segments: List[Tuple[str, int]] = []
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        if not self.spool_dir:
+            # Without a spool, acknowledged saves would be lost with the process
+            raise RuntimeError("WS_WRITE_BUFFER_ENABLED requires WS_WRITE_SPOOL_DIR")
+        os.makedirs(self.spool_dir, exist_ok=True)
+        await self._replay_orphaned_segments()
+        self._open_segment()
+        self._loop_task = asyncio.create_task(self._run())
+        logger.info(f"Collaboration write buffer started (interval {self.flush_interval}s)")
+
+    async def stop(self) -> None:
+        if self._loop_task is None:
+            return
+        self._loop_task.cancel()
+        try:
+            await self._loop_task
+        except asyncio.CancelledError:
+            pass
+        self._loop_task = None
+        await self.flush()
+
+    async def put_update(self, note_id: str, update: bytes, watermark: Optional[int] = None) -> None:
+        """
+        Buffer a Yjs update, or a full state built on the log up to `watermark`,
+        coalescing it with what is already buffered for the note
+        """
+        async with self._spool_lock:
+            if watermark is None:
+                await self._spool(UPDATE_RECORD, note_id, update)
+            else:
+                await self._spool(STATE_RECORD, note_id, WATERMARK.pack(watermark) + update)
+            await self._merge({note_id: update}, {} if watermark is None else {note_id: watermark})
+        self._maybe_wake()
+
+    def pending(self, note_id: str) -> Optional[bytes]:
+        """The coalesced update buffered in this process for a note and not flushed yet"""
+        return self._pending.get(note_id)
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            # A record and its buffer entry always land on the same side of the segment rotation
+            async with self._spool_lock:
+                pending, watermarks = self._pending, self._watermarks
+                self._pending, self._watermarks, self._size = {}, {}, 0
+                if self._segment is not None:
+                    self._rotate_segment()
+
+            try:
+                async with AsyncSessionLocal() as db:
+                    await NoteService.write_ws_batch(db, **self._batch(pending, watermarks))
+            except Exception as e:
+                logger.error(f"Error flushing collaboration writes, keeping {len(pending)} notes buffered: {str(e)}")
+                async with self._spool_lock:
+                    await self._merge(pending, watermarks)
+                return
+
+            # Everything written to closed segments is committed now, including earlier failed flushes
+            for path, fd in self._closed_segments:
+                os.close(fd)
+                os.remove(path)
+            self._closed_segments = []
+            logger.info(f"Flushed collaboration writes for {len(pending)} notes")
+
+    async def _merge(self, updates: Dict[str, bytes], watermarks: Dict[str, int]) -> None:
+        """Coalesce updates into the buffer; callers hold the spool lock, so merges of a note never interleave"""
+        def merge() -> Dict[str, bytes]:
+            return {
+                note_id: coalesce_updates([self._pending[note_id], update]) if note_id in self._pending else update
+                for note_id, update in updates.items()
+            }
+
+        # Merging is CPU bound; keep it off the event loop
+        merged = await asyncio.to_thread(merge)
+        for note_id, update in merged.items():
+            self._size += len(update) - len(self._pending.get(note_id, b""))
+            self._pending[note_id] = update
+        for note_id, watermark in watermarks.items():
+            self._watermarks[note_id] = max(watermark, self._watermarks.get(note_id, watermark))
+
+    @staticmethod
+    def _batch(pending: Dict[str, bytes], watermarks: Dict[str, int]) -> dict:
+        """
+        `write_ws_batch` arguments for coalesced updates: a note with a buffered full state is saved as a state,
+        since its coalesced update covers every log row up to the highest watermark; the others are appended
+        """
+        return {
+            "states": {note_id: (update, watermarks[note_id]) for note_id, update in pending.items() if note_id in watermarks},
+            "appends": {note_id: [update] for note_id, update in pending.items() if note_id not in watermarks},
+        }
+
+    def _maybe_wake(self) -> None:
+        if len(self._pending) >= self.max_notes or self._size >= self.max_bytes:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def _open_segment(self) -> None:
+        path = os.path.join(self.spool_dir, f"ws-{os.getpid()}-{uuid.uuid4().hex}.spool")
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        # Held until the segment is deleted, so other processes never replay it while we own it
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._segment = fd
+        self._segment_path = path
+
+    def _rotate_segment(self) -> None:
+        self._closed_segments.append((self._segment_path, self._segment))
+        self._open_segment()
+
+    async def _spool(self, kind: int, note_id: str, payload: bytes) -> None:
+        """Append a record to the current segment and fsync it; callers hold the spool lock"""
+        if self._segment is None:
+            return
+        key = note_id.encode("utf-8")
+        record = RECORD_HEADER.pack(kind, len(key), len(payload)) + key + payload
+        segment = self._segment
+
+        def write() -> None:
+            os.write(segment, record)
+            os.fsync(segment)
+
+        await asyncio.to_thread(write)
+
+    async def _replay_orphaned_segments(self) -> None:
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "*.spool")), key=os.path.getmtime):
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue  # Owned by a live process
+
+            try:
+                with open(path, "rb") as segment:
+                    data = segment.read()
+                updates: Dict[str, List[bytes]] = defaultdict(list)
+                watermarks: Dict[str, int] = {}
+                offset = 0
+                # A record torn by the crash is incomplete and was never acknowledged
+                while offset + RECORD_HEADER.size <= len(data):
+                    kind, key_length, payload_length = RECORD_HEADER.unpack_from(data, offset)
+                    end = offset + RECORD_HEADER.size + key_length + payload_length
+                    if end > len(data):
+                        break
+                    note_id = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + key_length].decode("utf-8")
+                    payload = data[end - payload_length:end]
+                    if kind == STATE_RECORD:
+                        watermark, = WATERMARK.unpack_from(payload)
+                        watermarks[note_id] = max(watermark, watermarks.get(note_id, watermark))
+                        payload = payload[WATERMARK.size:]
+                    updates[note_id].append(payload)
+                    offset = end
+
+                # Merged, never replacing: the spooled states may be older than what was committed since
+                pending = await asyncio.to_thread(
+                    lambda: {note_id: coalesce_updates(note_updates) for note_id, note_updates in updates.items()}
+                )
+                async with AsyncSessionLocal() as db:
+                    await NoteService.write_ws_batch(db, **self._batch(pending, watermarks))
+                os.remove(path)
+                logger.info(f"Replayed collaboration spool {path} for {len(pending)} notes")
+            except Exception as e:
+                logger.error(f"Error replaying collaboration spool {path}: {str(e)}")
+            finally:
+                os.close(fd)
+
+
+ws_write_buffer = WsWriteBuffer(
+    enabled=settings.WS_WRITE_BUFFER_ENABLED,
+    flush_interval=settings.WS_WRITE_FLUSH_INTERVAL_SECONDS,
+    max_notes=settings.WS_WRITE_FLUSH_MAX_NOTES,
+    max_bytes=settings.WS_WRITE_FLUSH_MAX_BYTES,
+    spool_dir=settings.WS_WRITE_SPOOL_DIR,
+)
@@ -0,0 +1,187 @@
+from app.core.config import settings
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+class NoteCache:
+    """
+    Read-through cache for note detail and children list responses, stored in the deployment's Redis.
+
+    Keys are scoped per organization: `note_cache:{organization_id}:{kind}:{note_id}`.
+    Entries expire after `ttl_seconds`, and each organization keeps at most `max_entries_per_org`
+    entries, tracked in a sorted set by write time so the oldest are evicted first.
+    Redis errors never fail a request; the caller simply falls back to the database.
+
+    Invalidations bump a generation counter per entry and per organization. Readers take the generation
+    with their lookup and only store what they read from the database if it has not moved since,
+    so a read racing with a write and its invalidation cannot leave a stale entry behind.
+    """
+    NOTE = "note"
+    CHILDREN = "children"
+    STATS_KEY = "note_cache:stats"
+    # Store the entry only if neither its generation nor the organization's moved since the lookup
+    SET_IF_CURRENT = """
+        local current = (redis.call('GET', KEYS[2]) or '0') .. ':' .. (redis.call('GET', KEYS[3]) or '0')
+        if current ~= ARGV[2] then
+            return 0
+        end
+        redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[3])
+        return 1
+    """
+
+    def __init__(self, redis_url: str, ttl_seconds: int, max_entries_per_org: int, enabled: bool = True):
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_org = max_entries_per_org
+        self.enabled = enabled
+        self.generation_ttl_seconds = max(ttl_seconds, 60)
+        self._client: Optional[Redis] = None
+        self._set_if_current = None
+
+    @property
+    def client(self) -> Redis:
+        if self._client is None:
+            self._client = Redis.from_url(self.redis_url)
+        return self._client
+
+    @staticmethod
+    def _key(organization_id: str, kind: str, note_id: str) -> str:
+        return f"note_cache:{organization_id}:{kind}:{note_id}"
+
+    @staticmethod
+    def _index_key(organization_id: str) -> str:
+        return f"note_cache:{organization_id}:keys"
+
+    @staticmethod
+    def _generation_key(key: str) -> str:
+        return f"{key}:gen"
+
+    @staticmethod
+    def _organization_generation_key(organization_id: str) -> str:
+        return f"note_cache:{organization_id}:gen"
+
+    async def get(self, organization_id: str, kind: str, note_id: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Return the cached payload and the entry's current generation, counting the lookup in the shared stats.
+        On a miss, pass the generation to `set` along with the payload read from the database.
+        """
+        if not self.enabled:
+            return None, None
+        key = self._key(organization_id, kind, note_id)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.get(key)
+                pipe.get(self._generation_key(key))
+                pipe.get(self._organization_generation_key(organization_id))
+                pipe.hincrby(self.STATS_KEY, f"{kind}:lookups", 1)
+                payload, generation, organization_generation, _ = await pipe.execute()
+            if payload is None:
+                await self.client.hincrby(self.STATS_KEY, f"{kind}:misses", 1)
+            return payload, f"{int(generation or 0)}:{int(organization_generation or 0)}"
+        except RedisError as e:
+            logger.warning(f"Note cache read failed: {str(e)}")
+            return None, None
+
+    async def set(self, organization_id: str, kind: str, note_id: str, payload: str, generation: Optional[str]) -> None:
+        """Store a payload read after the `get` that returned `generation`, unless an invalidation happened since"""
+        if not self.enabled or generation is None:
+            return
+        key = self._key(organization_id, kind, note_id)
+        index_key = self._index_key(organization_id)
+        try:
+            if self._set_if_current is None:
+                self._set_if_current = self.client.register_script(self.SET_IF_CURRENT)
+            stored = await self._set_if_current(
+                keys=[key, self._generation_key(key), self._organization_generation_key(organization_id)],
+                args=[payload, generation, self.ttl_seconds]
+            )
+            if not stored:
+                return
+
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.zadd(index_key, {key: time.time()})
+                pipe.expire(index_key, self.ttl_seconds)
+                pipe.zcard(index_key)
+                *_, size = await pipe.execute()
+
+            # Evict the oldest entries of this organization once it is over its budget
+            overflow = size - self.max_entries_per_org
+            if overflow > 0:
+                evicted = [member for member, _ in await self.client.zpopmin(index_key, overflow)]
+                if evicted:
+                    await self.client.delete(*evicted)
+        except RedisError as e:
+            logger.warning(f"Note cache write failed: {str(e)}")
+
+    async def invalidate(
+        self,
+        organization_id: str,
+        note_ids: Iterable[Optional[str]] = (),
+        children_of: Iterable[Optional[str]] = ()
+    ) -> None:
+        """Drop the detail entries of `note_ids` and the children lists of `children_of`"""
+        if not self.enabled:
+            return
+        keys = {self._key(organization_id, self.NOTE, note_id) for note_id in note_ids if note_id}
+        keys |= {self._key(organization_id, self.CHILDREN, note_id) for note_id in children_of if note_id}
+        if not keys:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.incr(self._generation_key(key))
+                    pipe.expire(self._generation_key(key), self.generation_ttl_seconds)
+                pipe.delete(*keys)
+                pipe.zrem(self._index_key(organization_id), *keys)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Note cache invalidation failed: {str(e)}")
+
+    async def invalidate_organization(self, organization_id: str) -> None:
+        """Drop every entry of an organization, used when a whole subtree's paths change"""
+        if not self.enabled:
+            return
+        index_key = self._index_key(organization_id)
+        try:
+            organization_generation_key = self._organization_generation_key(organization_id)
+            await self.client.incr(organization_generation_key)
+            await self.client.expire(organization_generation_key, self.generation_ttl_seconds)
+            keys = await self.client.zrange(index_key, 0, -1)
+            async with self.client.pipeline(transaction=False) as pipe:
+                if keys:
+                    pipe.delete(*keys)
+                pipe.delete(index_key)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Note cache invalidation failed: {str(e)}")
+
+    async def stats(self) -> Dict[str, Dict[str, float]]:
+        """Hit/miss counters per entry kind, shared by all API workers"""
+        raw = await self.client.hgetall(self.STATS_KEY)
+        counters = {key.decode(): int(value) for key, value in raw.items()}
+        stats = {}
+        for kind in (self.NOTE, self.CHILDREN):
+            lookups = counters.get(f"{kind}:lookups", 0)
+            misses = counters.get(f"{kind}:misses", 0)
+            stats[kind] = {
+                "lookups": lookups,
+                "hits": lookups - misses,
+                "misses": misses,
+                "hit_rate": round((lookups - misses) / lookups, 4) if lookups else 0.0,
+            }
+        return stats
+
+    async def reset_stats(self) -> None:
+        await self.client.delete(self.STATS_KEY)
+
+
+note_cache = NoteCache(
+    redis_url=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.NOTE_CACHE_REDIS_DB}",
+    ttl_seconds=settings.NOTE_CACHE_TTL_SECONDS,
+    max_entries_per_org=settings.NOTE_CACHE_MAX_ENTRIES_PER_ORG,
+    enabled=settings.NOTE_CACHE_ENABLED,
+)
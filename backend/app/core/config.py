@@ -36,11 +36,63 @@ class Settings(BaseSettings):
     MINIO_PORT: str
     MINIO_URL: Optional[str] = None
     MINIO_CONSOLE_URL: Optional[str] = None
+    # One storage client per process; size the pool for the concurrent uploads and downloads of a worker
+    STORAGE_BUCKET_NAME: str = "radhe-bucket"
+    STORAGE_MAX_POOL_CONNECTIONS: int = 50
+    STORAGE_CONNECT_TIMEOUT_SECONDS: float = 5
+    STORAGE_READ_TIMEOUT_SECONDS: float = 60
+    # Streaming uploads: multipart part size (S3 minimum is 5 MiB) and parts uploaded in parallel per upload
+    STORAGE_UPLOAD_PART_SIZE: int = 8 * 1024 * 1024
+    STORAGE_UPLOAD_CONCURRENCY: int = 4
+    STORAGE_DOWNLOAD_CHUNK_SIZE: int = 256 * 1024  # Bytes read from storage per chunk of a streamed download
 
     # Redis
     REDIS_HOST: str
     REDIS_PORT: str
 
+    # Note cache (Redis db 0 is used by Celery)
+    NOTE_CACHE_ENABLED: bool = True
+    NOTE_CACHE_REDIS_DB: int = 1
+    NOTE_CACHE_TTL_SECONDS: int = 300
+    NOTE_CACHE_MAX_ENTRIES_PER_ORG: int = 5000
+
+    # Collaboration state at rest ("zstd" or None to store raw Yjs updates)
+    YJS_STATE_COMPRESSION: Optional[str] = "zstd"
+    YJS_STATE_COMPRESSION_LEVEL: int = 3
+    YJS_STATE_COMPRESSION_MIN_BYTES: int = 1024
+    # Merge the per-note update log into the snapshot every this many updates or bytes
+    YJS_LOG_COMPACT_COUNT: int = 200
+    YJS_LOG_COMPACT_BYTES: int = 1024 * 1024
+    # Derive note content from collaboration state this long after the last edit, and at most this long after the first
+    CONTENT_DERIVATION_DEBOUNCE_SECONDS: int = 10
+    CONTENT_DERIVATION_MAX_WAIT_SECONDS: int = 60
+    CONTENT_DERIVATION_BATCH_SIZE: int = 100
+    # Write-behind buffer for collaboration saves; enabling it requires a spool directory, where saves are fsync'd before acknowledging them
+    WS_WRITE_BUFFER_ENABLED: bool = False
+    WS_WRITE_FLUSH_INTERVAL_SECONDS: float = 1.0
+    WS_WRITE_FLUSH_MAX_NOTES: int = 500
+    WS_WRITE_FLUSH_MAX_BYTES: int = 32 * 1024 * 1024
+    WS_WRITE_SPOOL_DIR: Optional[str] = None
+
+    # Collaboration server, told about edits made outside it (version restores) so open editors receive them
+    COLLABORATION_SERVICE_URL: Optional[str] = None
+
+    # Note history: snapshot at most once per interval, storing a full keyframe every this many versions
+    NOTE_VERSION_INTERVAL_SECONDS: int = 600
+    NOTE_VERSION_KEYFRAME_INTERVAL: int = 16
+
+    # Semantic index over note chunks (pgvector); the dimension is fixed by the note_chunk migration
+    SEMANTIC_INDEX_ENABLED: bool = True
+    SEMANTIC_EMBEDDER_PROVIDER: str = "hashing"
+    SEMANTIC_EMBEDDER_MODEL: Optional[str] = None
+    SEMANTIC_EMBEDDING_DIMENSIONS: int = 256
+    SEMANTIC_CHUNK_WORDS: int = 200
+    SEMANTIC_INDEX_EF_SEARCH: int = 100
+
+    # Reference notes packed into agent prompts
+    AGENT_REFERENCE_TOKEN_BUDGET: int = 8000
+    AGENT_REFERENCE_MAX_NOTES: int = 500
+
     # Celery
     BACKEND_BASE_URL: Optional[str] = None
     WORKER_API_KEY: Optional[str] = None
@@ -0,0 +1,123 @@
+from app.core.config import settings
+import logging
+import time
+from typing import List, Optional
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Pop up to ARGV[2] notes whose due time has passed, forgetting their first-dirty time
+POP_DUE_SCRIPT = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+    redis.call('HDEL', KEYS[2], unpack(due))
+end
+return due
+"""
+
+class ContentDerivationQueue:
+    """
+    Notes whose collaboration state changed and whose `content` must be derived again.
+
+    Each note is due `debounce_seconds` after its last change, but no later than `max_wait_seconds`
+    after the first change that has not been derived yet, so notes being edited continuously still
+    refresh. Due times live in a sorted set shared by all API workers. A scheduling token keeps a
+    single chain of Celery batches alive while anything is pending; it expires on its own if the
+    chain is lost, and the next change starts a new one.
+    """
+    PENDING_KEY = "content_derivation:pending"
+    FIRST_DIRTY_KEY = "content_derivation:first_dirty"
+    SCHEDULED_KEY = "content_derivation:scheduled"
+
+    def __init__(self, redis_url: str, debounce_seconds: int, max_wait_seconds: int):
+        self.redis_url = redis_url
+        self.debounce_seconds = debounce_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self._client: Optional[Redis] = None
+
+    @property
+    def _token_ttl(self) -> int:
+        return 2 * self.max_wait_seconds
+
+    @property
+    def client(self) -> Redis:
+        if self._client is None:
+            self._client = Redis.from_url(self.redis_url)
+        return self._client
+
+    async def mark_dirty(self, note_id: str) -> bool:
+        """
+        Record a change to a note's collaboration state.
+        Returns True when the caller should schedule a derivation batch, because none is pending.
+        """
+        now = time.time()
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.hsetnx(self.FIRST_DIRTY_KEY, note_id, now)
+                pipe.hget(self.FIRST_DIRTY_KEY, note_id)
+                _, first_dirty = await pipe.execute()
+
+            due = min(now + self.debounce_seconds, float(first_dirty) + self.max_wait_seconds)
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.zadd(self.PENDING_KEY, {note_id: due})
+                pipe.set(self.SCHEDULED_KEY, 1, nx=True, ex=self._token_ttl)
+                _, claimed = await pipe.execute()
+            return bool(claimed)
+        except RedisError as e:
+            logger.warning(f"Content derivation queue write failed: {str(e)}")
+            return False
+
+    async def pop_due(self, limit: int) -> List[str]:
+        """Remove and return up to `limit` notes that are due for derivation"""
+        due = await self.client.eval(POP_DUE_SCRIPT, 2, self.PENDING_KEY, self.FIRST_DIRTY_KEY, time.time(), limit)
+        return [note_id.decode() for note_id in due]
+
+    async def requeue(self, note_ids: List[str]) -> None:
+        """
+        Put back notes popped by a batch that failed, due after the debounce so the retry does not spin.
+        Notes marked dirty again since they were popped keep their own due time.
+        """
+        if not note_ids:
+            return
+        now = time.time()
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.zadd(self.PENDING_KEY, {note_id: now + self.debounce_seconds for note_id in note_ids}, nx=True)
+                for note_id in note_ids:
+                    pipe.hsetnx(self.FIRST_DIRTY_KEY, note_id, now)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Content derivation queue write failed, {len(note_ids)} notes dropped: {str(e)}")
+
+    async def finish_batch(self) -> Optional[float]:
+        """
+        Called by the batch that holds the scheduling token once it is done.
+        Returns the delay before the next batch should run, or None if nothing is pending and the token was released.
+        """
+        next_due = await self.next_due_in()
+        if next_due is not None:
+            await self.client.expire(self.SCHEDULED_KEY, self._token_ttl)
+            return next_due
+
+        await self.client.delete(self.SCHEDULED_KEY)
+        # A change marked between the check and the release found the token taken and scheduled nothing
+        next_due = await self.next_due_in()
+        if next_due is not None and await self.client.set(self.SCHEDULED_KEY, 1, nx=True, ex=self._token_ttl):
+            return next_due
+        return None
+
+    async def next_due_in(self) -> Optional[float]:
+        """Seconds until the next pending note is due (0 if overdue), or None if nothing is pending"""
+        head = await self.client.zrange(self.PENDING_KEY, 0, 0, withscores=True)
+        if not head:
+            return None
+        return max(0.0, head[0][1] - time.time())
+
+
+content_derivation_queue = ContentDerivationQueue(
+    redis_url=f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.NOTE_CACHE_REDIS_DB}",
+    debounce_seconds=settings.CONTENT_DERIVATION_DEBOUNCE_SECONDS,
+    max_wait_seconds=settings.CONTENT_DERIVATION_MAX_WAIT_SECONDS,
+)
@@ -1,113 +1,122 @@
-from minio import Minio
 from app.core.config import settings
+import asyncio
+import hashlib
 import logging
-import io
+import tempfile
+import threading
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Set, Tuple
 import json
 
 logger = logging.getLogger(__name__)
 
-class MinioClient:
-    def __init__(self):
-        self.client = Minio(
-            f"{settings.MINIO_HOST}:{settings.MINIO_PORT}",
-            access_key=settings.MINIO_ROOT_USER,
-            secret_key=settings.MINIO_ROOT_PASSWORD,
-            secure=False  # Set to True if using HTTPS
-        )
+# Content-addressed objects never change under their key, so any cache may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-    def create_bucket_if_not_exists(self, bucket_name: str):
-        try:
-            if not self.client.bucket_exists(bucket_name):
-                self.client.make_bucket(bucket_name)
-                logger.info(f"Created bucket: {bucket_name}")
-            return True
-        except Exception as e:
-            logger.error(f"Error creating bucket {bucket_name}: {str(e)}")
-            raise
 
-    def upload_file(self, bucket_name: str, object_name: str, file_data: bytes, content_type: str):
-        try:
-            self.create_bucket_if_not_exists(bucket_name)
-            self.client.put_object(
-                bucket_name,
-                object_name,
-                io.BytesIO(file_data),  # Wrap bytes in BytesIO
-                length=len(file_data),
-                content_type=content_type
-            )
-            return True
-        except Exception as e:
-            logger.error(f"Error uploading file {object_name}: {str(e)}")
-            raise
+def content_addressed_key(prefix: str, sha256: str) -> str:
+    """Key of the object with the given SHA-256 hex digest under a prefix, e.g. an organization id"""
+    return f"{prefix}/sha256/{sha256}"
 
+class StorageClient:
+    """
+    Process-wide S3/MinIO client, created on first use and shared by every request.
 
-    def get_file(self, bucket_name: str, object_name: str):
-        try:
-            response = self.client.get_object(bucket_name, object_name)
-            return response.read()  # Read the data before returning
-        except Exception as e:
-            logger.error(f"Error retrieving file {object_name}: {str(e)}")
-            raise
+    boto3 clients are thread-safe, so one client with a connection pool sized by
+    STORAGE_MAX_POOL_CONNECTIONS serves all concurrent requests of the process.
+    Buckets are checked (and created, public-read only for STORAGE_BUCKET_NAME) once per process;
+    after that, presigning URLs is pure local signing with no round trip to storage.
+    """
 
+    def __init__(self):
+        self.region_name = "us-east-1"
+        self.endpoint_url = f"http://{settings.MINIO_HOST}:{settings.MINIO_PORT}" if settings.ENVIRONMENT == "development" else f"https://{settings.MINIO_URL}"
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._bucket_lock = threading.Lock()
+        self._ensured_buckets: Set[str] = set()
 
-    def delete_file(self, bucket_name: str, object_name: str):
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = boto3.client(
+                        's3',
+                        endpoint_url=self.endpoint_url,
+                        aws_access_key_id=settings.MINIO_ROOT_USER,
+                        aws_secret_access_key=settings.MINIO_ROOT_PASSWORD,
+                        region_name=self.region_name,
+                        config=Config(
+                            signature_version='s3v4',
+                            max_pool_connections=settings.STORAGE_MAX_POOL_CONNECTIONS,
+                            connect_timeout=settings.STORAGE_CONNECT_TIMEOUT_SECONDS,
+                            read_timeout=settings.STORAGE_READ_TIMEOUT_SECONDS,
+                            retries={'max_attempts': 3, 'mode': 'standard'},
+                            tcp_keepalive=True,
+                        )
+                    )
+        return self._client
+
+    def ensure_bucket(self, bucket_name: str) -> None:
+        """Ensure the bucket exists with its policies; only the first call per bucket reaches storage"""
+        if bucket_name in self._ensured_buckets:
+            return
+        with self._bucket_lock:
+            if bucket_name in self._ensured_buckets:
+                return
+            self._ensure_bucket_exists(bucket_name)
+            self._ensured_buckets.add(bucket_name)
+
+    def object_exists(self, bucket_name: str, file_key: str) -> bool:
+        """
+        Whether an object exists, always asked of storage: objects can be deleted through any API worker,
+        so a per-process record of keys seen before could hand out URLs to missing objects.
+        """
         try:
-            self.client.remove_object(bucket_name, object_name)
-            return True
-        except Exception as e:
-            logger.error(f"Error deleting file {object_name}: {str(e)}")
+            self.client.head_object(Bucket=bucket_name, Key=file_key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
             raise
+        return True
 
-class StorageService:
-    def __init__(self, bucket_name: str):
-        """Initialize the storage service with MinIO/S3 client"""
-        if not bucket_name:
-            raise ValueError("Bucket name is required")
-        self.bucket_name = bucket_name
-        self.region_name = "us-east-1"
-        self.endpoint_url = f"http://{settings.MINIO_HOST}:{settings.MINIO_PORT}" if settings.ENVIRONMENT == "development" else f"https://{settings.MINIO_URL}"
-        
-        # Configure the client using settings
-        self.s3_client = boto3.client(
-            's3',
-            endpoint_url=self.endpoint_url,
-            aws_access_key_id=settings.MINIO_ROOT_USER,
-            aws_secret_access_key=settings.MINIO_ROOT_PASSWORD,
-            region_name=self.region_name,
-            config=boto3.session.Config(signature_version='s3v4')
-        )
-        
-        # Ensure bucket exists
-        self._ensure_bucket_exists()
-    
-    def _ensure_bucket_exists(self):
-        """Ensure the bucket exists, creating it if necessary"""
+    def _ensure_bucket_exists(self, bucket_name: str):
+        """
+        Ensure the bucket exists, creating it if necessary.
+        Only the application bucket (STORAGE_BUCKET_NAME) gets the CORS and public-read policies;
+        any other bucket is created private and its policy is left alone.
+        """
+        public = bucket_name == settings.STORAGE_BUCKET_NAME
         try:
-            self.s3_client.head_bucket(Bucket=self.bucket_name)
-            logger.info(f"Bucket {self.bucket_name} already exists")
+            self.client.head_bucket(Bucket=bucket_name)
+            logger.info(f"Bucket {bucket_name} already exists")
+            if not public:
+                return
             
             # Check if policy exists for existing bucket
             try:
-                self.s3_client.get_bucket_policy(Bucket=self.bucket_name)
-                logger.info(f"Bucket {self.bucket_name} already has a policy")
+                self.client.get_bucket_policy(Bucket=bucket_name)
+                logger.info(f"Bucket {bucket_name} already has a policy")
             except ClientError as e:
                 if e.response['Error']['Code'] == 'NoSuchBucketPolicy':
                     # No policy exists, set it
-                    self._set_bucket_policy()
+                    self._set_bucket_policy(bucket_name)
         except ClientError:
-            logger.info(f"Creating bucket {self.bucket_name}")
-            self.s3_client.create_bucket(Bucket=self.bucket_name)
+            logger.info(f"Creating {'public' if public else 'private'} bucket {bucket_name}")
+            self.client.create_bucket(Bucket=bucket_name)
+            if not public:
+                return
             
             # Set CORS policy
-            self._set_cors_policy()
+            self._set_cors_policy(bucket_name)
             
             # Set bucket policy
-            self._set_bucket_policy()
+            self._set_bucket_policy(bucket_name)
 
-    def _set_cors_policy(self):
+    def _set_cors_policy(self, bucket_name: str):
         """Set CORS policy for the bucket"""
         cors_configuration = {
             'CORSRules': [{
@@ -119,8 +128,8 @@ class StorageService:
         }
         
         try:
-            self.s3_client.put_bucket_cors(
-                Bucket=self.bucket_name,
+            self.client.put_bucket_cors(
+                Bucket=bucket_name,
                 CORSConfiguration=cors_configuration
             )
             logger.info("CORS policy set successfully")
@@ -128,7 +137,7 @@ class StorageService:
             # Log but don't fail if CORS setting fails
             logger.warning(f"Could not set CORS policy: {str(e)}")
 
-    def _set_bucket_policy(self):
+    def _set_bucket_policy(self, bucket_name: str):
         """Set public read policy for the bucket"""
         try:
             bucket_policy = {
@@ -138,13 +147,13 @@ class StorageService:
                         "Effect": "Allow",
                         "Principal": {"AWS": "*"},
                         "Action": ["s3:GetBucketLocation", "s3:ListBucket"],
-                        "Resource": [f"arn:aws:s3:::{self.bucket_name}"]
+                        "Resource": [f"arn:aws:s3:::{bucket_name}"]
                     },
                     {
                         "Effect": "Allow",
                         "Principal": {"AWS": "*"},
                         "Action": ["s3:GetObject"],
-                        "Resource": [f"arn:aws:s3:::{self.bucket_name}/*"]
+                        "Resource": [f"arn:aws:s3:::{bucket_name}/*"]
                     }
                 ]
             }
@@ -152,19 +161,268 @@ class StorageService:
             policy_str = json.dumps(bucket_policy)
             
             # Set the bucket policy
-            self.s3_client.put_bucket_policy(
-                Bucket=self.bucket_name,
+            self.client.put_bucket_policy(
+                Bucket=bucket_name,
                 Policy=policy_str
             )
             
             # Verify the policy was set correctly
-            policy_response = self.s3_client.get_bucket_policy(Bucket=self.bucket_name)
+            policy_response = self.client.get_bucket_policy(Bucket=bucket_name)
             set_policy = json.loads(policy_response['Policy'])
             logger.info(f"Set bucket policy: {set_policy}")
             
         except ClientError as e:
             logger.error(f"Failed to set bucket policy: {str(e)}")
             raise
+
+
+storage_client = StorageClient()
+
+
+class StreamingUpload:
+    """
+    Upload fed incrementally, e.g. from a request body, as an S3 multipart upload.
+
+    Data is buffered until a part of `part_size` bytes is full, which is then uploaded in a worker
+    thread while more data arrives. At most `concurrency` parts are in flight; `write` waits for a
+    free slot, so memory stays around part_size * (concurrency + 1) regardless of the object size.
+    Objects smaller than one part are sent with a single PUT instead.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        file_key: str,
+        content_type: Optional[str],
+        part_size: int = settings.STORAGE_UPLOAD_PART_SIZE,
+        concurrency: int = settings.STORAGE_UPLOAD_CONCURRENCY,
+        cache_control: Optional[str] = None
+    ):
+        self.bucket_name = bucket_name
+        self.file_key = file_key
+        self.content_type = content_type or "application/octet-stream"
+        self.cache_control = cache_control
+        self.part_size = part_size
+        self.size = 0
+        self._buffer = bytearray()
+        self._upload_id: Optional[str] = None
+        self._parts: List[asyncio.Task] = []
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        self.size += len(data)
+        if len(self._buffer) >= self.part_size:
+            await self._dispatch_part()
+
+    async def complete(self) -> int:
+        """Upload what is left and finish the object; returns its size"""
+        try:
+            if self._upload_id is None:
+                await asyncio.to_thread(
+                    storage_client.client.put_object,
+                    Body=bytes(self._buffer),
+                    **self._object_params()
+                )
+                return self.size
+
+            if self._buffer:
+                await self._dispatch_part()
+            parts = await asyncio.gather(*self._parts)
+            await asyncio.to_thread(
+                storage_client.client.complete_multipart_upload,
+                Bucket=self.bucket_name,
+                Key=self.file_key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])}
+            )
+            logger.info(f"Completed multipart upload of {self.file_key} ({self.size} bytes in {len(parts)} parts)")
+            return self.size
+        except BaseException:
+            await self.abort()
+            raise
+        finally:
+            self._buffer = bytearray()
+
+    async def abort(self) -> None:
+        """Drop the parts uploaded so far; safe to call more than once"""
+        for task in self._parts:
+            task.cancel()
+        await asyncio.gather(*self._parts, return_exceptions=True)
+        self._parts = []
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            try:
+                await asyncio.to_thread(
+                    storage_client.client.abort_multipart_upload,
+                    Bucket=self.bucket_name,
+                    Key=self.file_key,
+                    UploadId=upload_id
+                )
+            except ClientError as e:
+                logger.warning(f"Could not abort multipart upload of {self.file_key}: {str(e)}")
+
+    def _object_params(self) -> Dict:
+        params = {"Bucket": self.bucket_name, "Key": self.file_key, "ContentType": self.content_type}
+        if self.cache_control:
+            params["CacheControl"] = self.cache_control
+        return params
+
+    async def _dispatch_part(self) -> None:
+        if self._upload_id is None:
+            response = await asyncio.to_thread(
+                storage_client.client.create_multipart_upload,
+                **self._object_params()
+            )
+            self._upload_id = response["UploadId"]
+
+        # Wait for a free slot before taking the data, so buffered parts never exceed the concurrency
+        await self._slots.acquire()
+        data, self._buffer = bytes(self._buffer), bytearray()
+        self._parts.append(asyncio.create_task(self._upload_part(len(self._parts) + 1, data)))
+
+    async def _upload_part(self, part_number: int, data: bytes) -> Dict:
+        try:
+            response = await asyncio.to_thread(
+                storage_client.client.upload_part,
+                Bucket=self.bucket_name,
+                Key=self.file_key,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=data
+            )
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
+        finally:
+            self._slots.release()
+
+
+class ContentAddressedUpload:
+    """
+    Upload stored under the SHA-256 of its bytes (see content_addressed_key), so identical files share one object.
+
+    The key is only known once the last byte arrives, so the body is hashed while it is spooled to a temporary
+    file (kept in memory up to one part). On completion a HEAD request checks for the object and the PUT is
+    skipped entirely when it already exists; otherwise the spool is sent as a StreamingUpload with an immutable Cache-Control.
+    Exposes the same write/complete/abort interface as StreamingUpload.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        prefix: str,
+        content_type: Optional[str],
+        spool_size: int = settings.STORAGE_UPLOAD_PART_SIZE
+    ):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self.content_type = content_type
+        self.size = 0
+        self.file_key: Optional[str] = None
+        self.sha256: Optional[str] = None
+        self.deduplicated = False
+        self._hash = hashlib.sha256()
+        self._spool = tempfile.SpooledTemporaryFile(max_size=spool_size)
+
+    def _spool_write(self, data: bytes) -> None:
+        self._hash.update(data)
+        self._spool.write(data)
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        await asyncio.to_thread(self._spool_write, data)
+
+    async def complete(self) -> int:
+        try:
+            self.sha256 = self._hash.hexdigest()
+            self.file_key = content_addressed_key(self.prefix, self.sha256)
+            if await asyncio.to_thread(storage_client.object_exists, self.bucket_name, self.file_key):
+                self.deduplicated = True
+                logger.info(f"Skipped upload of {self.file_key}, already stored")
+                return self.size
+
+            upload = StreamingUpload(
+                self.bucket_name, self.file_key, self.content_type, cache_control=IMMUTABLE_CACHE_CONTROL
+            )
+            await asyncio.to_thread(self._spool.seek, 0)
+            while True:
+                data = await asyncio.to_thread(self._spool.read, upload.part_size)
+                if not data:
+                    break
+                await upload.write(data)
+            await upload.complete()
+            return self.size
+        finally:
+            self._spool.close()
+
+    async def abort(self) -> None:
+        self._spool.close()
+
+
+class MinioClient:
+    """Object operations by bucket and name, on the shared storage client"""
+
+    def create_bucket_if_not_exists(self, bucket_name: str):
+        try:
+            storage_client.ensure_bucket(bucket_name)
+            return True
+        except Exception as e:
+            logger.error(f"Error creating bucket {bucket_name}: {str(e)}")
+            raise
+
+    def upload_file(self, bucket_name: str, object_name: str, file_data: bytes, content_type: str):
+        try:
+            self.create_bucket_if_not_exists(bucket_name)
+            storage_client.client.put_object(
+                Bucket=bucket_name,
+                Key=object_name,
+                Body=file_data,
+                ContentType=content_type
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error uploading file {object_name}: {str(e)}")
+            raise
+
+
+    def open_file(self, bucket_name: str, object_name: str, byte_range: Optional[str] = None) -> Dict:
+        """
+        Start reading an object, optionally only an HTTP byte range ("bytes=0-1023").
+        The caller owns response['Body'] and must close it, which releases the pooled connection.
+        """
+        params = {"Bucket": bucket_name, "Key": object_name}
+        if byte_range:
+            params["Range"] = byte_range
+        return storage_client.client.get_object(**params)
+
+    def get_file_size(self, bucket_name: str, object_name: str) -> int:
+        return storage_client.client.head_object(Bucket=bucket_name, Key=object_name)["ContentLength"]
+
+    def get_file(self, bucket_name: str, object_name: str):
+        try:
+            response = storage_client.client.get_object(Bucket=bucket_name, Key=object_name)
+            return response['Body'].read()  # Read the data before returning
+        except Exception as e:
+            logger.error(f"Error retrieving file {object_name}: {str(e)}")
+            raise
+
+
+    def delete_file(self, bucket_name: str, object_name: str):
+        try:
+            storage_client.client.delete_object(Bucket=bucket_name, Key=object_name)
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting file {object_name}: {str(e)}")
+            raise
+
+class StorageService:
+    def __init__(self, bucket_name: str):
+        """Bind the shared storage client to a bucket; makes no network calls"""
+        if not bucket_name:
+            raise ValueError("Bucket name is required")
+        self.bucket_name = bucket_name
+        self.region_name = storage_client.region_name
+        self.endpoint_url = storage_client.endpoint_url
+        self.s3_client = storage_client.client
     
     def generate_presigned_upload_url(
         self, 
@@ -199,8 +457,38 @@ class StorageService:
             logger.error(f"Error generating presigned URL: {e}")
             raise
     
+    def generate_presigned_urls(self, files: List[Dict[str, str]], expiration: int = 3600) -> List[Dict[str, str]]:
+        """
+        Presign an upload (PUT) and a download (GET) URL for each {"file_key", "content_type"}.
+        Signing is local, so a batch costs no round trips to storage.
+        """
+        urls = []
+        for file in files:
+            file_key = file["file_key"]
+            public_url = self.get_public_url(file_key)
+            urls.append({
+                "presigned_url": self.s3_client.generate_presigned_url(
+                    'put_object',
+                    Params={
+                        'Bucket': self.bucket_name,
+                        'Key': file_key,
+                        'ContentType': file["content_type"]
+                    },
+                    ExpiresIn=expiration,
+                    HttpMethod='PUT'
+                ),
+                "download_url": self.get_presigned_download_url(file_key, expiration),
+                "public_url": public_url,
+                "file_key": file_key
+            })
+        logger.info(f"Presigned {len(urls)} upload URLs in bucket {self.bucket_name}")
+        return urls
+
     def get_public_url(self, file_key: str) -> str:
-        """Get a public URL for accessing the file"""
+        """
+        Get a public URL for accessing the file.
+        For content-addressed keys the URL changes whenever the bytes do, so it can be cached as immutable.
+        """
         # Ensure the file_key doesn't start with a slash
         if file_key.startswith("/"):
             # throw an error
@@ -234,35 +522,67 @@ class StorageService:
             logger.error(f"Error deleting file {file_key}: {e}")
             return False
     
-    def list_files(self, prefix: str) -> List[Dict]:
-        """List files with a given prefix (e.g., for a specific note)"""
+    def _file_entry(self, obj: Dict) -> Dict:
+        return {
+            'key': obj['Key'],
+            'size': obj['Size'],
+            'last_modified': obj['LastModified'].isoformat(),
+            'public_url': self.get_public_url(obj['Key'])
+        }
+
+    def list_files(self, prefix: str, delimiter: Optional[str] = None, page_size: int = 1000) -> Iterator[Dict]:
+        """
+        Yield every file with a given prefix (e.g., for a specific note), fetching one page of up to
+        `page_size` keys at a time and following continuation tokens, so listings are neither truncated
+        at 1000 keys nor held in memory whole. With a delimiter, keys below the next delimiter
+        ("subdirectories") are skipped; list_page returns those as directories.
+        """
+        params = {'Bucket': self.bucket_name, 'Prefix': prefix, 'PaginationConfig': {'PageSize': page_size}}
+        if delimiter:
+            params['Delimiter'] = delimiter
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name,
-                Prefix=prefix
-            )
-            
-            files = []
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    files.append({
-                        'key': obj['Key'],
-                        'size': obj['Size'],
-                        'last_modified': obj['LastModified'].isoformat(),
-                        'public_url': self.get_public_url(obj['Key'])
-                    })
-            
-            return files
+            for page in self.s3_client.get_paginator('list_objects_v2').paginate(**params):
+                for obj in page.get('Contents', []):
+                    yield self._file_entry(obj)
         except ClientError as e:
             logger.error(f"Error listing files with prefix {prefix}: {e}")
             raise
-            
+
+    def list_page(
+        self,
+        prefix: str,
+        delimiter: Optional[str] = None,
+        limit: int = 1000,
+        continuation_token: Optional[str] = None
+    ) -> Tuple[List[Dict], List[str], Optional[str]]:
+        """
+        One page of a listing: files, directory prefixes (only with a delimiter) and the continuation
+        token of the next page, None on the last page. S3 caps a page at 1000 entries.
+        """
+        params = {'Bucket': self.bucket_name, 'Prefix': prefix, 'MaxKeys': min(limit, 1000)}
+        if delimiter:
+            params['Delimiter'] = delimiter
+        if continuation_token:
+            params['ContinuationToken'] = continuation_token
+        try:
+            response = self.s3_client.list_objects_v2(**params)
+        except ClientError as e:
+            logger.error(f"Error listing files with prefix {prefix}: {e}")
+            raise
+
+        files = [self._file_entry(obj) for obj in response.get('Contents', [])]
+        directories = [entry['Prefix'] for entry in response.get('CommonPrefixes', [])]
+        next_token = response.get('NextContinuationToken') if response.get('IsTruncated') else None
+        return files, directories, next_token
+
     def upload_file(self, file_key: str, file_data: bytes, content_type: str) -> bool:
         """Upload a file directly to storage"""
         try:
             # Ensure the file_key doesn't start with a slash
             if file_key.startswith("/"):
                 raise ValueError("File key cannot start with a slash")
+            
+            storage_client.ensure_bucket(self.bucket_name)
                 
             # Upload the file using put_object
             self.s3_client.put_object(
@@ -10,6 +10,9 @@ from app.api.v1.user import router as user_router
 from app.api.v1.note import router as note_router
 from app.api.v1.file import router as file_router
 from app.api.v1.agent_task import router as agent_task_router
+from app.api.v1.note.write_buffer import ws_write_buffer
+from app.core.storage import storage_client
+import asyncio
 
 # Setup logging
 logger, _ = setup_logging()  # Changed to use _ since we don't need opensearch_handler
@@ -58,10 +61,17 @@ async def log_requests(request: Request, call_next):
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application starting up")
+    await ws_write_buffer.start()
+    # Check the default bucket once up front, so presigning never waits on storage
+    try:
+        await asyncio.to_thread(storage_client.ensure_bucket, settings.STORAGE_BUCKET_NAME)
+    except Exception as e:
+        logger.warning(f"Could not ensure storage bucket {settings.STORAGE_BUCKET_NAME}, will retry on first upload: {str(e)}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutting down")
+    await ws_write_buffer.stop()
 
 @app.get("/")
 def read_root():
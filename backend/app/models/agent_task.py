@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Enum, Table
+from sqlalchemy import Column, String, DateTime, ForeignKey, JSON, Enum, Table, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
@@ -29,6 +29,10 @@ agent_task_modified_notes = Table(
 
 class AgentTask(Base):
     __tablename__ = "agent_task"
+    __table_args__ = (
+        # Keyset pagination of an organization's tasks, newest first
+        Index("ix_agent_task_organization_id_created_at_id", "organization_id", "created_at", "id"),
+    )
 
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))  # Use lambda for default
     agent_type = Column(String, nullable=False)
@@ -1,11 +1,55 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, Text
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy import Column, String, DateTime, ForeignKey, Integer, BigInteger, Text, Index, LargeBinary, Computed
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, backref, deferred
+from sqlalchemy.types import UserDefinedType
 from sqlalchemy.sql import func
 from app.db.base import Base
 import uuid
 
+NOTE_SEARCH_CONFIG = "english"  # Text search configuration of Note.search_vector; queries must use the same one
+
+
+class Vector(UserDefinedType):
+    """
+    pgvector column type. Values are read and written in pgvector's text form ("[0.1,0.2,...]")
+    through explicit casts, so neither driver needs a vector codec.
+    """
+    cache_ok = True
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    def get_col_spec(self, **kw) -> str:
+        return f"vector({self.dimensions})"
+
+
 class Note(Base):
     __tablename__ = "note"
+    __table_args__ = (
+        # Anchored prefix scans on the materialized path (subtree reads, moves, deletes)
+        Index(
+            "ix_note_organization_id_path_prefix",
+            "organization_id",
+            "path",
+            postgresql_ops={"path": "text_pattern_ops"},
+        ),
+        Index("ix_note_organization_id_parent_id_sort_key", "organization_id", "parent_id", "sort_key"),
+        # Full-text search within an organization; organization_id needs the btree_gin extension
+        Index(
+            "ix_note_organization_id_search_vector",
+            "organization_id",
+            "search_vector",
+            postgresql_using="gin",
+        ),
+        # Substring and fuzzy title matches for typeahead
+        Index(
+            "ix_note_organization_id_title_trgm",
+            "organization_id",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+    )
 
     id = Column(String, primary_key=True, index=True, default=str(uuid.uuid4()))
     title = Column(String, index=True)
@@ -17,7 +61,7 @@ class Note(Base):
     path = Column(String, index=True)  # Materialized path for efficient traversal
     depth = Column(Integer, default=0)  # Nesting level
     children_count = Column(Integer, default=0)  # Add this column
-    position = Column(Integer, nullable=False, default=0)  # For ordering siblings
+    sort_key = Column(String(collation="C"), nullable=False)  # Fractional index for ordering siblings, compared byte-wise
     
     # Metadata
     organization_id = Column(String, ForeignKey("organization.id"), index=True)
@@ -26,7 +70,20 @@ class Note(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Add this field for collaborative editing
-    binary_content = Column(Text, nullable=True)  # Store the Yjs binary state as base64
+    binary_content = Column(LargeBinary, nullable=True)  # Yjs state as BYTEA, see app.api.utils.yjs_state
+    binary_content_encoding = Column(String, nullable=True)  # None for raw bytes, "zstd" when compressed
+    update_log_count = Column(Integer, nullable=False, default=0, server_default="0")  # Updates appended since the last compaction
+    update_log_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
+    
+    # Maintained by Postgres from title (weight A) and content (weight B); deferred so note reads never load it
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            f"setweight(to_tsvector('{NOTE_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{NOTE_SEARCH_CONFIG}', coalesce(content, '')), 'B')",
+            persisted=True
+        )
+    ))
     
     # Fix the self-referential relationship
     children = relationship(
@@ -54,4 +111,64 @@ class Note(Base):
     # version = Column(Integer, default=1)
     # is_archived = Column(Boolean, default=False)
     # last_modified_by = Column(String, ForeignKey("user.id"))
-    # sharing_settings = Column(JSON)
\ No newline at end of file
+    # sharing_settings = Column(JSON)
+
+
+class NoteYjsUpdate(Base):
+    """Incremental Yjs update appended after the note's binary_content snapshot, until compaction merges it in"""
+    __tablename__ = "note_yjs_update"
+    __table_args__ = (
+        Index("ix_note_yjs_update_note_id_id", "note_id", "id"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)  # Also the apply order
+    note_id = Column(String, ForeignKey("note.id", ondelete="CASCADE"), nullable=False)
+    update = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class NoteVersion(Base):
+    """
+    Point-in-time snapshot of a note's title, content and collaboration state.
+    The snapshot is stored as a delta against the previous version, except every few versions
+    where a keyframe is stored whole, so reading any version replays a bounded chain.
+    """
+    __tablename__ = "note_version"
+    __table_args__ = (
+        Index("ix_note_version_note_id_version", "note_id", "version", unique=True),
+    )
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    note_id = Column(String, ForeignKey("note.id", ondelete="CASCADE"), nullable=False)
+    organization_id = Column(String, ForeignKey("organization.id"), nullable=False)
+    version = Column(Integer, nullable=False)  # 1, 2, ... per note
+    chain_depth = Column(Integer, nullable=False)  # 0 for keyframes, otherwise deltas since the last keyframe
+    title = Column(String, nullable=True)
+    content_size = Column(Integer, nullable=False)
+    state_size = Column(Integer, nullable=False)
+    payload = Column(LargeBinary, nullable=False)  # zstd frame, using the previous version as dictionary unless a keyframe
+    created_by = Column(String, ForeignKey("user.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class NoteChunk(Base):
+    """A section of a note's text with its embedding, for semantic retrieval and related notes"""
+    __tablename__ = "note_chunk"
+    __table_args__ = (
+        Index("ix_note_chunk_note_id_chunk_index", "note_id", "chunk_index", unique=True),
+        # Approximate nearest neighbours by cosine distance; queries filter on organization_id
+        Index(
+            "ix_note_chunk_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_ops={"embedding": "vector_cosine_ops"},
+        ),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    note_id = Column(String, ForeignKey("note.id", ondelete="CASCADE"), nullable=False)
+    organization_id = Column(String, ForeignKey("organization.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    content = Column(Text, nullable=False)
+    content_hash = Column(String, nullable=False)  # Unchanged chunks keep their embedding on re-index
+    embedding = Column(Vector(256), nullable=False)  # SEMANTIC_EMBEDDING_DIMENSIONS
@@ -70,7 +70,8 @@ class AgentTaskListResponse(AgentTaskBase):
 
 class AgentTaskList(BaseModel):
     items: List[AgentTaskListResponse]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 # New schema for updating task status
 class AgentTaskStatusUpdate(BaseModel):
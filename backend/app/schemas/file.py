@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import List, Optional
+from pydantic import BaseModel, Field
 
 class PresignedURLRequest(BaseModel):
     file_name: str
@@ -9,6 +10,19 @@ class PresignedURLResponse(BaseModel):
     public_url: str
     file_key: str
 
+class PresignedURLBatchItem(BaseModel):
+    file_key: str = Field(..., min_length=1)
+    content_type: str
+
+class PresignedURLBatchRequest(BaseModel):
+    files: List[PresignedURLBatchItem] = Field(..., min_length=1, max_length=100)
+
+class PresignedURLBatchEntry(PresignedURLResponse):
+    download_url: str  # Presigned GET, for buckets that are not publicly readable
+
+class PresignedURLBatchResponse(BaseModel):
+    urls: List[PresignedURLBatchEntry]  # In request order
+
 class FileMetadata(BaseModel):
     file_key: str
     file_name: str
@@ -16,6 +30,11 @@ class FileMetadata(BaseModel):
     last_modified: str
     public_url: str
 
+class FileListResponse(BaseModel):
+    files: List[FileMetadata]
+    directories: List[str]  # Key prefixes one level down, when listing with a delimiter
+    next_cursor: Optional[str] = None
+
 class DirectFileUploadRequest(BaseModel):
     file: bytes
     file_name: str
@@ -24,4 +43,6 @@ class DirectFileUploadRequest(BaseModel):
 class DirectUploadResponse(BaseModel):
     public_url: str
     file_key: str
-    size: int
\ No newline at end of file
+    size: int
+    sha256: Optional[str] = None  # Set for content-addressed uploads
+    deduplicated: bool = False  # The content was already stored, nothing was written
\ No newline at end of file
@@ -17,6 +17,19 @@ class NoteSuggest(NoteBase):
     suggestion_content: Optional[str]
     agent_task_id: Optional[str] = None
 
+class NoteSuggestItem(BaseModel):
+    title: str = Field(..., min_length=1, max_length=200)
+    content: Optional[str]
+    suggestion_content: Optional[str]
+
+class NoteSuggestBatch(BaseModel):
+    """Several suggestion notes appended under the same parent in one request"""
+    parent_id: Optional[str] = None
+    user_id: str
+    organization_id: str
+    agent_task_id: Optional[str] = None
+    notes: List[NoteSuggestItem] = Field(..., min_length=1, max_length=500)
+
 class NoteUpdate(BaseModel):
     title: Optional[str] = Field(None, min_length=1, max_length=200)
     content: Optional[str]
@@ -35,7 +48,7 @@ class NoteResponse(NoteBase):
     path: str
     depth: int
     children_count: int
-    position: int
+    sort_key: str
     suggestion_content: Optional[str]
 
     class Config:
@@ -61,18 +74,86 @@ class NoteListResponse(BaseModel):
     path: str
     depth: int
     children_count: int
-    position: int
+    sort_key: str
     parent_id: Optional[str]
 
     class Config:
         from_attributes = True
 
+class NoteTreeResponse(NoteListResponse):
+    children: List["NoteTreeResponse"] = []
+
+NoteTreeResponse.model_rebuild()
+
 class NoteDetailResponse(NoteListResponse):
     content: Optional[str]
     suggestion_content: Optional[str]
 
-class NoteWSResponse(BaseModel):
-    binary_content: Optional[List[int]] = None
+class NoteVersionResponse(BaseModel):
+    id: str
+    note_id: str
+    version: int
+    title: Optional[str]
+    content_size: int
+    state_size: int
+    created_by: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class NoteVersionDetailResponse(NoteVersionResponse):
+    content: Optional[str]
+
+class NoteBreadcrumb(BaseModel):
+    id: str
+    title: str
+
+class NoteSearchResult(BaseModel):
+    id: str
+    title: str
+    parent_id: Optional[str]
+    path: str
+    depth: int
+    updated_at: Optional[datetime]
+    rank: float
+    title_highlight: str  # HTML-escaped title with matches wrapped in <mark>
+    snippet: str  # HTML-escaped content fragments with matches wrapped in <mark>
+    breadcrumbs: List[NoteBreadcrumb] = []  # Ancestors from the root down, resolved from path
+
+class NoteTypeaheadResult(BaseModel):
+    id: str
+    title: str
+    parent_id: Optional[str]
+    path: str
+    depth: int
+
+    class Config:
+        from_attributes = True
+
+class NoteSemanticIndexRequest(BaseModel):
+    """Notes to (re)embed; deleted notes are ignored, their chunks go with them"""
+    note_ids: List[str] = Field(..., min_length=1, max_length=1000)
+
+class NoteSemanticSearchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=32)
+    k: int = Field(default=5, ge=1, le=50)
+
+class NoteChunkMatch(BaseModel):
+    note_id: str
+    title: str
+    path: str
+    chunk_index: int
+    content: str
+    score: float  # Cosine similarity
+
+class RelatedNoteResponse(BaseModel):
+    id: str
+    title: str
+    path: str
+    depth: int
+    score: float  # Best cosine similarity between a chunk of this note and one of the source note
 
-class NoteWSUpdate(BaseModel):
-    update: List[int]
+class NoteReferenceRequest(BaseModel):
+    note_ids: List[str] = Field(..., min_length=1, max_length=100)
+    limit: int = Field(default=500, ge=1, le=2000)
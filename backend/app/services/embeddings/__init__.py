@@ -0,0 +1,5 @@
+from .embedder import BaseEmbedder, HashingEmbedder, LangchainEmbedder
+from .factory import initialize_embedder
+from .chunking import chunk_note
+
+__all__ = ["BaseEmbedder", "HashingEmbedder", "LangchainEmbedder", "initialize_embedder", "chunk_note"]
@@ -0,0 +1,58 @@
+# ./backend/app/services/embeddings/chunking.py
+import re
+from typing import List, Optional
+
+HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.*)$")
+
+
+def chunk_note(title: Optional[str], content: Optional[str], max_words: int) -> List[str]:
+    """
+    Split a note's markdown into chunks of at most `max_words` words for embedding.
+    Chunks follow headings and paragraphs where possible, and each one starts with the note title
+    and its section heading so it still makes sense on its own.
+    """
+    title = (title or "").strip()
+    sections: List[tuple] = []  # (heading, paragraphs)
+    heading, paragraphs, paragraph = "", [], []
+
+    for line in (content or "").splitlines():
+        match = HEADING_PATTERN.match(line.strip())
+        if match or not line.strip():
+            if paragraph:
+                paragraphs.append(" ".join(paragraph))
+                paragraph = []
+            if match:
+                if paragraphs:
+                    sections.append((heading, paragraphs))
+                heading, paragraphs = match.group(1).strip(), []
+        else:
+            paragraph.append(line.strip())
+    if paragraph:
+        paragraphs.append(" ".join(paragraph))
+    if paragraphs:
+        sections.append((heading, paragraphs))
+
+    chunks: List[str] = []
+    for heading, paragraphs in sections:
+        prefix = " / ".join(part for part in (title, heading) if part)
+        words: List[str] = []
+        for paragraph in paragraphs:
+            paragraph_words = paragraph.split()
+            if words and len(words) + len(paragraph_words) > max_words:
+                chunks.append(_with_prefix(prefix, words))
+                words = []
+            # A paragraph longer than a whole chunk is split on word boundaries
+            while len(paragraph_words) > max_words:
+                chunks.append(_with_prefix(prefix, paragraph_words[:max_words]))
+                paragraph_words = paragraph_words[max_words:]
+            words += paragraph_words
+        if words:
+            chunks.append(_with_prefix(prefix, words))
+
+    # Notes without a body are still findable by title
+    return chunks or ([title] if title else [])
+
+
+def _with_prefix(prefix: str, words: List[str]) -> str:
+    text = " ".join(words)
+    return f"{prefix}\n{text}" if prefix else text
@@ -0,0 +1,65 @@
+# ./backend/app/services/embeddings/embedder.py
+import hashlib
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize(vector: List[float]) -> List[float]:
+    """Scale to unit length, so cosine similarity is a dot product; all-zero vectors are returned as is"""
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else vector
+
+
+class BaseEmbedder(ABC):
+    """Turns texts into unit-length vectors of a fixed dimension"""
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        pass
+
+
+class HashingEmbedder(BaseEmbedder):
+    """
+    Deterministic local embedder: word unigrams and bigrams are hashed into `dimensions` buckets
+    with a hash-derived sign and log-scaled counts. Needs no model and no network, and gives the
+    same vector for the same text in every process, so it is the default.
+    """
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(text) for text in texts]
+
+    def _embed_one(self, text: str) -> List[float]:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        features = Counter(tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])])
+
+        vector = [0.0] * self.dimensions
+        for feature, count in features.items():
+            value = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            sign = 1.0 if value >> 63 else -1.0
+            vector[value % self.dimensions] += sign * (1.0 + math.log(count))
+        return normalize(vector)
+
+
+class LangchainEmbedder(BaseEmbedder):
+    """Adapter for a Langchain embeddings client, e.g. a hosted embedding model"""
+
+    def __init__(self, client: Embeddings, dimensions: int):
+        super().__init__(dimensions)
+        self.client = client
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.client.embed_documents(texts)
+        for vector in vectors:
+            if len(vector) != self.dimensions:
+                raise ValueError(f"Embedding has {len(vector)} dimensions, the index expects {self.dimensions}")
+        return [normalize(vector) for vector in vectors]
@@ -0,0 +1,55 @@
+# ./backend/app/services/embeddings/factory.py
+import logging
+from typing import Optional
+
+from langchain_openai import AzureOpenAIEmbeddings
+
+from app.api.utils.constants import EMBEDDERS_AVAILABLE
+from app.core.config import settings
+from app.services.embeddings.embedder import BaseEmbedder, HashingEmbedder, LangchainEmbedder
+
+logger = logging.getLogger(__name__)
+
+
+def initialize_embedder(provider: str, model: Optional[str] = None) -> BaseEmbedder:
+    """
+    Initializes the embedder used for the semantic index.
+
+    Args:
+        provider: "hashing" for the local default, or a hosted provider (e.g. "azure_openai").
+        model: The provider's model, required for hosted providers.
+
+    Returns:
+        An embedder producing SEMANTIC_EMBEDDING_DIMENSIONS-dimensional unit vectors.
+
+    Raises:
+        ValueError: If the provider or model is unsupported, or if required settings are missing.
+    """
+    dimensions = settings.SEMANTIC_EMBEDDING_DIMENSIONS
+
+    if provider == "hashing":
+        return HashingEmbedder(dimensions)
+
+    provider_config = EMBEDDERS_AVAILABLE.get(provider)
+    if not provider_config:
+        raise ValueError(f"Unsupported embedding provider specified: {provider}")
+
+    model_params = provider_config.get(model)
+    if not model_params:
+        raise ValueError(f"Unsupported embedding model '{model}' for provider '{provider}'")
+
+    if provider == "azure_openai":
+        if not settings.AZURE_OPENAI_ENDPOINT or not settings.AZURE_OPENAI_API_KEY:
+            raise ValueError("AZURE_OPENAI_ENDPOINT and AZURE_OPENAI_API_KEY must be set for the Azure embedding provider")
+
+        client = AzureOpenAIEmbeddings(
+            azure_deployment=model_params["AZURE_OPENAI_DEPLOYMENT_NAME"],
+            azure_endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            api_version=model_params["AZURE_OPENAI_API_VERSION"],
+            dimensions=dimensions,
+        )
+        logger.info(f"Initialized AzureOpenAIEmbeddings for deployment '{model_params['AZURE_OPENAI_DEPLOYMENT_NAME']}'")
+        return LangchainEmbedder(client, dimensions)
+
+    raise ValueError(f"Embedding provider '{provider}' is configured but not implemented in the factory.")
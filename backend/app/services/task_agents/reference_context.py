@@ -0,0 +1,99 @@
+# ./backend/app/services/task_agents/reference_context.py
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from app.services.embeddings import HashingEmbedder, chunk_note
+
+CHARS_PER_TOKEN = 4  # Rough average for English prose across the supported LLMs
+SECTION_WORDS = 200
+SECTION_MAX_TOKENS = 600
+SECTION_SEPARATOR = "\n\n---\n\n"
+RELEVANCE_DIMENSIONS = 256
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly `max_tokens`, on a word boundary"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(None, 1)[0] + " …"
+
+
+@dataclass
+class ReferenceContext:
+    text: str
+    notes: int  # Notes with at least one section kept
+    sections: int
+    sections_dropped: int
+    bytes: int
+    tokens: int
+
+
+def pack_reference_notes(
+    notes: List[Dict[str, Any]],
+    budget_tokens: int,
+    query: Optional[str] = None
+) -> ReferenceContext:
+    """
+    Pack reference notes into at most `budget_tokens` of prompt text.
+
+    Notes are split into sections, each truncated to SECTION_MAX_TOKENS. Sections are kept in order of
+    relevance: similarity to `query` when there is one, then nearness to the selected note (its own
+    sections before its children's), then position within the note. Kept sections are emitted in
+    document order, so the context still reads top to bottom.
+
+    Args:
+        notes: Notes in document order, as returned by the reference notes endpoint.
+        budget_tokens: Token budget for the packed text.
+        query: Text describing the task, e.g. the user's instructions.
+    """
+    sections = []  # (position, relative depth, section index, note id, text)
+    loaded_ids = set()
+    root_depth = 0
+    for note in notes:
+        # A note whose parent was not loaded before it starts a selected subtree
+        if note.get("parent_id") not in loaded_ids:
+            root_depth = note["depth"]
+        loaded_ids.add(note["id"])
+        for index, text in enumerate(chunk_note(note.get("title"), note.get("content"), SECTION_WORDS)):
+            sections.append((
+                len(sections), note["depth"] - root_depth, index, note["id"],
+                truncate_to_tokens(text, SECTION_MAX_TOKENS)
+            ))
+
+    scores = [0.0] * len(sections)
+    if query and query.strip() and sections:
+        embedder = HashingEmbedder(RELEVANCE_DIMENSIONS)
+        query_vector = embedder.embed([query])[0]
+        scores = [
+            sum(a * b for a, b in zip(query_vector, vector))
+            for vector in embedder.embed([section[4] for section in sections])
+        ]
+
+    ranked = sorted(sections, key=lambda section: (-round(scores[section[0]], 2), section[1], section[2], section[0]))
+
+    kept = []
+    used_tokens = 0
+    separator_tokens = estimate_tokens(SECTION_SEPARATOR)
+    for section in ranked:
+        cost = estimate_tokens(section[4]) + (separator_tokens if kept else 0)
+        # Smaller sections further down may still fit after a large one is skipped
+        if used_tokens + cost <= budget_tokens:
+            kept.append(section)
+            used_tokens += cost
+
+    kept.sort(key=lambda section: section[0])
+    text = SECTION_SEPARATOR.join(section[4] for section in kept)
+    return ReferenceContext(
+        text=text,
+        notes=len({section[3] for section in kept}),
+        sections=len(kept),
+        sections_dropped=len(sections) - len(kept),
+        bytes=len(text.encode("utf-8")),
+        tokens=estimate_tokens(text),
+    )
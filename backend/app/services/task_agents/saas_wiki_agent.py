@@ -14,7 +14,9 @@ from langchain_core.language_models.chat_models import BaseChatModel
 from app.services.task_agents.base_agent import BaseAgent
 from app.services.llm import initialize_llm
 from app.services.video_processor import download_video, extract_frames, generate_transcript
-from app.worker.utils import get_public_url
+from app.services.task_agents.reference_context import pack_reference_notes
+from app.worker.utils import get_public_url, semantic_search, get_reference_notes
+from app.core.config import settings
 import base64
 
 logger = logging.getLogger(__name__)
@@ -28,6 +30,9 @@ Ensure the output adheres to the JSON schema with 'title' and 'content' keys. Pl
 
 Below is the transcript of a video, and images from the video are provided with frame numbers overlaid (e.g., ![alt_text](frame_1), ![alt_text](frame_2)). Use the transcript and images to create a detailed help center article explaining the concepts shown in the video. Be verbose and include all relevant details."""
 
+    _RELATED_QUERY_WINDOWS = 8  # Transcript windows sent as semantic queries
+    _RELATED_CHUNKS = 8  # Related note chunks added to the prompt
+
     class MarkdownArticle(TypedDict):
         """Defines the structure for a single markdown wiki article."""
         title: Annotated[str, ..., "A concise and descriptive title for the article, typically 5-10 words."]
@@ -59,12 +64,71 @@ Below is the transcript of a video, and images from the video are provided with
             raise RuntimeError(f"Could not initialize LLM for agent: {e}") from e
 
         self.reference_notes = [] # Keep this if needed
+        self.reference_context: Optional[str] = None
 
     def _get_reference_notes(self):
-        # TODO: Implement ability to get all reference notes, if there are children, we should also get those as well
+        """
+        Load the selected reference notes and all their descendants in one request, and pack their
+        content into the prompt's reference budget, most relevant sections to the instructions first.
+        """
         self.reference_notes = []
+        self.reference_context = None
+        if not self.reference_notes_ids:
+            return self.reference_notes
+
+        self.reference_notes = get_reference_notes(
+            self.reference_notes_ids,
+            self.organization_id,
+            settings.BACKEND_BASE_URL,
+            limit=settings.AGENT_REFERENCE_MAX_NOTES
+        )
+        context = pack_reference_notes(
+            self.reference_notes,
+            settings.AGENT_REFERENCE_TOKEN_BUDGET,
+            query=self.instructions
+        )
+        self.reference_context = context.text or None
+
+        logger.info(
+            f"Task {self.task_id}: Reference notes contribute {context.bytes} bytes, ~{context.tokens} tokens "
+            f"({context.sections} of {context.sections + context.sections_dropped} sections from "
+            f"{context.notes} of {len(self.reference_notes)} notes, budget {settings.AGENT_REFERENCE_TOKEN_BUDGET} tokens)"
+        )
         return self.reference_notes
 
+    def _get_related_context(self, transcript: str) -> Optional[str]:
+        """
+        Retrieve existing notes related to the transcript from the organization's semantic index,
+        so the article can stay consistent with them. Windows of the transcript are sent as one batched query.
+        """
+        words = transcript.split()
+        window = settings.SEMANTIC_CHUNK_WORDS
+        windows = [" ".join(words[start:start + window]) for start in range(0, len(words), window)]
+        if not windows:
+            return None
+        # Spread the probes over the whole video rather than only its beginning
+        step = max(1, len(windows) // self._RELATED_QUERY_WINDOWS)
+        queries = windows[::step][:self._RELATED_QUERY_WINDOWS]
+
+        try:
+            results = semantic_search(queries, self._RELATED_CHUNKS, self.organization_id, settings.BACKEND_BASE_URL)
+        except Exception as e:
+            logger.warning(f"Task {self.task_id}: Semantic retrieval failed, continuing without related notes: {e}")
+            return None
+
+        best: Dict[tuple, dict] = {}
+        for match in (match for matches in results for match in matches):
+            key = (match["note_id"], match["chunk_index"])
+            if key not in best or match["score"] > best[key]["score"]:
+                best[key] = match
+        chunks = sorted(best.values(), key=lambda match: match["score"], reverse=True)[:self._RELATED_CHUNKS]
+        if not chunks:
+            return None
+
+        logger.info(f"Task {self.task_id}: Retrieved {len(chunks)} related note chunks")
+        sections = "\n\n".join(f"### {match['title']}\n{match['content']}" for match in chunks)
+        return f"Existing notes related to this video (keep terminology consistent with them, do not copy them):\n\n{sections}"
+
     def process_task(self):
         self._get_reference_notes()
         articles = []
@@ -89,6 +153,14 @@ Below is the transcript of a video, and images from the video are provided with
                     human_content = [
                         {"type": "text", "text": f"Transcript: {transcript}"},
                     ]
+                    if self.reference_context:
+                        human_content.append({
+                            "type": "text",
+                            "text": f"Reference notes selected for this task:\n\n{self.reference_context}",
+                        })
+                    related_context = self._get_related_context(transcript)
+                    if related_context:
+                        human_content.append({"type": "text", "text": related_context})
                     for image_path in image_paths:
                         with open(image_path, "rb") as f:
                             image_data = base64.b64encode(f.read()).decode("utf-8")
@@ -1,9 +1,10 @@
 import time
+from typing import List
 from app.core.celery_app import celery_app
 from app.schemas.agent_task import AgentTaskStatus
 import logging
 from app.core.config import settings
-from app.worker.utils import update_task_status, get_task_details, create_suggestion_note
+from app.worker.utils import update_task_status, get_task_details, create_suggestion_notes, reconcile_children_counts, compact_note_ws_updates, derive_note_contents, index_note_chunks, rebuild_semantic_index
 from app.services.task_agents import SaaSWikiAgent
 
 logger = logging.getLogger(__name__)
@@ -61,12 +62,17 @@ def process_agent_task(task_id: str, organization_id: str, user_id: str):
         # Process the task and get the output
         agent_output = wiki_agent.process_task()
         
-        # Create suggestion notes with the output
-        for note_data in agent_output:
-            create_suggestion_note(
-                title=note_data["title"],
-                content=note_data["content"],
-                suggestion_content=note_data["content"],
+        # Create all suggestion notes with the output in one request
+        if agent_output:
+            create_suggestion_notes(
+                notes=[
+                    {
+                        "title": note_data["title"],
+                        "content": note_data["content"],
+                        "suggestion_content": note_data["content"],
+                    }
+                    for note_data in agent_output
+                ],
                 parent_id=destination_note_id,
                 user_id=user_id,
                 organization_id=organization_id,
@@ -85,3 +91,70 @@ def process_agent_task(task_id: str, organization_id: str, user_id: str):
             update_task_status(task_id, AgentTaskStatus.FAILED, api_base_url)
         except Exception as update_error:
             logger.error(f"Failed to update task status to FAILED: {update_error}")
+
+@celery_app.task(name="reconcile_children_counts")
+def reconcile_children_counts_task(organization_id: str):
+    """
+    Recompute children_count for every note of an organization.
+    
+    Args:
+        organization_id: ID of the organization
+    """
+    result = reconcile_children_counts(organization_id, settings.BACKEND_BASE_URL)
+    logger.info(f"Reconciled children count for organization {organization_id}: {result.get('updated')} notes updated")
+    return result
+
+@celery_app.task(name="compact_note_ws_updates")
+def compact_note_ws_updates_task(note_id: str):
+    """
+    Merge a note's logged collaboration updates into its snapshot.
+    
+    Args:
+        note_id: ID of the note
+    """
+    result = compact_note_ws_updates(note_id, settings.BACKEND_BASE_URL)
+    logger.info(f"Compacted collaboration updates of note {note_id}: {result.get('merged')} updates merged")
+    return result
+
+@celery_app.task(name="derive_note_contents")
+def derive_note_contents_task():
+    """
+    Derive note content from collaboration state for one batch of due notes,
+    then schedule the next batch while notes are still pending.
+    """
+    try:
+        result = derive_note_contents(settings.BACKEND_BASE_URL)
+    except Exception:
+        # The failed batch put its notes back and this chain still holds the scheduling token, so keep it alive
+        derive_note_contents_task.apply_async(countdown=settings.CONTENT_DERIVATION_DEBOUNCE_SECONDS)
+        raise
+    logger.info(f"Derived note content: {result.get('updated')} notes updated")
+    
+    next_batch_in = result.get("next_batch_in")
+    if next_batch_in is not None:
+        derive_note_contents_task.apply_async(countdown=next_batch_in)
+    return result
+
+@celery_app.task(name="index_note_chunks")
+def index_note_chunks_task(note_ids: List[str]):
+    """
+    Re-embed the chunks of notes whose title or content changed.
+    
+    Args:
+        note_ids: IDs of the notes
+    """
+    result = index_note_chunks(note_ids, settings.BACKEND_BASE_URL)
+    logger.info(f"Indexed {len(note_ids)} notes: {result.get('embedded')} chunks embedded")
+    return result
+
+@celery_app.task(name="rebuild_semantic_index")
+def rebuild_semantic_index_task(organization_id: str):
+    """
+    Index every note of an organization, e.g. after enabling the semantic index or changing the embedder.
+    
+    Args:
+        organization_id: ID of the organization
+    """
+    embedded = rebuild_semantic_index(organization_id, settings.BACKEND_BASE_URL)
+    logger.info(f"Rebuilt semantic index of organization {organization_id}: {embedded} chunks embedded")
+    return {"embedded": embedded}
@@ -3,7 +3,7 @@ import requests
 import json
 from app.core.config import settings
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 import os
 
 logger = logging.getLogger(__name__)
@@ -52,30 +52,28 @@ def get_task_details(task_id: str, organization_id: str, api_base_url: str) -> D
     
     return response.json()
 
-def create_suggestion_note(title: str, content: str, suggestion_content: str, parent_id: str, user_id: str, organization_id: str, api_base_url: str, agent_task_id: str) -> Dict[str, Any]:
+def create_suggestion_notes(notes: List[Dict[str, Any]], parent_id: str, user_id: str, organization_id: str, api_base_url: str, agent_task_id: str) -> List[Dict[str, Any]]:
     """
-    Create a suggestion note via the API.
+    Create several suggestion notes under one parent via the API in a single request.
     
     Args:
-        title: Title of the note
-        content: Content of the note
+        notes: List of dicts with title, content and suggestion_content
         parent_id: ID of the parent note
         user_id: ID of the user
         organization_id: ID of the organization
         api_base_url: Base URL of the API
+        agent_task_id: ID of the agent task that produced the notes
         
     Returns:
-        Dictionary containing the created note
+        List of the created notes, in order
     """
-    url = f"{api_base_url}/api/v1/notes/ai/create"
+    url = f"{api_base_url}/api/v1/notes/ai/create/batch"
     headers = {
         "Content-Type": "application/json",
         "X-API-Key": settings.WORKER_API_KEY
     }
     data = {
-        "title": title,
-        "content": content,
-        "suggestion_content": suggestion_content,
+        "notes": notes,
         "parent_id": parent_id,
         "user_id": user_id,
         "organization_id": organization_id,
@@ -85,8 +83,189 @@ def create_suggestion_note(title: str, content: str, suggestion_content: str, pa
     response = requests.post(url, headers=headers, data=json.dumps(data))
     
     if response.status_code != 200:
-        logger.error(f"Failed to create suggestion note. Status code: {response.status_code}, Response: {response.text}")
-        raise Exception(f"Failed to create suggestion note: {response.text}")
+        logger.error(f"Failed to create suggestion notes. Status code: {response.status_code}, Response: {response.text}")
+        raise Exception(f"Failed to create suggestion notes: {response.text}")
+    
+    return response.json()
+
+def reconcile_children_counts(organization_id: str, api_base_url: str) -> Dict[str, Any]:
+    """
+    Ask the API to recompute children_count for every note of an organization.
+    
+    Args:
+        organization_id: ID of the organization
+        api_base_url: Base URL of the API
+        
+    Returns:
+        Dictionary with the number of notes whose count was corrected
+    """
+    url = f"{api_base_url}/api/v1/notes/worker/{organization_id}/reconcile-children-count"
+    headers = {
+        "X-API-Key": settings.WORKER_API_KEY
+    }
+    
+    response = requests.post(url, headers=headers)
+    
+    if response.status_code != 200:
+        logger.error(f"Failed to reconcile children count. Status code: {response.status_code}, Response: {response.text}")
+        raise Exception(f"Failed to reconcile children count: {response.text}")
+    
+    return response.json()
+
+def compact_note_ws_updates(note_id: str, api_base_url: str) -> Dict[str, Any]:
+    """
+    Ask the API to merge a note's logged collaboration updates into its snapshot.
+    
+    Args:
+        note_id: ID of the note
+        api_base_url: Base URL of the API
+        
+    Returns:
+        Dictionary with the number of updates merged
+    """
+    url = f"{api_base_url}/api/v1/notes/worker/ws/{note_id}/compact"
+    headers = {
+        "X-API-Key": settings.WORKER_API_KEY
+    }
+    
+    response = requests.post(url, headers=headers)
+    
+    if response.status_code != 200:
+        logger.error(f"Failed to compact note updates. Status code: {response.status_code}, Response: {response.text}")
+        raise Exception(f"Failed to compact note updates: {response.text}")
+    
+    return response.json()
+
+def derive_note_contents(api_base_url: str) -> Dict[str, Any]:
+    """
+    Ask the API to derive note content from collaboration state for the notes that are due.
+    
+    Args:
+        api_base_url: Base URL of the API
+        
+    Returns:
+        Dictionary with the number of notes updated and the delay before the next batch, if any
+    """
+    url = f"{api_base_url}/api/v1/notes/worker/derive-content"
+    headers = {
+        "X-API-Key": settings.WORKER_API_KEY
+    }
+    
+    response = requests.post(url, headers=headers)
+    
+    if response.status_code != 200:
+        logger.error(f"Failed to derive note content. Status code: {response.status_code}, Response: {response.text}")
+        raise Exception(f"Failed to derive note content: {response.text}")
+    
+    return response.json()
+
+def index_note_chunks(note_ids: List[str], api_base_url: str) -> Dict[str, Any]:
+    """
+    Ask the API to re-embed the chunks of the given notes.
+    
+    Args:
+        note_ids: IDs of the notes whose title or content changed
+        api_base_url: Base URL of the API
+        
+    Returns:
+        Dictionary with the number of chunks embedded
+    """
+    url = f"{api_base_url}/api/v1/notes/worker/semantic-index"
+    headers = {
+        "Content-Type": "application/json",
+        "X-API-Key": settings.WORKER_API_KEY
+    }
+    
+    response = requests.post(url, headers=headers, data=json.dumps({"note_ids": note_ids}))
+    
+    if response.status_code != 200:
+        logger.error(f"Failed to index notes. Status code: {response.status_code}, Response: {response.text}")
+        raise Exception(f"Failed to index notes: {response.text}")
+    
+    return response.json()
+
+def rebuild_semantic_index(organization_id: str, api_base_url: str) -> int:
+    """
+    Ask the API to index every note of an organization, one batch per request.
+    
+    Args:
+        organization_id: ID of the organization
+        api_base_url: Base URL of the API
+        
+    Returns:
+        Number of chunks embedded
+    """
+    url = f"{api_base_url}/api/v1/notes/worker/{organization_id}/semantic-index/rebuild"
+    headers = {
+        "X-API-Key": settings.WORKER_API_KEY
+    }
+    
+    embedded = 0
+    after_id = None
+    while True:
+        response = requests.post(url, headers=headers, params={"after_id": after_id} if after_id else None)
+        
+        if response.status_code != 200:
+            logger.error(f"Failed to rebuild semantic index. Status code: {response.status_code}, Response: {response.text}")
+            raise Exception(f"Failed to rebuild semantic index: {response.text}")
+        
+        result = response.json()
+        embedded += result.get("embedded", 0)
+        after_id = result.get("next_after_id")
+        if not after_id:
+            return embedded
+
+def semantic_search(queries: List[str], k: int, organization_id: str, api_base_url: str) -> List[List[Dict[str, Any]]]:
+    """
+    Find the note chunks closest to each query via the API, in one request.
+    
+    Args:
+        queries: Texts to search for
+        k: Number of chunks per query
+        organization_id: ID of the organization
+        api_base_url: Base URL of the API
+        
+    Returns:
+        For each query, its matching chunks with note_id, title, path, content and score
+    """
+    url = f"{api_base_url}/api/v1/notes/worker/{organization_id}/semantic-search"
+    headers = {
+        "Content-Type": "application/json",
+        "X-API-Key": settings.WORKER_API_KEY
+    }
+    
+    response = requests.post(url, headers=headers, data=json.dumps({"queries": queries, "k": k}))
+    
+    if response.status_code != 200:
+        logger.error(f"Failed to search semantic index. Status code: {response.status_code}, Response: {response.text}")
+        raise Exception(f"Failed to search semantic index: {response.text}")
+    
+    return response.json()
+
+def get_reference_notes(note_ids: List[str], organization_id: str, api_base_url: str, limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Fetch the given notes and all their descendants via the API in one request.
+    
+    Args:
+        note_ids: IDs of the selected reference notes
+        organization_id: ID of the organization
+        api_base_url: Base URL of the API
+        limit: Maximum number of notes to load
+        
+    Returns:
+        List of notes with content, each selected note followed by its subtree
+    """
+    url = f"{api_base_url}/api/v1/notes/worker/{organization_id}/reference-notes"
+    headers = {
+        "Content-Type": "application/json",
+        "X-API-Key": settings.WORKER_API_KEY
+    }
+    
+    response = requests.post(url, headers=headers, data=json.dumps({"note_ids": note_ids, "limit": limit}))
+    
+    if response.status_code != 200:
+        logger.error(f"Failed to fetch reference notes. Status code: {response.status_code}, Response: {response.text}")
+        raise Exception(f"Failed to fetch reference notes: {response.text}")
     
     return response.json()
 
@@ -113,7 +292,8 @@ def get_public_url(file_path: str, organization_id: str) -> str:
         "X-API-Key": settings.WORKER_API_KEY
     }
     data = {'bucket_name': 'radhe-bucket', 'organization_id': organization_id}
-    response = requests.post(url, files=files, data=data, headers=headers)
+    # Content-addressed: re-uploading the same frame or attachment reuses the stored object and its URL
+    response = requests.post(url, params={'content_addressed': 'true'}, files=files, data=data, headers=headers)
     response.raise_for_status()
 
     return response.json().get('public_url')
@@ -0,0 +1,79 @@
+# ./backend/benchmarks/bench_async_db.py
+"""
+Request throughput on one event loop: synchronous Session inside `async def` handlers (the old path)
+versus AsyncSession on asyncpg. Each simulated request runs a slow query (pg_sleep) followed by a
+children listing, with as many requests in flight as the connection pool allows.
+
+Usage (from ./backend, against a development database):
+    python -m benchmarks.bench_async_db
+"""
+import asyncio
+import logging
+import time
+
+import sqlalchemy
+
+from app.db.base import SessionLocal, AsyncSessionLocal
+from app.models.note import Note
+from app.api.v1.note.service import NoteService
+from benchmarks.fixtures import scratch_organization, build_subtree_rows, insert_rows
+
+REQUESTS = 300
+CONCURRENCY = 15  # pool_size + max_overflow of both engines
+QUERY_DELAY_SECONDS = 0.02
+
+logging.getLogger("app").setLevel(logging.WARNING)
+
+
+async def blocking_request(parent_id: str, organization_id: str) -> None:
+    """What every handler did before: a synchronous Session called from a coroutine"""
+    db = SessionLocal()
+    try:
+        db.execute(sqlalchemy.text("SELECT pg_sleep(:delay)"), {"delay": QUERY_DELAY_SECONDS})
+        db.query(Note.id, Note.title, Note.sort_key).filter(
+            Note.parent_id == parent_id,
+            Note.organization_id == organization_id
+        ).order_by(Note.sort_key.asc()).all()
+    finally:
+        db.close()
+
+
+async def async_request(parent_id: str, organization_id: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(sqlalchemy.text("SELECT pg_sleep(:delay)"), {"delay": QUERY_DELAY_SECONDS})
+        await NoteService.get_children(db, parent_id, organization_id)
+
+
+async def run(request, parent_id: str, organization_id: str) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def limited() -> None:
+        async with semaphore:
+            await request(parent_id, organization_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    db = SessionLocal()
+    try:
+        with scratch_organization(db) as (organization_id, user_id):
+            rows = build_subtree_rows(organization_id, user_id, 51, fanout=50)
+            insert_rows(db, rows)
+            parent_id = rows[0]["id"]
+
+            blocking_throughput = await run(blocking_request, parent_id, organization_id)
+            async_throughput = await run(async_request, parent_id, organization_id)
+
+            print(f"requests: {REQUESTS}, concurrency: {CONCURRENCY}, query delay: {QUERY_DELAY_SECONDS * 1000:.0f} ms")
+            print(f"sync Session (blocking loop): {blocking_throughput:8.1f} req/s")
+            print(f"AsyncSession (asyncpg):       {async_throughput:8.1f} req/s")
+            print(f"speedup:                      {async_throughput / blocking_throughput:8.1f}x")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+# ./backend/benchmarks/bench_move_note.py
+"""
+Move latency for subtrees of increasing size.
+
+Usage (from ./backend, against a development database):
+    python -m benchmarks.bench_move_note
+"""
+import asyncio
+import logging
+from typing import Dict
+
+from app.db.base import SessionLocal, AsyncSessionLocal
+from app.models.note import Note
+from app.schemas.note import NoteMoveRequest
+from app.api.v1.note.service import NoteService
+from benchmarks.fixtures import scratch_organization, build_subtree_rows, insert_rows, timed
+
+SUBTREE_SIZES = [100, 10_000, 100_000]
+ROUNDS = 3
+
+logging.getLogger("app").setLevel(logging.WARNING)
+
+
+async def bench_move(size: int) -> Dict[str, float]:
+    db = SessionLocal()
+    results: Dict[str, float] = {}
+    try:
+        with scratch_organization(db) as (organization_id, user_id):
+            target_rows = build_subtree_rows(organization_id, user_id, 1)
+            subtree_rows = build_subtree_rows(organization_id, user_id, size)
+            insert_rows(db, target_rows + subtree_rows)
+
+            subtree_root_id = subtree_rows[0]["id"]
+            target_id = target_rows[0]["id"]
+
+            async with AsyncSessionLocal() as async_db:
+                for round_number in range(ROUNDS):
+                    # Alternate between nesting under the target and moving back to root level
+                    new_parent_id = target_id if round_number % 2 == 0 else None
+                    with timed(results, f"round {round_number + 1}"):
+                        await NoteService.move_note(
+                            async_db,
+                            subtree_root_id,
+                            NoteMoveRequest(new_parent_id=new_parent_id),
+                            organization_id
+                        )
+
+            moved_depth = db.query(Note.depth).filter(Note.id == subtree_rows[-1]["id"]).scalar()
+            assert moved_depth == subtree_rows[-1]["depth"] + (1 if ROUNDS % 2 else 0)
+    finally:
+        db.close()
+    return results
+
+
+def main() -> None:
+    print(f"{'subtree size':>12} | " + " | ".join(f"round {i + 1:>2} (ms)" for i in range(ROUNDS)))
+    for size in SUBTREE_SIZES:
+        results = asyncio.run(bench_move(size))
+        print(f"{size:>12} | " + " | ".join(f"{value:>13.1f}" for value in results.values()))
+
+
+if __name__ == "__main__":
+    main()
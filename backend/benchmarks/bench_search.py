@@ -0,0 +1,107 @@
+# ./backend/benchmarks/bench_search.py
+"""
+Full-text search latency in an organization of 200k notes, for a rare term, a common term
+and a phrase, on the first page and on a page reached through the cursor.
+Also title typeahead latency for the prefixes, substrings and typos a user types on the way.
+
+Usage (from ./backend, against a development database):
+    python -m benchmarks.bench_search
+"""
+import asyncio
+import logging
+import random
+from typing import Dict, Tuple
+
+import sqlalchemy
+
+from app.db.base import SessionLocal, AsyncSessionLocal
+from app.api.v1.note.service import NoteService
+from benchmarks.fixtures import scratch_organization, build_subtree_rows, insert_rows, timed
+
+ORGANIZATION_SIZE = 200_000
+ROUNDS = 5
+QUERIES = {
+    "rare term": "zephyr",
+    "common term": "meeting",
+    "phrase": '"project roadmap"',
+}
+TYPEAHEAD_QUERIES = ["b", "be", "bench", "note 1234", "benchmrk nte 99"]
+
+logging.getLogger("app").setLevel(logging.WARNING)
+
+
+def build_content(rng: random.Random) -> str:
+    """A paragraph of filler with the queried words sprinkled in at different frequencies"""
+    words = rng.choices(["notes", "draft", "review", "customer", "budget", "design", "release"], k=60)
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), "meeting")
+    if rng.random() < 0.05:
+        position = rng.randrange(len(words) - 1)
+        words[position:position + 2] = ["project", "roadmap"]
+    if rng.random() < 0.001:
+        words.insert(rng.randrange(len(words)), "zephyr")
+    return " ".join(words)
+
+
+async def bench_queries(organization_id: str) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    async with AsyncSessionLocal() as async_db:
+        for name, query in QUERIES.items():
+            timings: Dict[str, float] = {}
+            # Warm up so the numbers reflect a cached index, as in steady state
+            _, cursor = await NoteService.search_notes(async_db, organization_id, query)
+            with timed(timings, "first page (ms)"):
+                for _ in range(ROUNDS):
+                    await NoteService.search_notes(async_db, organization_id, query)
+            if cursor:
+                with timed(timings, "next page (ms)"):
+                    for _ in range(ROUNDS):
+                        await NoteService.search_notes(async_db, organization_id, query, cursor=cursor)
+            results[name] = {label: value / ROUNDS for label, value in timings.items()}
+    return results
+
+
+async def bench_typeahead(organization_id: str) -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    async with AsyncSessionLocal() as async_db:
+        for query in TYPEAHEAD_QUERIES:
+            await NoteService.typeahead_notes(async_db, organization_id, query)
+            with timed(results, query):
+                for _ in range(ROUNDS):
+                    await NoteService.typeahead_notes(async_db, organization_id, query)
+    return {query: value / ROUNDS for query, value in results.items()}
+
+
+async def bench_all(organization_id: str) -> Tuple[Dict[str, Dict[str, float]], Dict[str, float]]:
+    # One event loop for both, the async engine's connections are bound to it
+    return await bench_queries(organization_id), await bench_typeahead(organization_id)
+
+
+def main() -> None:
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        with scratch_organization(db) as (organization_id, user_id):
+            rows = build_subtree_rows(organization_id, user_id, ORGANIZATION_SIZE)
+            for row in rows:
+                row["content"] = build_content(rng)
+            insert_rows(db, rows)
+            db.execute(sqlalchemy.text("ANALYZE note"))
+            db.commit()
+
+            results, typeahead_results = asyncio.run(bench_all(organization_id))
+    finally:
+        db.close()
+
+    print(f"{'query':>12} | {'first page (ms)':>15} | {'next page (ms)':>15}")
+    for name, timings in results.items():
+        next_page = f"{timings['next page (ms)']:>15.1f}" if "next page (ms)" in timings else f"{'-':>15}"
+        print(f"{name:>12} | {timings['first page (ms)']:>15.1f} | {next_page}")
+
+    print(f"\n{'typeahead':>16} | {'latency (ms)':>12}")
+    for query, latency in typeahead_results.items():
+        print(f"{query:>16} | {latency:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
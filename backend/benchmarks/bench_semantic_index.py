@@ -0,0 +1,98 @@
+# ./backend/benchmarks/bench_semantic_index.py
+"""
+Semantic index at 100k chunks: indexing throughput with the local hashing embedder,
+batched top-k query latency, and the size of the stored vectors and HNSW index.
+
+The HNSW index covers the whole note_chunk table, so its size includes any other
+organization indexed in the development database.
+
+Usage (from ./backend, against a development database):
+    python -m benchmarks.bench_semantic_index
+"""
+import asyncio
+import logging
+import random
+from typing import Dict, List
+
+import sqlalchemy
+
+from app.core.config import settings
+from app.db.base import SessionLocal, AsyncSessionLocal
+from app.models.note import NoteChunk
+from app.api.v1.note.semantic_service import SemanticIndexService
+from benchmarks.fixtures import scratch_organization, build_subtree_rows, insert_rows, timed
+
+CHUNK_COUNT = 100_000
+INDEX_BATCH_SIZE = 1000
+QUERY_BATCH_SIZES = [1, 8, 32]
+K = 5
+ROUNDS = 5
+VOCABULARY_SIZE = 5000
+
+logging.getLogger("app").setLevel(logging.WARNING)
+
+
+def build_vocabulary(rng: random.Random) -> List[str]:
+    return ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 9))) for _ in range(VOCABULARY_SIZE)]
+
+
+def build_text(rng: random.Random, vocabulary: List[str]) -> str:
+    """A paragraph drawn from a skewed vocabulary, short enough to be a single chunk"""
+    return " ".join(rng.choices(vocabulary, weights=[1 / (rank + 1) for rank in range(len(vocabulary))], k=80))
+
+
+async def bench(organization_id: str, note_ids: List[str], queries: List[str]) -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    async with AsyncSessionLocal() as async_db:
+        with timed(results, "index (ms)"):
+            for start in range(0, len(note_ids), INDEX_BATCH_SIZE):
+                await SemanticIndexService.index_notes(async_db, note_ids[start:start + INDEX_BATCH_SIZE])
+
+        await SemanticIndexService.search(async_db, organization_id, queries[:1], K)
+        for batch_size in QUERY_BATCH_SIZES:
+            label = f"{batch_size} queries (ms)"
+            with timed(results, label):
+                for round_number in range(ROUNDS):
+                    batch = queries[round_number * batch_size:(round_number + 1) * batch_size]
+                    matches = await SemanticIndexService.search(async_db, organization_id, batch, K)
+            assert all(len(found) == K for found in matches)
+            results[label] /= ROUNDS
+    return results
+
+
+def main() -> None:
+    rng = random.Random(42)
+    vocabulary = build_vocabulary(rng)
+    db = SessionLocal()
+    try:
+        with scratch_organization(db) as (organization_id, user_id):
+            rows = build_subtree_rows(organization_id, user_id, CHUNK_COUNT)
+            for row in rows:
+                row["content"] = build_text(rng, vocabulary)
+            insert_rows(db, rows)
+            note_ids = [row["id"] for row in rows]
+            queries = [build_text(rng, vocabulary)[:200] for _ in range(max(QUERY_BATCH_SIZES) * ROUNDS)]
+
+            results = asyncio.run(bench(organization_id, note_ids, queries))
+
+            chunks, vector_bytes = db.execute(
+                sqlalchemy.select(sqlalchemy.func.count(), sqlalchemy.func.sum(sqlalchemy.func.pg_column_size(NoteChunk.embedding)))
+                .where(NoteChunk.organization_id == organization_id)
+            ).one()
+            index_bytes = db.execute(
+                sqlalchemy.select(sqlalchemy.func.pg_relation_size("ix_note_chunk_embedding_hnsw"))
+            ).scalar()
+    finally:
+        db.close()
+
+    print(f"chunks indexed:      {chunks}")
+    print(f"indexing:            {results['index (ms)'] / 1000:.1f} s ({chunks / (results['index (ms)'] / 1000):.0f} chunks/s)")
+    print(f"vectors stored:      {vector_bytes / 2 ** 20:.1f} MiB ({settings.SEMANTIC_EMBEDDING_DIMENSIONS} dimensions)")
+    print(f"HNSW index:          {index_bytes / 2 ** 20:.1f} MiB")
+    for batch_size in QUERY_BATCH_SIZES:
+        latency = results[f"{batch_size} queries (ms)"]
+        print(f"top-{K} x {batch_size:<2} queries: {latency:.1f} ms ({latency / batch_size:.2f} ms per query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# ./backend/benchmarks/bench_sort_key_inserts.py
+"""
+Consecutive insertions at the same spot among siblings (repeated drag-and-drop right after one note).
+
+Usage (from ./backend, against a development database):
+    python -m benchmarks.bench_sort_key_inserts
+"""
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+
+import sqlalchemy
+
+from app.db.base import SessionLocal, AsyncSessionLocal
+from app.models.note import Note
+from app.api.v1.note.service import NoteService
+from benchmarks.fixtures import scratch_organization, build_subtree_rows, insert_rows
+
+INSERTIONS = 10_000
+
+logging.getLogger("app").setLevel(logging.WARNING)
+
+
+async def bench_same_spot_inserts() -> None:
+    db = SessionLocal()
+    respreads = []
+    original_respread = NoteService._respread_sort_keys
+
+    async def counting_respread(*args, **kwargs):
+        rewritten = await original_respread(*args, **kwargs)
+        respreads.append(rewritten)
+        return rewritten
+
+    NoteService._respread_sort_keys = staticmethod(counting_respread)
+    try:
+        with scratch_organization(db) as (organization_id, user_id):
+            # A parent with two children; every new note is dropped directly after the first one
+            rows = build_subtree_rows(organization_id, user_id, 3, fanout=2)
+            insert_rows(db, rows)
+            parent_id, anchor_id = rows[0]["id"], rows[1]["id"]
+
+            latencies = []
+            async with AsyncSessionLocal() as async_db:
+                for index in range(INSERTIONS):
+                    start = time.perf_counter()
+                    sort_key = await NoteService.calculate_sort_key(
+                        async_db,
+                        parent_id=parent_id,
+                        after_id=anchor_id,
+                        organization_id=organization_id
+                    )
+                    note_id = str(uuid.uuid4())
+                    await async_db.execute(sqlalchemy.insert(Note).values(
+                        id=note_id,
+                        title=f"Dropped note {index}",
+                        parent_id=parent_id,
+                        organization_id=organization_id,
+                        created_by=user_id,
+                        path=f"{rows[0]['path']}.{note_id}",
+                        depth=1,
+                        children_count=0,
+                        sort_key=sort_key
+                    ))
+                    await async_db.commit()
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            max_key_length = db.query(sqlalchemy.func.max(sqlalchemy.func.length(Note.sort_key))).filter(
+                Note.parent_id == parent_id
+            ).scalar()
+
+            latencies.sort()
+            print(f"insertions:            {INSERTIONS}")
+            print(f"mean latency (ms):     {statistics.mean(latencies):.2f}")
+            print(f"p50 latency (ms):      {latencies[len(latencies) // 2]:.2f}")
+            print(f"p99 latency (ms):      {latencies[int(len(latencies) * 0.99)]:.2f}")
+            print(f"respreads:             {len(respreads)} ({sum(respreads)} rows rewritten in total)")
+            print(f"rows written / insert: {(INSERTIONS + sum(respreads)) / INSERTIONS:.2f}")
+            print(f"longest sort key:      {max_key_length}")
+    finally:
+        NoteService._respread_sort_keys = staticmethod(original_respread)
+        db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(bench_same_spot_inserts())
@@ -0,0 +1,120 @@
+# ./backend/benchmarks/bench_yjs_state.py
+"""
+Saving and loading 1 MB of Yjs collaboration state: the old JSON int array stored as base64 text
+versus raw application/octet-stream bodies stored as BYTEA, raw and zstd-compressed.
+
+The wire and codec columns measure what each request does to the payload in the API process.
+The database column runs the new path end to end through NoteService (the old one no longer
+has a column to write to).
+
+Usage (from ./backend, against a development database):
+    python -m benchmarks.bench_yjs_state
+"""
+import asyncio
+import base64
+import json
+import logging
+import random
+from typing import Dict, List
+
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.db.base import SessionLocal, AsyncSessionLocal
+from app.api.utils.yjs_state import encode_state, decode_state
+from app.api.v1.note.service import NoteService
+from benchmarks.fixtures import scratch_organization, build_subtree_rows, insert_rows, timed
+
+DOCUMENT_SIZE = 1024 * 1024
+ROUNDS = 5
+
+logging.getLogger("app").setLevel(logging.WARNING)
+
+
+def build_document(size: int) -> bytes:
+    """Approximate a Yjs update: mostly inserted text interleaved with varint-encoded struct headers"""
+    rng = random.Random(42)
+    words = [bytes(rng.choices(b"abcdefghijklmnopqrstuvwxyz", k=rng.randint(2, 10))) for _ in range(2000)]
+    chunks: List[bytes] = []
+    length = 0
+    while length < size:
+        chunk = bytes(rng.getrandbits(8) for _ in range(6)) + b" ".join(rng.choices(words, k=8))
+        chunks.append(chunk)
+        length += len(chunk)
+    return b"".join(chunks)[:size]
+
+
+def bench_legacy(state: bytes) -> Dict[str, float]:
+    """JSON int array on the wire, pydantic List[int] validation, base64 in a Text column"""
+    results: Dict[str, float] = {}
+    adapter = TypeAdapter(List[int])
+    body = json.dumps({"update": list(state)})
+    results["wire bytes"] = len(body)
+
+    with timed(results, "save (ms)"):
+        update = adapter.validate_python(json.loads(body)["update"])
+        stored = base64.b64encode(bytes(update)).decode("utf-8")
+    results["stored bytes"] = len(stored)
+
+    with timed(results, "load (ms)"):
+        json.dumps({"binary_content": list(base64.b64decode(stored))})
+    return results
+
+
+def bench_binary(state: bytes, compression: str) -> Dict[str, float]:
+    """Raw body on the wire, stored as BYTEA with the given compression setting"""
+    results: Dict[str, float] = {"wire bytes": len(state)}
+    settings.YJS_STATE_COMPRESSION = compression
+
+    with timed(results, "save (ms)"):
+        stored, encoding = encode_state(state)
+    results["stored bytes"] = len(stored)
+
+    with timed(results, "load (ms)"):
+        assert decode_state(stored, encoding) == state
+    return results
+
+
+async def bench_database(state: bytes, compression: str) -> Dict[str, float]:
+    settings.YJS_STATE_COMPRESSION = compression
+    results: Dict[str, float] = {}
+    db = SessionLocal()
+    try:
+        with scratch_organization(db) as (organization_id, user_id):
+            rows = build_subtree_rows(organization_id, user_id, 1)
+            insert_rows(db, rows)
+            note_id = rows[0]["id"]
+
+            async with AsyncSessionLocal() as async_db:
+                with timed(results, "db save (ms)"):
+                    for _ in range(ROUNDS):
+                        await NoteService.update_note_ws_content(async_db, note_id, state)
+                with timed(results, "db load (ms)"):
+                    for _ in range(ROUNDS):
+                        loaded, _ = await NoteService.get_note_ws_content(async_db, note_id)
+            assert loaded == [state]
+    finally:
+        db.close()
+    return {label: value / ROUNDS for label, value in results.items()}
+
+
+def main() -> None:
+    state = build_document(DOCUMENT_SIZE)
+    configured = settings.YJS_STATE_COMPRESSION
+    columns = ["wire bytes", "stored bytes", "save (ms)", "load (ms)", "db save (ms)", "db load (ms)"]
+    print(f"{'variant':>18} | " + " | ".join(f"{column:>12}" for column in columns))
+
+    variants = {
+        "json + base64": bench_legacy(state),
+        "octet-stream raw": {**bench_binary(state, None), **asyncio.run(bench_database(state, None))},
+        "octet-stream zstd": {**bench_binary(state, "zstd"), **asyncio.run(bench_database(state, "zstd"))},
+    }
+    settings.YJS_STATE_COMPRESSION = configured
+
+    for name, results in variants.items():
+        cells = [f"{results[column]:>12.1f}" if column in results else f"{'-':>12}" for column in columns]
+        print(f"{name:>18} | " + " | ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
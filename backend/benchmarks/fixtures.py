@@ -0,0 +1,112 @@
+# ./backend/benchmarks/fixtures.py
+"""
+Shared helpers for benchmarks. They run against the database configured in settings,
+inside a throwaway organization that is removed again afterwards.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import sqlalchemy
+from sqlalchemy.orm import Session
+
+from app.api.utils.fractional_index import keys_between
+from app.models.organization import Organization
+from app.models.user import User
+from app.models.note import Note
+from app.models.agent_task import AgentTask, agent_task_modified_notes, agent_task_reference_notes
+
+INSERT_BATCH_SIZE = 5000
+
+
+@contextmanager
+def scratch_organization(db: Session) -> Iterator[Tuple[str, str]]:
+    """Create a temporary organization and user, yield their ids and clean everything up afterwards"""
+    organization_id = str(uuid.uuid4())
+    user_id = str(uuid.uuid4())
+    db.add(Organization(id=organization_id, name=f"benchmark-{organization_id}"))
+    db.flush()
+    db.add(User(id=user_id, email=f"benchmark-{user_id}@example.com", organization_id=organization_id))
+    db.commit()
+
+    try:
+        yield organization_id, user_id
+    finally:
+        db.rollback()
+        org_notes = sqlalchemy.select(Note.id).where(Note.organization_id == organization_id)
+        org_tasks = sqlalchemy.select(AgentTask.id).where(AgentTask.organization_id == organization_id)
+        for table in (agent_task_modified_notes, agent_task_reference_notes):
+            db.execute(sqlalchemy.delete(table).where(table.c.note_id.in_(org_notes)))
+            db.execute(sqlalchemy.delete(table).where(table.c.agent_task_id.in_(org_tasks)))
+        db.execute(sqlalchemy.delete(AgentTask).where(AgentTask.organization_id == organization_id))
+        db.execute(sqlalchemy.delete(Note).where(Note.organization_id == organization_id))
+        db.execute(sqlalchemy.delete(User).where(User.id == user_id))
+        db.execute(sqlalchemy.delete(Organization).where(Organization.id == organization_id))
+        db.commit()
+
+
+def build_subtree_rows(
+    organization_id: str,
+    user_id: str,
+    size: int,
+    fanout: int = 10,
+    parent: Optional[Note] = None,
+    content: Optional[str] = None
+) -> List[Dict]:
+    """Build `size` note rows forming a breadth-first tree with the given fanout; the first row is the subtree root"""
+    root_id = str(uuid.uuid4())
+    root_path = f"{parent.path}.{root_id}" if parent else root_id
+    root_depth = parent.depth + 1 if parent else 0
+    sibling_keys = keys_between(None, None, fanout)
+    rows = [{
+        "id": root_id,
+        "title": "Benchmark root",
+        "content": content,
+        "parent_id": parent.id if parent else None,
+        "organization_id": organization_id,
+        "created_by": user_id,
+        "path": root_path,
+        "depth": root_depth,
+        "children_count": 0,
+        "sort_key": sibling_keys[0],
+    }]
+
+    cursor = 0
+    while len(rows) < size:
+        parent_row = rows[cursor]
+        for index in range(fanout):
+            if len(rows) >= size:
+                break
+            note_id = str(uuid.uuid4())
+            rows.append({
+                "id": note_id,
+                "title": f"Benchmark note {len(rows)}",
+                "content": content,
+                "parent_id": parent_row["id"],
+                "organization_id": organization_id,
+                "created_by": user_id,
+                "path": f"{parent_row['path']}.{note_id}",
+                "depth": parent_row["depth"] + 1,
+                "children_count": 0,
+                "sort_key": sibling_keys[index],
+            })
+            parent_row["children_count"] += 1
+        cursor += 1
+
+    return rows
+
+
+def insert_rows(db: Session, rows: List[Dict]) -> None:
+    """Bulk insert note rows in batches; rows must be ordered parents first"""
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.execute(sqlalchemy.insert(Note), rows[start:start + INSERT_BATCH_SIZE])
+    db.commit()
+
+
+@contextmanager
+def timed(results: Dict[str, float], label: str) -> Iterator[None]:
+    """Record the wall-clock duration of the block in milliseconds under `label`"""
+    start = time.perf_counter()
+    yield
+    results[label] = (time.perf_counter() - start) * 1000
@@ -1,6 +1,7 @@
 const { Server } = require('@hocuspocus/server');
 const { Database } = require('@hocuspocus/extension-database');
 const axios = require('axios');
+const Y = require('yjs');
 const dotenv = require('dotenv');
 
 // Load environment variables
@@ -11,12 +12,33 @@ const SERVER_CONFIG = {
   host: process.env.HOST || '0.0.0.0',
   port: parseInt(process.env.PORT || '1234', 10),
   apiBaseUrl: process.env.API_BASE_URL || 'http://backend:8000',
-  idleTimeout: parseInt(process.env.IDLE_TIMEOUT || '90000', 10) // 15 minutes default (in milliseconds)
+  idleTimeout: parseInt(process.env.IDLE_TIMEOUT || '90000', 10), // 15 minutes default (in milliseconds)
+  apiKey: process.env.WORKER_API_KEY // Required from the backend when it pushes updates
 };
 
 // In-memory cache with access timestamps
 const memoryCache = new Map(); // Key: documentName, Value: { data: Uint8Array, lastAccessed: number }
 
+// State vector of what the backend already has, so stores only send what changed since
+const persistedStateVectors = new Map(); // Key: documentName, Value: Uint8Array
+
+// Last backend log entry included in the fetched state; a full-state save only lets the backend drop entries up to it
+const logWatermarks = new Map(); // Key: documentName, Value: string
+
+// Split a "snapshot plus tail" body into its updates, each prefixed with a 4-byte big-endian length
+const parseFramedUpdates = (buffer) => {
+  const view = new DataView(buffer);
+  const updates = [];
+  let offset = 0;
+  while (offset < buffer.byteLength) {
+    const length = view.getUint32(offset);
+    offset += 4;
+    updates.push(new Uint8Array(buffer, offset, length));
+    offset += length;
+  }
+  return updates;
+};
+
 // Cleanup function to remove idle documents
 const cleanupIdleDocuments = () => {
   console.log('Running cleanup...');
@@ -26,6 +48,8 @@ const cleanupIdleDocuments = () => {
     console.log(`Checking document ${documentName} last accessed at ${lastAccessed}`);
     if (now - lastAccessed > SERVER_CONFIG.idleTimeout) {
       memoryCache.delete(documentName);
+      persistedStateVectors.delete(documentName);
+      logWatermarks.delete(documentName);
       console.log(`Removed idle document ${documentName} from memory cache`);
     }
   }
@@ -49,9 +73,16 @@ const customDatabase = new Database({
 
     // If not in memory, fetch from backend API
     try {
-      const response = await axios.get(`${SERVER_CONFIG.apiBaseUrl}/api/v1/notes/ws/${documentName}`);
-      if (response.data.binary_content) {
-        const documentData = new Uint8Array(response.data.binary_content);
+      // The backend answers with the snapshot and the logged updates after it, or 204 when nothing was saved yet
+      const response = await axios.get(`${SERVER_CONFIG.apiBaseUrl}/api/v1/notes/ws/${documentName}`, {
+        responseType: 'arraybuffer'
+      });
+      if (response.status === 200 && response.data.byteLength > 0) {
+        const updates = parseFramedUpdates(response.data);
+        if (response.headers['x-yjs-log-watermark'] !== undefined) {
+          logWatermarks.set(documentName, response.headers['x-yjs-log-watermark']);
+        }
+        const documentData = updates.length === 1 ? updates[0] : Y.mergeUpdates(updates);
         // Store in memory with current timestamp
         memoryCache.set(documentName, { data: documentData, lastAccessed: now });
         console.log(`Fetched ${documentName} from API and cached in memory`);
@@ -63,20 +94,29 @@ const customDatabase = new Database({
       return null;
     }
   },
-  store: async ({ documentName, state }) => {
+  store: async ({ documentName, state, document }) => {
     const now = Date.now();
     try {
-      if (Array.from(state).length > 0) {
+      if (state.length > 0) {
         // Update in-memory cache with new state and timestamp
         const documentData = new Uint8Array(state);
         memoryCache.set(documentName, { data: documentData, lastAccessed: now });
         console.log(`Updated ${documentName} in memory cache`);
 
-        // Persist to backend API
-        await axios.post(`${SERVER_CONFIG.apiBaseUrl}/api/v1/notes/ws/${documentName}/update`, {
-          update: Array.from(state)
-        });
-        console.log(`Persisted ${documentName} to backend API`);
+        // Persist to backend API: only the changes since the last store, or the full state the first time
+        const stateVector = Y.encodeStateVector(document);
+        const persistedStateVector = persistedStateVectors.get(documentName);
+        const payload = persistedStateVector ? Y.encodeStateAsUpdate(document, persistedStateVector) : state;
+        const endpoint = persistedStateVector ? 'append' : 'update';
+        const watermark = logWatermarks.get(documentName);
+        const query = endpoint === 'update' && watermark !== undefined ? `?watermark=${watermark}` : '';
+        await axios.post(
+          `${SERVER_CONFIG.apiBaseUrl}/api/v1/notes/ws/${documentName}/${endpoint}${query}`,
+          Buffer.from(payload.buffer, payload.byteOffset, payload.byteLength),
+          { headers: { 'Content-Type': 'application/octet-stream' } }
+        );
+        persistedStateVectors.set(documentName, stateVector);
+        console.log(`Persisted ${documentName} to backend API (${endpoint}, ${payload.byteLength} bytes)`);
       }
     } catch (error) {
       console.error('Error storing document:', error);
@@ -84,6 +124,42 @@ const customDatabase = new Database({
   },
 });
 
+// POST /documents/:name/updates lets the backend push an update made outside the editors (a version restore).
+// It is applied to the open document, which broadcasts it to editors, and merged into the cached copy.
+const handleBackendUpdate = async ({ request, response, instance }) => {
+  const match = request.method === 'POST' && request.url.match(/^\/documents\/([^/?]+)\/updates$/);
+  if (!match) {
+    return;
+  }
+  if (!SERVER_CONFIG.apiKey || request.headers['x-api-key'] !== SERVER_CONFIG.apiKey) {
+    response.writeHead(401);
+    response.end();
+    throw null;
+  }
+
+  const chunks = [];
+  for await (const chunk of request) {
+    chunks.push(chunk);
+  }
+  const update = new Uint8Array(Buffer.concat(chunks));
+  const documentName = decodeURIComponent(match[1]);
+
+  const document = instance.documents.get(documentName);
+  if (document) {
+    Y.applyUpdate(document, update);
+  }
+  const cached = memoryCache.get(documentName);
+  if (cached) {
+    cached.data = Y.mergeUpdates([cached.data, update]);
+  }
+  console.log(`Applied backend update to ${documentName} (${update.byteLength} bytes, ${document ? 'open' : 'not open'})`);
+
+  response.writeHead(204);
+  response.end();
+  // Stop Hocuspocus from answering the request itself
+  throw null;
+};
+
 // Configure Hocuspocus server
 const server = Server.configure({
   name: "notes-collaboration-server",
@@ -95,6 +171,7 @@ const server = Server.configure({
   extensions: [
     customDatabase,
   ],
+  onRequest: handleBackendUpdate,
 });
 
 // Start server
@@ -1,6 +1,11 @@
 import { NextRequest } from 'next/server';
 import { cookies } from 'next/headers';
 import { createUnauthorizedResponse } from '@/lib/auth/handleUnauthorized';
+import {
+	conditionalRequestHeaders,
+	jsonWithValidators,
+	notModifiedResponse,
+} from '@/lib/api/conditional';
 
 export async function GET(
 	req: NextRequest,
@@ -21,10 +26,15 @@ export async function GET(
 			{
 				headers: {
 					Authorization: `Bearer ${accessToken.value}`,
+					...conditionalRequestHeaders(req),
 				},
 			}
 		);
 
+		if (response.status === 304) {
+			return notModifiedResponse(response);
+		}
+
 		if (!response.ok) {
 			if (response.status === 401) {
 				return createUnauthorizedResponse();
@@ -36,7 +46,7 @@ export async function GET(
 		}
 
 		const data = await response.json();
-		return Response.json(data);
+		return jsonWithValidators(data, response);
 	} catch (error) {
 		console.error('Error fetching note:', error);
 		return Response.json(
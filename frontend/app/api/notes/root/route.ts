@@ -1,12 +1,27 @@
 import { cookies } from 'next/headers';
 import { NextRequest } from 'next/server';
 import { createUnauthorizedResponse } from '@/lib/auth/handleUnauthorized';
+import {
+	conditionalRequestHeaders,
+	jsonWithValidators,
+	notModifiedResponse,
+} from '@/lib/api/conditional';
 
 export async function GET(req: NextRequest) {
 	try {
 		const searchParams = req.nextUrl.searchParams;
-		const skip = Number(searchParams.get('skip')) || 0;
 		const limit = Number(searchParams.get('limit')) || 20;
+		const cursor = searchParams.get('cursor');
+		const includeTotal = searchParams.get('include_total') ?? 'true';
+		const query = new URLSearchParams({
+			limit: String(limit),
+			include_total: includeTotal,
+		});
+		if (cursor) {
+			query.set('cursor', cursor);
+		} else {
+			query.set('skip', String(Number(searchParams.get('skip')) || 0));
+		}
 
 		const cookieStore = await cookies();
 		const accessToken = cookieStore.get('access_token');
@@ -16,14 +31,19 @@ export async function GET(req: NextRequest) {
 		}
 
 		const response = await fetch(
-			`${process.env.API_URL}/api/v1/notes/root?skip=${skip}&limit=${limit}`,
+			`${process.env.API_URL}/api/v1/notes/root?${query.toString()}`,
 			{
 				headers: {
 					Authorization: `Bearer ${accessToken.value}`,
+					...conditionalRequestHeaders(req),
 				},
 			}
 		);
 
+		if (response.status === 304) {
+			return notModifiedResponse(response);
+		}
+
 		if (!response.ok) {
 			if (response.status === 401) {
 				return createUnauthorizedResponse();
@@ -32,7 +52,7 @@ export async function GET(req: NextRequest) {
 		}
 
 		const data = await response.json();
-		return Response.json(data);
+		return jsonWithValidators(data, response);
 	} catch (error) {
 		console.error(error);
 		return Response.json(
@@ -13,10 +13,19 @@ export async function GET(req: NextRequest) {
 		}
 
 		const searchParams = req.nextUrl.searchParams;
-		const skip = Number(searchParams.get('skip')) || 0;
 		const limit = Number(searchParams.get('limit')) || 20;
+		const cursor = searchParams.get('cursor');
+		const query = new URLSearchParams({
+			limit: String(limit),
+			include_total: searchParams.get('include_total') ?? 'true',
+		});
+		if (cursor) {
+			query.set('cursor', cursor);
+		} else {
+			query.set('skip', String(Number(searchParams.get('skip')) || 0));
+		}
 
-		const apiUrl = `${process.env.API_URL}/api/v1/agent_tasks/?skip=${skip}&limit=${limit}`;
+		const apiUrl = `${process.env.API_URL}/api/v1/agent_tasks/?${query.toString()}`;
 
 		const response = await fetch(apiUrl, {
 			headers: {
@@ -0,0 +1,27 @@
+import { NextRequest } from 'next/server';
+
+// Headers that let the backend answer 304 Not Modified for unchanged notes
+export function conditionalRequestHeaders(req: NextRequest): HeadersInit {
+	const ifNoneMatch = req.headers.get('if-none-match');
+	return ifNoneMatch ? { 'If-None-Match': ifNoneMatch } : {};
+}
+
+function validatorHeaders(response: Response): HeadersInit {
+	const headers: Record<string, string> = {};
+	const etag = response.headers.get('etag');
+	const cacheControl = response.headers.get('cache-control');
+	if (etag) headers['ETag'] = etag;
+	if (cacheControl) headers['Cache-Control'] = cacheControl;
+	return headers;
+}
+
+export function notModifiedResponse(response: Response) {
+	return new Response(null, {
+		status: 304,
+		headers: validatorHeaders(response),
+	});
+}
+
+export function jsonWithValidators(data: unknown, response: Response) {
+	return Response.json(data, { headers: validatorHeaders(response) });
+}
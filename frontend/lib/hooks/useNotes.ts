@@ -23,6 +23,7 @@ export function useNotes() {
 				setRootNotes: store.setRootNotes,
 				setHasMoreRootNotes: store.setHasMoreRootNotes,
 				setCurrentPage: store.setCurrentPage,
+				setRootNotesCursor: store.setRootNotesCursor,
 			},
 		}),
 		[store]
@@ -43,9 +44,13 @@ export function useNotes() {
 				}
 				actions.setError(null);
 
-				const skip = page * ITEMS_PER_PAGE;
+				// Later pages continue from the cursor returned with the previous page
+				const cursorParam =
+					page > 0 && store.rootNotesCursor
+						? `&cursor=${encodeURIComponent(store.rootNotesCursor)}`
+						: '';
 				const response = await fetchWithAuth(
-					`/api/notes/root?skip=${skip}&limit=${ITEMS_PER_PAGE}`
+					`/api/notes/root?limit=${ITEMS_PER_PAGE}&include_total=false${cursorParam}`
 				);
 
 				if (!response.ok) {
@@ -57,7 +62,9 @@ export function useNotes() {
 				}
 
 				const data = await response.json();
-				const [notes, total] = Array.isArray(data) ? data : [[], 0];
+				const [notes, , nextCursor] = Array.isArray(data)
+					? data
+					: [[], null, null];
 
 				// Always set root notes, even if empty
 				if (page === 0) {
@@ -67,9 +74,8 @@ export function useNotes() {
 				}
 
 				// Update pagination state
-				actions.setHasMoreRootNotes(
-					total > (page + 1) * ITEMS_PER_PAGE
-				);
+				actions.setHasMoreRootNotes(Boolean(nextCursor));
+				actions.setRootNotesCursor(nextCursor ?? null);
 				actions.setCurrentPage(page);
 			} catch (error) {
 				const message =
@@ -5,11 +5,12 @@ import { fetchWithAuth } from '@/lib/api/fetchWithAuth';
 import { Task } from '@/types/task';
 
 export const fetchTasks = async (
-	skip: number = 0,
+	cursor: string | null = null,
 	limit: number = 20
 ): Promise<TaskListResponse> => {
+	const cursorParam = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
 	const response = await fetchWithAuth(
-		`/api/tasks?skip=${skip}&limit=${limit}`
+		`/api/tasks?limit=${limit}&include_total=false${cursorParam}`
 	);
 	if (!response.ok) throw new Error('Failed to fetch tasks');
 	return response.json();
@@ -18,13 +19,10 @@ export const fetchTasks = async (
 export const useTasks = (limit: number = 20) => {
 	return useInfiniteQuery({
 		queryKey: ['tasks', 'infinite'],
-		queryFn: ({ pageParam = 0 }) => fetchTasks(pageParam * limit, limit),
-		getNextPageParam: (lastPage, allPages) => {
-			// Assuming API returns total count, adjust this logic based on your API's response
-			const totalFetched = allPages.flatMap((page) => page.items).length;
-			return totalFetched < lastPage.total ? allPages.length : undefined;
-		},
-		initialPageParam: 0,
+		queryFn: ({ pageParam }) => fetchTasks(pageParam, limit),
+		// Keyset pagination: each page returns the cursor of the next one
+		getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
+		initialPageParam: null as string | null,
 	});
 };
 
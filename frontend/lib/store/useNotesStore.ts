@@ -8,6 +8,7 @@ interface NotesState {
 	loadingStates: Record<string, boolean>;
 	hasMoreRootNotes: boolean;
 	currentPage: number;
+	rootNotesCursor: string | null;
 	isLoadingMore: boolean;
 	isLoadingRoot: boolean;
 	error: string | null;
@@ -23,6 +24,7 @@ interface NotesState {
 	setLoadingState: (nodeId: string, isLoading: boolean) => void;
 	setHasMoreRootNotes: (hasMore: boolean) => void;
 	setCurrentPage: (page: number) => void;
+	setRootNotesCursor: (cursor: string | null) => void;
 	setIsLoadingMore: (isLoading: boolean) => void;
 	setIsLoadingRoot: (isLoading: boolean) => void;
 	setError: (error: string | null) => void;
@@ -43,6 +45,7 @@ export const useNotesStore = create<NotesState>((set) => ({
 	loadingStates: {},
 	hasMoreRootNotes: false,
 	currentPage: 0,
+	rootNotesCursor: null,
 	isLoadingMore: false,
 	isLoadingRoot: false,
 	error: null,
@@ -92,6 +95,7 @@ export const useNotesStore = create<NotesState>((set) => ({
 
 	setHasMoreRootNotes: (hasMore) => set({ hasMoreRootNotes: hasMore }),
 	setCurrentPage: (page) => set({ currentPage: page }),
+	setRootNotesCursor: (cursor) => set({ rootNotesCursor: cursor }),
 	setIsLoadingMore: (isLoading) => set({ isLoadingMore: isLoading }),
 
 	addNote: (note, parentId) =>
@@ -281,22 +285,17 @@ export const useNotesStore = create<NotesState>((set) => ({
 				findAndRemoveNote(oldParentId);
 			if (!movedNote) return state;
 
-			// Step 2: Calculate new position
+			// Step 2: Calculate new index (lists are kept in sort_key order)
 			const targetNotes = !newParentId
 				? stateAfterRemoval.rootNotes
 				: stateAfterRemoval.childrenMap[newParentId] || [];
 
-			const newPosition = calculateNewPosition(
-				targetNotes,
-				beforeId,
-				afterId
-			);
+			const newIndex = calculateNewIndex(targetNotes, beforeId, afterId);
 
-			// Step 3: Create updated note with new parent and position
+			// Step 3: Create updated note with new parent
 			const updatedNote = {
 				...movedNote,
 				parent_id: newParentId,
-				position: newPosition,
 			};
 
 			// Step 4: Insert note in new location
@@ -304,10 +303,10 @@ export const useNotesStore = create<NotesState>((set) => ({
 
 			if (!newParentId) {
 				// Moving to root level
-				newState.rootNotes = insertNoteAtPosition(
+				newState.rootNotes = insertNoteAtIndex(
 					newState.rootNotes,
 					updatedNote,
-					newPosition
+					newIndex
 				);
 
 				// Ensure the note is removed from its old parent's children if it exists
@@ -324,10 +323,10 @@ export const useNotesStore = create<NotesState>((set) => ({
 				const parentChildren = newState.childrenMap[newParentId] || [];
 				newState.childrenMap = {
 					...newState.childrenMap,
-					[newParentId]: insertNoteAtPosition(
+					[newParentId]: insertNoteAtIndex(
 						parentChildren,
 						updatedNote,
-						newPosition
+						newIndex
 					),
 				};
 
@@ -378,62 +377,31 @@ export const useNotesStore = create<NotesState>((set) => ({
 		}),
 }));
 
-const calculateNewPosition = (
+const calculateNewIndex = (
 	notes: NoteListItem[],
 	beforeId?: string,
 	afterId?: string
 ): number => {
-	// Sort notes by position for correct calculations
-	const sortedNotes = [...notes].sort((a, b) => a.position - b.position);
-
-	if (!sortedNotes.length) return 1000; // First note
-
 	if (beforeId) {
-		const beforeIndex = sortedNotes.findIndex((n) => n.id === beforeId);
-		if (beforeIndex === -1) return 1000;
-
-		const beforeNote = sortedNotes[beforeIndex];
-		const prevNote = beforeIndex > 0 ? sortedNotes[beforeIndex - 1] : null;
-
-		return prevNote
-			? (beforeNote.position + prevNote.position) / 2
-			: beforeNote.position - 1000;
+		const beforeIndex = notes.findIndex((n) => n.id === beforeId);
+		if (beforeIndex !== -1) return beforeIndex;
 	}
 
 	if (afterId) {
-		const afterIndex = sortedNotes.findIndex((n) => n.id === afterId);
-		if (afterIndex === -1) return 1000;
-
-		const afterNote = sortedNotes[afterIndex];
-		const nextNote =
-			afterIndex < sortedNotes.length - 1
-				? sortedNotes[afterIndex + 1]
-				: null;
-
-		return nextNote
-			? (afterNote.position + nextNote.position) / 2
-			: afterNote.position + 1000;
+		const afterIndex = notes.findIndex((n) => n.id === afterId);
+		if (afterIndex !== -1) return afterIndex + 1;
 	}
 
 	// If no before/after, place at the end
-	return sortedNotes[sortedNotes.length - 1].position + 1000;
+	return notes.length;
 };
 
-const insertNoteAtPosition = (
+const insertNoteAtIndex = (
 	notes: NoteListItem[],
 	note: NoteListItem,
-	position: number
+	index: number
 ): NoteListItem[] => {
 	const updatedNotes = [...notes];
-	const insertIndex = updatedNotes.findIndex((n) => n.position > position);
-
-	if (insertIndex === -1) {
-		// If no note has a higher position, append to the end
-		updatedNotes.push({ ...note, position });
-	} else {
-		// Insert at the correct position
-		updatedNotes.splice(insertIndex, 0, { ...note, position });
-	}
-
+	updatedNotes.splice(index, 0, note);
 	return updatedNotes;
 };
@@ -11,7 +11,7 @@ export interface Note {
 	path: string;
 	depth: number;
 	children_count: number;
-	position: number;
+	sort_key: string;
 }
 
 export interface NoteListItem {
@@ -24,7 +24,7 @@ export interface NoteListItem {
 	path: string;
 	depth: number;
 	children_count: number;
-	position: number;
+	sort_key: string;
 	parent_id: string | null;
 }
 
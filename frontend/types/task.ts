@@ -22,5 +22,6 @@ export interface NoteSummary {
 
 export interface TaskListResponse {
 	items: Task[];
-	total: number;
+	total: number | null;
+	next_cursor: string | null;
 }